@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", str(24 * 3600)))
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "2048"))
+# Set to a Mongo URL (or "1" to reuse MONGO_URL_COMBINED) to share responses across processes
+GEMINI_CACHE_MONGO = os.getenv("GEMINI_CACHE_MONGO", "")
+
+
+def image_content_hash(image: str) -> str:
+    """Hash of the image bytes behind a base64 string (data-URL prefix ignored)."""
+    if image.startswith("data:") and "," in image:
+        image = image.split(",", 1)[1]
+    try:
+        data = base64.b64decode(image, validate=False)
+    except (ValueError, TypeError):
+        data = image.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def response_key(model: str, template_version: Any, prompt: str, parameters: Dict[str, Any],
+                 image_hashes: Optional[List[str]] = None) -> str:
+    """
+    Cache key over everything that determines a Gemini response: the model, the prompt
+    template version, the rendered prompt (whitespace-normalized, so it carries the inputs),
+    the generation parameters and the content hashes of any images.
+    """
+    normalized_prompt = " ".join(prompt.split())
+    material = json.dumps(
+        [model, str(template_version), normalized_prompt, parameters or {}, image_hashes or []],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GeminiResponseCache:
+    """
+    Two-tier cache of successful Gemini responses: a bounded in-process TTL cache, backed by
+    an optional Mongo collection (TTL-indexed) shared between workers and restarts.
+    """
+
+    def __init__(self, ttl: float = GEMINI_CACHE_TTL, max_size: int = GEMINI_CACHE_SIZE, mongo_url: str = GEMINI_CACHE_MONGO):
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self._collection = None
+        if mongo_url:
+            try:
+                from pymongo import MongoClient
+                url = os.getenv("MONGO_URL_COMBINED") if mongo_url == "1" else mongo_url
+                self._collection = MongoClient(url).fashion_db.gemini_cache
+                self._collection.create_index("expires_at", expireAfterSeconds=0)
+            except Exception as e:
+                logger.warning(f"Gemini response cache running without Mongo tier: {str(e)}")
+                self._collection = None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            response = self._memory.get(key)
+        if response is not None:
+            return response
+        if self._collection is None:
+            return None
+        try:
+            document = self._collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            logger.warning(f"Gemini cache lookup failed: {str(e)}")
+            return None
+        if document is None:
+            return None
+        response = document["response"]
+        with self._lock:
+            self._memory[key] = response
+        return response
+
+    def put(self, key: str, response: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = response
+        if self._collection is None:
+            return
+        try:
+            self._collection.replace_one(
+                {"_id": key},
+                {"_id": key, "response": response, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl), "created_at": time.time()},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Gemini cache write failed: {str(e)}")
+
+
+_cache: Optional[GeminiResponseCache] = None
+
+
+def get_gemini_cache() -> GeminiResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = GeminiResponseCache()
+    return _cache
@@ -0,0 +1,232 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Any, Dict, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# In-flight Gemini calls across the whole process; the rest wait for a slot
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5"))
+GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "8"))
+# Consecutive failures that open the circuit, and how long it stays open before a trial call
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Callers stop waiting this long after the request timeout, in case the client loop itself is stuck
+GEMINI_RESULT_GRACE = float(os.getenv("GEMINI_RESULT_GRACE", "5"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while the circuit breaker is open."""
+
+
+class GeminiRequestError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `threshold` consecutive failures it opens and calls fail
+    immediately; after `reset_timeout` one trial call is let through (half-open), and its
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold: int = GEMINI_BREAKER_THRESHOLD, reset_timeout: float = GEMINI_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """End a half-open trial that finished without a recorded outcome (e.g. it was cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Gemini circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+
+class AsyncGeminiClient:
+    """
+    Pooled aiohttp client for the Gemini REST API, running on its own event loop thread so
+    the concurrency cap and the connection pool are shared by async callers (any loop) and
+    the synchronous Flask routes alike. Retries 429/5xx and network errors with exponential
+    backoff and full jitter, honouring Retry-After.
+    """
+
+    def __init__(self,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 max_retries: int = GEMINI_MAX_RETRIES,
+                 backoff_base: float = GEMINI_BACKOFF_BASE,
+                 backoff_max: float = GEMINI_BACKOFF_MAX,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True)
+        self._thread.start()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            )
+        return self._session
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _post_json(self, url: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini is temporarily unavailable")
+        try:
+            return await self._post_with_retries(url, payload, timeout)
+        finally:
+            # A no-op when the outcome was recorded; otherwise the breaker must not wait on a dead trial
+            self.breaker.release_trial()
+
+    async def _acquire_slot(self, deadline: float) -> float:
+        """Take a concurrency slot before the deadline and return the budget left once it is held."""
+        await asyncio.wait_for(self._semaphore.acquire(), deadline - time.monotonic())
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._semaphore.release()
+            raise asyncio.TimeoutError()
+        return remaining
+
+    async def _post_with_retries(self, url: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        session = await self._get_session()
+        deadline = time.monotonic() + timeout
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            retry_after = None
+            try:
+                remaining = await self._acquire_slot(deadline)
+            except asyncio.TimeoutError:
+                if last_error is not None:
+                    break
+                # Queued behind other calls for the whole budget; Gemini itself did not fail, so the breaker is left alone
+                raise GeminiRequestError("Gemini request timed out waiting for a free connection")
+            try:
+                async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=remaining)) as response:
+                    if response.status < 400:
+                        try:
+                            result = await response.json(content_type=None)
+                        except ValueError as e:
+                            # A truncated or non-JSON success body is retried like a server error
+                            last_error = GeminiRequestError(f"Gemini returned invalid JSON: {str(e)}", response.status)
+                        else:
+                            self.breaker.record_success()
+                            return result
+                    else:
+                        body = await response.text()
+                        error = GeminiRequestError(f"Gemini returned {response.status}: {body[:200]}", response.status)
+                        if response.status not in RETRYABLE_STATUS:
+                            # The request itself is wrong; retrying or tripping the breaker would not help
+                            self.breaker.record_success()
+                            raise error
+                        retry_after = response.headers.get("Retry-After")
+                        last_error = error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = GeminiRequestError(f"Gemini request failed: {str(e) or type(e).__name__}")
+            finally:
+                self._semaphore.release()
+
+            if attempt < self.max_retries:
+                delay = min(self._backoff(attempt, retry_after), max(0.0, deadline - time.monotonic()))
+                logger.warning(f"Gemini call failed ({last_error}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        self.breaker.record_failure()
+        raise last_error or GeminiRequestError("Gemini request timed out")
+
+    async def post_json(self, url: str, payload: Dict[str, Any], timeout: float = 30) -> Dict[str, Any]:
+        """Awaitable from any event loop; the call itself runs on the client's loop."""
+        future = asyncio.run_coroutine_threadsafe(self._post_json(url, payload, timeout), self._loop)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout + GEMINI_RESULT_GRACE)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise GeminiRequestError("Gemini request timed out")
+
+    def post_json_sync(self, url: str, payload: Dict[str, Any], timeout: float = 30) -> Dict[str, Any]:
+        """Blocking wrapper for the Flask routes."""
+        future = asyncio.run_coroutine_threadsafe(self._post_json(url, payload, timeout), self._loop)
+        try:
+            return future.result(timeout=timeout + GEMINI_RESULT_GRACE)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise GeminiRequestError("Gemini request timed out")
+
+
+_client: Optional[AsyncGeminiClient] = None
+_client_lock = threading.Lock()
+
+
+def get_gemini_client() -> AsyncGeminiClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AsyncGeminiClient()
+    return _client
@@ -0,0 +1,179 @@
+import io
+import os
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import requests
+from PIL import Image, ImageOps
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Gemini tiles images at 768px, so anything larger only inflates the payload
+GEMINI_IMAGE_MAX_SIDE = int(os.getenv("GEMINI_IMAGE_MAX_SIDE", "768"))
+GEMINI_IMAGE_QUALITY = int(os.getenv("GEMINI_IMAGE_QUALITY", "85"))
+GEMINI_IMAGE_WORKERS = int(os.getenv("GEMINI_IMAGE_WORKERS", "8"))
+GEMINI_IMAGE_CACHE_DIR = os.getenv("GEMINI_IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "gemini_images"))
+GEMINI_IMAGE_CACHE_MAX_BYTES = int(os.getenv("GEMINI_IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv("IMAGE_DOWNLOAD_TIMEOUT", "10"))
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Shared so concurrent vision requests do not each spin up their own download threads
+_executor = ThreadPoolExecutor(max_workers=GEMINI_IMAGE_WORKERS, thread_name_prefix="gemini-image")
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=GEMINI_IMAGE_WORKERS, pool_maxsize=GEMINI_IMAGE_WORKERS))
+_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=GEMINI_IMAGE_WORKERS, pool_maxsize=GEMINI_IMAGE_WORKERS))
+
+
+def downscale_image(data: bytes, max_side: int = GEMINI_IMAGE_MAX_SIDE, quality: int = GEMINI_IMAGE_QUALITY) -> bytes:
+    """JPEG bytes no larger than max_side on the long edge; small JPEGs are passed through untouched."""
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG" and max(image.size) <= max_side:
+        return data
+    # Let the JPEG decoder skip straight to a nearby power-of-two scale
+    image.draft("RGB", (max_side, max_side))
+    # The re-encoded JPEG carries no EXIF, so apply the camera's orientation to the pixels first
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        # JPEG has no alpha; flatten onto white rather than the black convert("RGB") would give
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class ImageDiskCache:
+    """
+    Downscaled images keyed by the sha256 of their source URL, shared by every worker on the
+    host. Writes are atomic renames; once the directory passes max_bytes the least recently
+    used files are removed.
+    """
+
+    def __init__(self, directory: str = GEMINI_IMAGE_CACHE_DIR, max_bytes: int = GEMINI_IMAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".jpg")
+
+    def get(self, url: str) -> Optional[bytes]:
+        path = self._path(url)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, url: str, data: bytes):
+        path = self._path(url)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache image {url}: {str(e)}")
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % 100 == 0
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".jpg")]
+            stats = [(entry.path, entry.stat()) for entry in entries]
+        except OSError:
+            return
+        total = sum(stat.st_size for _, stat in stats)
+        for path, stat in sorted(stats, key=lambda item: item[1].st_atime):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= stat.st_size
+            except OSError:
+                pass
+
+
+class ImagePreparer:
+    """
+    Turns the images of a vision request (URLs or base64 strings) into downscaled base64 JPEGs.
+    URLs are fetched concurrently on a shared pool and their downscaled bytes kept on disk, so
+    the same product image is downloaded once per host rather than once per request.
+    """
+
+    def __init__(self, cache: Optional[ImageDiskCache] = None, max_side: int = GEMINI_IMAGE_MAX_SIDE,
+                 timeout: float = IMAGE_DOWNLOAD_TIMEOUT):
+        self.cache = cache or ImageDiskCache()
+        self.max_side = max_side
+        self.timeout = timeout
+
+    def _fetch(self, url: str) -> bytes:
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        response = _session.get(url, headers=DOWNLOAD_HEADERS, timeout=self.timeout)
+        response.raise_for_status()
+        try:
+            data = downscale_image(response.content, self.max_side)
+        except Exception as e:
+            # Not something PIL can read (SVG, truncated file); send it as downloaded, uncached
+            logger.warning(f"Could not downscale image from {url}: {str(e)}")
+            return response.content
+        self.cache.put(url, data)
+        return data
+
+    def _prepare_one(self, image: str) -> str:
+        if image.startswith("http"):
+            try:
+                data = self._fetch(image)
+            except Exception as e:
+                logger.error(f"Error downloading image from {image}: {str(e)}")
+                raise
+        else:
+            if image.startswith("data:") and "," in image:
+                image = image.split(",", 1)[1]
+            try:
+                data = downscale_image(base64.b64decode(image), self.max_side)
+            except Exception as e:
+                # Not something PIL can read; send it as given and let Gemini decide
+                logger.warning(f"Could not downscale inline image: {str(e)}")
+                return image
+        return base64.b64encode(data).decode("utf-8")
+
+    def prepare(self, images: List[str]) -> List[str]:
+        """Base64 images in input order (JPEG unless PIL cannot read one); raises if any URL cannot be downloaded."""
+        if len(images) == 1:
+            return [self._prepare_one(images[0])]
+        return list(_executor.map(self._prepare_one, images))
+
+
+_preparer: Optional[ImagePreparer] = None
+
+
+def get_image_preparer() -> ImagePreparer:
+    global _preparer
+    if _preparer is None:
+        _preparer = ImagePreparer()
+    return _preparer
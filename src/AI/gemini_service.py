@@ -1,13 +1,21 @@
 import os
 import json
-import base64
+import asyncio
 from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
-import requests
 from dotenv import load_dotenv
 import logging
 import uuid
 
+try:
+    from .gemini_cache import get_gemini_cache, response_key, image_content_hash
+    from .gemini_client import get_gemini_client, CircuitOpenError, GeminiRequestError
+    from .gemini_images import get_image_preparer
+except ImportError:
+    from gemini_cache import get_gemini_cache, response_key, image_content_hash
+    from gemini_client import get_gemini_client, CircuitOpenError, GeminiRequestError
+    from gemini_images import get_image_preparer
+
 # Load environment variables
 load_dotenv()
 
@@ -15,6 +23,9 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Bump whenever a prompt template changes so cached responses for the old wording are not reused
+PROMPT_TEMPLATE_VERSION = 1
+
 class GeminiService:
     """
     Service for interacting with Google's Gemini API for fashion AI features
@@ -34,10 +45,17 @@ class GeminiService:
         
         self.gemini_pro_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
         self.gemini_pro_vision_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro-vision:generateContent"
+        # Upper bound for a single Gemini call; callers with a tighter budget pass their own timeout
+        self.request_timeout = float(os.getenv("GEMINI_TIMEOUT", "30"))
+        # Same prompt, parameters and images give the same answer: serve repeats from cache
+        self.response_cache = get_gemini_cache()
+        # Shared pooled client: caps in-flight calls, retries 429/5xx and trips a circuit breaker
+        self.http_client = get_gemini_client()
+        self.image_preparer = get_image_preparer()
     
-    def _make_text_request(self, prompt: str, parameters: Dict[str, Any] = None) -> Dict[str, Any]:
+    def _text_request(self, prompt: str, parameters: Dict[str, Any] = None):
         """
-        Make a request to Gemini Pro text model
+        URL, payload and cache key for a Gemini Pro text request
         """
         default_params = {
             "temperature": 0.7,
@@ -62,19 +80,12 @@ class GeminiService:
             "generationConfig": default_params
         }
         
-        url = f"{self.gemini_pro_url}?key={self.api_key}"
-        
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error making request to Gemini API: {str(e)}")
-            return {"error": str(e)}
+        cache_key = response_key(self.gemini_pro_url, PROMPT_TEMPLATE_VERSION, prompt, default_params)
+        return f"{self.gemini_pro_url}?key={self.api_key}", payload, cache_key
     
-    def _make_vision_request(self, prompt: str, image_data: Union[str, List[str]], parameters: Dict[str, Any] = None) -> Dict[str, Any]:
+    def _vision_request(self, prompt: str, image_data: Union[str, List[str]], parameters: Dict[str, Any] = None):
         """
-        Make a request to Gemini Pro Vision model
+        URL, payload and cache key for a Gemini Pro Vision request
         image_data can be a single image or list of images in base64 or URL format
         """
         default_params = {
@@ -87,28 +98,20 @@ class GeminiService:
         if parameters:
             default_params.update(parameters)
         
-        # Prepare image parts
-        image_parts = []
+        # Prepare image parts: URLs are fetched concurrently and every image is downscaled
+        # to the resolution the vision model uses before it is base64-encoded
         if isinstance(image_data, str):
             image_data = [image_data]
         
-        for img in image_data:
-            if img.startswith('http'):
-                # URL image
-                image_parts.append({
-                    "inlineData": {
-                        "mimeType": "image/jpeg",
-                        "data": self._download_and_encode_image(img)
-                    }
-                })
-            else:
-                # Base64 image
-                image_parts.append({
-                    "inlineData": {
-                        "mimeType": "image/jpeg",
-                        "data": img
-                    }
-                })
+        image_parts = [
+            {
+                "inlineData": {
+                    "mimeType": "image/jpeg",
+                    "data": data
+                }
+            }
+            for data in self.image_preparer.prepare(image_data)
+        ]
         
         # Construct the request
         parts = [{"text": prompt}] + image_parts
@@ -122,31 +125,100 @@ class GeminiService:
             "generationConfig": default_params
         }
         
-        url = f"{self.gemini_pro_vision_url}?key={self.api_key}"
+        # Keyed on image content, so the same photo sent as a URL or as base64 hits the same entry
+        cache_key = response_key(
+            self.gemini_pro_vision_url, PROMPT_TEMPLATE_VERSION, prompt, default_params,
+            [image_content_hash(part["inlineData"]["data"]) for part in image_parts]
+        )
+        return f"{self.gemini_pro_vision_url}?key={self.api_key}", payload, cache_key
+    
+    def _failed_request(self, error: Exception, api_name: str) -> Dict[str, Any]:
+        """
+        Error response the feature methods already turn into their fallback content
+        """
+        if isinstance(error, CircuitOpenError):
+            logger.warning(f"Skipping {api_name} call: {str(error)}")
+            return {"error": str(error), "circuit_open": True}
+        logger.error(f"Error making request to {api_name}: {str(error)}")
+        return {"error": str(error)}
+    
+    def _make_text_request(self, prompt: str, parameters: Dict[str, Any] = None, timeout: Optional[float] = None,
+                           cache: bool = True) -> Dict[str, Any]:
+        """
+        Make a request to Gemini Pro text model
+        """
+        url, payload, cache_key = self._text_request(prompt, parameters)
+        if cache:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error making request to Gemini Vision API: {str(e)}")
-            return {"error": str(e)}
+            result = self.http_client.post_json_sync(url, payload, timeout=timeout or self.request_timeout)
+        except (GeminiRequestError, CircuitOpenError) as e:
+            return self._failed_request(e, "Gemini API")
+        if cache:
+            self.response_cache.put(cache_key, result)
+        return result
     
-    def _download_and_encode_image(self, image_url: str) -> str:
+    async def _make_text_request_async(self, prompt: str, parameters: Dict[str, Any] = None, timeout: Optional[float] = None,
+                                       cache: bool = True) -> Dict[str, Any]:
         """
-        Download an image from URL and encode it to base64
+        Async variant of _make_text_request
         """
+        url, payload, cache_key = self._text_request(prompt, parameters)
+        if cache:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.get(image_url, headers=headers)
-            response.raise_for_status()
-            image_data = response.content
-            return base64.b64encode(image_data).decode('utf-8')
-        except Exception as e:
-            logger.error(f"Error downloading image from {image_url}: {str(e)}")
-            raise
+            result = await self.http_client.post_json(url, payload, timeout=timeout or self.request_timeout)
+        except (GeminiRequestError, CircuitOpenError) as e:
+            return self._failed_request(e, "Gemini API")
+        if cache:
+            self.response_cache.put(cache_key, result)
+        return result
+    
+    def _make_vision_request(self, prompt: str, image_data: Union[str, List[str]], parameters: Dict[str, Any] = None, timeout: Optional[float] = None,
+                             cache: bool = True) -> Dict[str, Any]:
+        """
+        Make a request to Gemini Pro Vision model
+        image_data can be a single image or list of images in base64 or URL format
+        """
+        url, payload, cache_key = self._vision_request(prompt, image_data, parameters)
+        if cache:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            result = self.http_client.post_json_sync(url, payload, timeout=timeout or self.request_timeout)
+        except (GeminiRequestError, CircuitOpenError) as e:
+            return self._failed_request(e, "Gemini Vision API")
+        if cache:
+            self.response_cache.put(cache_key, result)
+        return result
+    
+    async def _make_vision_request_async(self, prompt: str, image_data: Union[str, List[str]], parameters: Dict[str, Any] = None,
+                                         timeout: Optional[float] = None, cache: bool = True) -> Dict[str, Any]:
+        """
+        Async variant of _make_vision_request
+        """
+        # Image download and downscaling are blocking, so build the payload off the event loop
+        url, payload, cache_key = await asyncio.to_thread(self._vision_request, prompt, image_data, parameters)
+        if cache:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            result = await self.http_client.post_json(url, payload, timeout=timeout or self.request_timeout)
+        except (GeminiRequestError, CircuitOpenError) as e:
+            return self._failed_request(e, "Gemini Vision API")
+        if cache:
+            self.response_cache.put(cache_key, result)
+        return result
     
     def _extract_text_from_response(self, response: Dict[str, Any]) -> str:
         """
@@ -275,18 +347,18 @@ class GeminiService:
         
         Only return the valid JSON.
         """.format(
-            f"Style preferences: {json.dumps(user_preferences, indent=2)}" if user_preferences else "No specific style preferences provided.",
-            f"Seed item: {json.dumps(seed_item, indent=2)}" if seed_item else "No seed item provided.",
+            f"Style preferences: {json.dumps(user_preferences, indent=2, sort_keys=True)}" if user_preferences else "No specific style preferences provided.",
+            f"Seed item: {json.dumps(seed_item, indent=2, sort_keys=True)}" if seed_item else "No seed item provided.",
             f"Theme: {theme}" if theme else "No specific theme provided.",
             f"Occasion: {occasion}" if occasion else "No specific occasion provided.",
             f"Season: {season}" if season else "No specific season provided.",
             f"Color scheme: {color_scheme}" if color_scheme else "No specific color scheme provided.",
-            f"Available wardrobe items: {json.dumps(wardrobe_items, indent=2)}" if wardrobe_items else "No existing wardrobe items provided."
+            f"Available wardrobe items: {json.dumps(wardrobe_items, indent=2, sort_keys=True, default=str)}" if wardrobe_items else "No existing wardrobe items provided."
         )
         
         # Include the outfit items from category-free search if any
         if outfit_items:
-            prompt += f"\n\nConsider using these items that match the criteria:\n{json.dumps(outfit_items, indent=2)}"
+            prompt += f"\n\nConsider using these items that match the criteria:\n{json.dumps(outfit_items, indent=2, sort_keys=True)}"
             
         parameters = {
             "temperature": 0.7,
@@ -303,7 +375,41 @@ class GeminiService:
             outfit_json["search_items"] = outfit_items[:5]  # Include up to 5 search results
             
         return outfit_json
-    
+
+    def describe_outfit(self,
+                        items: List[Dict[str, Any]],
+                        theme: Optional[str] = None,
+                        occasion: Optional[str] = None,
+                        season: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Short narrative for an outfit that was already composed locally: the items are fixed,
+        Gemini only writes the title, description and per-item reasons
+        """
+        item_lines = "\n".join(
+            f"- {item.get('slot', 'item')}: {item.get('name', 'Item')} ({', '.join(item.get('color') or []) or 'unknown color'})"
+            for item in items
+        )
+        prompt = f"""
+        You are a fashion stylist AI assistant. Describe this outfit in a friendly, concise way.
+
+        Items:
+        {item_lines}
+
+        {f"Theme: {theme}" if theme else ""}
+        {f"Occasion: {occasion}" if occasion else ""}
+        {f"Season: {season}" if season else ""}
+
+        Respond with a valid JSON object with these keys:
+        - title: string
+        - description: string (2-3 sentences)
+        - reasons: array of strings, one short reason per item, in the same order
+
+        Only return the valid JSON.
+        """
+
+        response = self._make_text_request(prompt, {"temperature": 0.5, "maxOutputTokens": 512})
+        return self._extract_json_from_response(response)
+
     def analyze_outfit_image(self, image_data: str) -> Dict[str, Any]:
         """
         Analyze an outfit image to identify items and provide styling feedback
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 api_blueprint = Blueprint('ai', __name__)
 
-from . import handle_prompt, category_free_prompt
\ No newline at end of file
+from . import handle_prompt, category_free_prompt, wardrobe, outfits
\ No newline at end of file
@@ -1,69 +1,17 @@
 from flask import jsonify, request, current_app
 from . import api_blueprint
 from langchain_methods import get_memory_for_user
-from langchain_methods.rag_pipeline_categoryfree import rag_pipeline
+from langchain_methods.rag_pipeline_categoryfree import rag_pipeline, PIPELINE_TIMEOUT
+from utils import Deadline, DEADLINE_HEADER, decode_rgb_image, verify_token
 from box import Box
 import os
-import jwt
 import logging
 import traceback
-import requests
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Helper function to verify token
-def verify_token(token):
-    try:
-        # First try with the JWT_SECRET (HS256)
-        jwt_secret = os.getenv('JWT_SECRET')
-        if jwt_secret:
-            try:
-                payload = jwt.decode(token, jwt_secret, algorithms=["HS256"])
-                logger.info("Token verified using JWT_SECRET (HS256)")
-                return payload
-            except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
-                logger.warning(f"HS256 verification failed: {str(e)}")
-                # Fall through to try the next method
-        
-        # If HS256 fails or JWT_SECRET not available, try to validate through a direct call
-        # to the backend auth service
-        try:
-            response = requests.get(
-                "http://localhost:3001/auth/check",
-                headers={"Authorization": f"Bearer {token}"},
-                timeout=5
-            )
-            if response.ok:
-                logger.info("Token verified via backend auth service")
-                return response.json().get('user', {})
-            else:
-                logger.warning(f"Backend auth service verification failed: {response.status_code}")
-                return None
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Could not connect to backend auth service: {str(e)}")
-            # Fall through to try final method
-            
-        # As a last resort, try with RS256 and public key directly
-        public_key_path = os.environ.get("PUBLIC_KEY_PATH", "../../../web/backend/keys/public.pem")
-        try:
-            if os.path.exists(public_key_path):
-                with open(public_key_path, 'r') as f:
-                    public_key = f.read()
-                payload = jwt.decode(token, public_key, algorithms=["RS256"])
-                logger.info("Token verified using RS256 public key")
-                return payload
-            else:
-                logger.warning(f"Public key not found at {public_key_path}")
-        except Exception as e:
-            logger.warning(f"RS256 verification failed: {str(e)}")
-            
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error in token verification: {str(e)}")
-        return None
-
 @api_blueprint.route("/cat_free", methods=["POST"])
 def cat_free():
     try:
@@ -80,8 +28,25 @@ def cat_free():
             logger.warning("Token verification failed")
             return jsonify({"error": "Invalid or expired token"}), 401
             
-        # Parse request data
-        data = Box(request.get_json())
+        # Parse request data: multipart with raw RGB pixels from the backend,
+        # or the older JSON body with a base64 image
+        image = None
+        if request.mimetype == "multipart/form-data":
+            data = Box(request.form.to_dict(), default_box=True, default_box_attr=None)
+            if "image" in request.files:
+                try:
+                    width, height = int(data.image_width), int(data.image_height)
+                    if width <= 0 or height <= 0:
+                        raise ValueError("Image dimensions must be positive")
+                    image = decode_rgb_image(request.files["image"].read(), width, height, data.image_sha256)
+                except (TypeError, ValueError) as e:
+                    logger.warning(f"Invalid raw image upload: {str(e)}")
+                    return jsonify({
+                        "message": "Bad request.",
+                        "response": "image_width and image_height must describe the uploaded RGB image"
+                    }), 400
+        else:
+            data = Box(request.get_json())
 
         if not data.email or not data.query or not data.category:
             logger.warning("Missing required fields in request")
@@ -94,7 +59,9 @@ def cat_free():
         
         # Get user memory and generate response
         memory = get_memory_for_user(data.email)
-        recommendation = rag_pipeline(data.query, data.category, data.image_base64, memory)
+        deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER), PIPELINE_TIMEOUT)
+        recommendation = rag_pipeline(data.query, data.category, data.get("image_base64"), memory,
+                                      deadline=deadline, image=image)
         
         logger.info(f"Successfully generated recommendation for {data.email}")
 
@@ -1,6 +1,8 @@
 from flask import jsonify, request
 from . import api_blueprint
 from langchain_methods import rag_pipeline, get_memory_for_user
+from langchain_methods.rag_pipeline import PIPELINE_TIMEOUT
+from utils import Deadline, DEADLINE_HEADER
 from box import Box
 
 @api_blueprint.route("/handle_prompt", methods=["POST"])
@@ -15,7 +17,8 @@ def handle_prompt():
 
     memory = get_memory_for_user(data.email)
 
-    recommendation = rag_pipeline(data.query, data.category, data.image_base64, memory)
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER), PIPELINE_TIMEOUT)
+    recommendation = rag_pipeline(data.query, data.category, data.image_base64, memory, deadline=deadline)
 
     return jsonify({
         "message": "Successfully executed.",
@@ -0,0 +1,53 @@
+from flask import jsonify, request
+from . import api_blueprint
+from .shared import authorized, get_searcher
+from fashion_search import OutfitComposer
+from fashion_search.outfit_composer import slot_for_category
+from utils import Deadline, DEADLINE_HEADER
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+@api_blueprint.route("/compose_outfit", methods=["POST"])
+def compose_outfit():
+    """
+    Compose outfits locally by beam search:
+    {"text": .., "seed_item": {"category", "image_url" | "embedding"}, "style_profile": {..},
+     "filters": {..}, "slots": [..], "n_outfits": 3}
+    """
+    try:
+        if not authorized():
+            return jsonify({"error": "Invalid or expired token"}), 401
+
+        data = request.get_json() or {}
+        searcher = get_searcher()
+
+        seed_item = data.get("seed_item")
+        if seed_item:
+            seed_item = dict(seed_item)
+            if not seed_item.get("embedding") and seed_item.get("image_url"):
+                seed_item["embedding"] = searcher.embed(image=seed_item["image_url"]).tolist()
+            seed_item["slot"] = seed_item.get("slot") or slot_for_category(seed_item.get("category") or "")
+            if not seed_item.get("embedding"):
+                seed_item = None
+
+        if not data.get("text") and not seed_item:
+            return jsonify({"error": "text or a seed_item with an image is required"}), 400
+
+        deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER), 15)
+        outfits = OutfitComposer(searcher).compose(
+            text=data.get("text"),
+            seed_item=seed_item,
+            style_profile=data.get("style_profile"),
+            filters=data.get("filters"),
+            slots=data.get("slots"),
+            n_outfits=int(data.get("n_outfits", 3)),
+            deadline=deadline
+        )
+        return jsonify({"outfits": outfits}), 200
+
+    except Exception as e:
+        logger.error(f"Error composing outfit: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
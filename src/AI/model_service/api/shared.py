@@ -0,0 +1,21 @@
+from flask import request
+from fashion_search import CategoryFreeSearch
+from utils import verify_token
+
+# Loading FashionCLIP is the expensive part, so one searcher serves every request
+_searcher = None
+
+
+def get_searcher():
+    global _searcher
+    if _searcher is None:
+        _searcher = CategoryFreeSearch()
+    return _searcher
+
+
+def authorized():
+    """Whether the request carries a valid Bearer token"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return False
+    return bool(verify_token(auth_header.split(' ')[1]))
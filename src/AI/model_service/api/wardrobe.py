@@ -0,0 +1,82 @@
+from flask import jsonify, request
+from . import api_blueprint
+from .shared import authorized, get_searcher
+from fashion_search.rerank import dense_vector
+from utils import Deadline, DEADLINE_HEADER, decode_base64_image
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+@api_blueprint.route("/embed", methods=["POST"])
+def embed():
+    """FashionCLIP vector for a wardrobe item: {"image_url": ..} or {"text": ..}"""
+    try:
+        if not authorized():
+            return jsonify({"error": "Invalid or expired token"}), 401
+
+        data = request.get_json() or {}
+        if not data.get("image_url") and not data.get("text"):
+            return jsonify({"error": "image_url or text is required"}), 400
+
+        image = data.get("image_url") or None
+        if image and image.startswith("data:"):
+            # Photos uploaded from the browser are stored inline; decode instead of downloading
+            try:
+                image = decode_base64_image(image)
+            except Exception as e:
+                return jsonify({"error": f"Invalid image data URL: {str(e)}"}), 400
+        vector = get_searcher().embed(image=image, text=data.get("text"))
+        return jsonify({"embedding": vector.tolist(), "model": "fashion-clip"}), 200
+
+    except Exception as e:
+        logger.error(f"Error embedding item: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
+
+
+@api_blueprint.route("/complete_outfit", methods=["POST"])
+def complete_outfit():
+    """
+    Catalogue items that complement a set of wardrobe vectors:
+    {"vectors": [[..], ..], "owned_categories": [..], "n_results": 10, "filters": {..}}
+    """
+    try:
+        if not authorized():
+            return jsonify({"error": "Invalid or expired token"}), 401
+
+        data = request.get_json() or {}
+        vectors = data.get("vectors") or []
+        if not vectors:
+            return jsonify({"error": "vectors is required"}), 400
+
+        deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER), 15)
+        results = get_searcher().complete_outfit(
+            vectors,
+            owned_categories=data.get("owned_categories"),
+            n_results=int(data.get("n_results", 10)),
+            filters=data.get("filters"),
+            deadline=deadline
+        )
+
+        items = []
+        for result, collection_name in results:
+            payload = result.payload or {}
+            items.append({
+                "id": str(payload.get("product_id") or f"{collection_name}:{result.id}"),
+                "key": f"{collection_name}:{result.id}",
+                "name": payload.get("product_name", "N/A"),
+                "price": payload.get("price"),
+                "image_url": payload.get("image_url", ""),
+                "link": payload.get("link"),
+                "category": payload.get("category") or collection_name.replace("clip_", ""),
+                "color": payload.get("color", []),
+                "collection": collection_name,
+                "score": result.score,
+                "embedding": dense_vector(result)
+            })
+        return jsonify({"items": items}), 200
+
+    except Exception as e:
+        logger.error(f"Error completing outfit: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": "Internal server error", "details": str(e)}), 500
@@ -1,4 +1,5 @@
 from .image_to_image import ImageToImageSearch
 from .image_to_text import ImageToTextGenerator
 from .text_to_image import TextToImageSearch
-from .categoryfree_search import CategoryFreeSearch
\ No newline at end of file
+from .categoryfree_search import CategoryFreeSearch
+from .outfit_composer import OutfitComposer
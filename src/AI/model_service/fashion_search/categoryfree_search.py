@@ -1,18 +1,35 @@
 import io
 import numpy as np
 import requests
-from typing import List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 from PIL import Image
 from qdrant_client import QdrantClient, models
 from fashion_clip.fashion_clip import FashionCLIP
 import os
 from dotenv import load_dotenv
+from .image_preprocessing import load_clip_image, clip_resize_crop, encode_image_batch
+from .embedding_cache import get_embedding_cache, content_key, image_key, url_key
+from .sparse_text import query_sparse_vector
+from .collection_layout import get_collection_layout
+from .search_params import search_params
+from .search_filters import build_search_filter, collections_for_categories, collections_excluding_categories
+from .rerank import mmr_rerank, dense_vector
 import random
 import re
 
 
 load_dotenv()
 
+# Below these remaining request budgets (seconds) the search degrades instead of overrunning
+BOOST_MIN_BUDGET = float(os.getenv("SEARCH_BOOST_MIN_BUDGET", "3"))
+COLLECTION_MIN_BUDGET = float(os.getenv("SEARCH_COLLECTION_MIN_BUDGET", "0.5"))
+
+# "hybrid" fuses dense FashionCLIP and sparse BM25 rankings; "dense" keeps the keyword/boost search
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid")
+RRF_K = 60
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# Candidates fetched per requested result so MMR has room to trade relevance for diversity
+MMR_OVERFETCH = int(os.getenv("MMR_OVERFETCH", "3"))
 
 class CategoryFreeSearch:
     def __init__(self):
@@ -23,23 +40,42 @@ class CategoryFreeSearch:
         
         self.client = QdrantClient(url=VECTORDB_URL, api_key=api_key)
         self.fclip = FashionCLIP('fashion-clip')
+        self.embedding_cache = get_embedding_cache('fashion-clip')
+    
+    def _embed_image(self, img: Image.Image) -> np.ndarray:
+        img_emb = encode_image_batch(self.fclip, [img])[0]
+        norm = np.linalg.norm(img_emb)
+        return img_emb if norm == 0 else img_emb / norm
     
-    def _get_image_embedding(self, image_input: Union[str, Image.Image]) -> np.ndarray:
+    def _get_image_embedding(self, image_input: Union[str, Image.Image], timeout: float = 10) -> np.ndarray:
+        # Repeat images cost a hash lookup instead of a forward pass; URLs are checked before downloading
+        cache = self.embedding_cache
         if isinstance(image_input, str):
+            cached = cache.get(url_key(image_input))
+            if cached is not None:
+                return cached
             headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(image_input, headers=headers, timeout=10)
+            response = requests.get(image_input, headers=headers, timeout=timeout)
             response.raise_for_status()
             if 'image' not in response.headers.get('Content-Type', ''):
                 raise ValueError("URL does not point to a valid image")
-            img = Image.open(io.BytesIO(response.content)).convert('RGB').resize((224, 224))
+            key = content_key(response.content)
+            img_emb = cache.get(key)
+            if img_emb is None:
+                img_emb = self._embed_image(load_clip_image(response.content))
+                cache.put(key, img_emb)
+            cache.put(url_key(image_input), img_emb)
+            return img_emb
         elif isinstance(image_input, Image.Image):
-            img = image_input.convert('RGB').resize((224, 224))
+            img = clip_resize_crop(image_input)
+            key = image_key(img)
+            img_emb = cache.get(key)
+            if img_emb is None:
+                img_emb = self._embed_image(img)
+                cache.put(key, img_emb)
+            return img_emb
         else:
             raise ValueError("Unsupported image input type")
-        
-        img_emb = self.fclip.encode_images([img], batch_size=1)[0]
-        norm = np.linalg.norm(img_emb)
-        return img_emb if norm == 0 else img_emb / norm
     
     def _get_text_embedding(self, text: str) -> np.ndarray:
         text_emb = self.fclip.encode_text([text], batch_size=1)[0]
@@ -74,12 +110,161 @@ class CategoryFreeSearch:
         norm = np.linalg.norm(boosted_emb)
         return boosted_emb.tolist() if norm == 0 else (boosted_emb / norm).tolist()
 
-    def search(self, text: Optional[str] = None, image: Optional[Union[str, Image.Image]] = None, n_results: int = 5) -> Optional[List[Tuple[models.ScoredPoint, str]]]:
+    def _hybrid_search(self, text: str, query_vector: List[float], collections: List[str], n_results: int, deadline=None,
+                       query_filter: Optional[models.Filter] = None) -> List[Tuple[models.ScoredPoint, str]]:
+        """
+        One round trip per collection for both the dense and the sparse candidates, then a single
+        reciprocal rank fusion over the whole catalog. Collections indexed before sparse vectors
+        existed contribute their dense ranking only. Dense candidates are scored by max-sim over
+        each product's images where the collection stores them, so every product appears once.
+        """
+        sparse_query = query_sparse_vector(text)
+        dense_hits = []
+        sparse_hits = []
+
+        for collection_name in collections:
+            if deadline is not None and not deadline.has(COLLECTION_MIN_BUDGET) and (dense_hits or deadline.expired()):
+                print(f"Request budget nearly spent - skipping remaining collections from {collection_name}")
+                break
+            try:
+                layout = get_collection_layout(self.client, collection_name)
+                use_sparse = bool(sparse_query.indices) and layout.sparse_name is not None
+                query_requests = [models.QueryRequest(
+                    **layout.dense_query(query_vector),
+                    filter=query_filter,
+                    limit=HYBRID_CANDIDATES,
+                    with_payload=True,
+                    with_vector=layout.with_vector,
+                    params=search_params()
+                )]
+                if use_sparse:
+                    query_requests.append(models.QueryRequest(
+                        query=sparse_query,
+                        using=layout.sparse_name,
+                        filter=query_filter,
+                        limit=HYBRID_CANDIDATES,
+                        with_payload=True,
+                        with_vector=layout.with_vector
+                    ))
+                responses = self.client.query_batch_points(
+                    collection_name=collection_name,
+                    requests=query_requests,
+                    timeout=deadline.remaining_seconds() if deadline else None
+                )
+            except Exception as e:
+                print(f"Error searching collection {collection_name}: {str(e)}")
+                continue
+
+            dense_hits.extend((point, collection_name) for point in responses[0].points)
+            if use_sparse:
+                sparse_hits.extend((point, collection_name) for point in responses[1].points)
+
+        fused = {}
+        for hits in (dense_hits, sparse_hits):
+            ranked = sorted(hits, key=lambda hit: hit[0].score, reverse=True)
+            for rank, (point, collection_name) in enumerate(ranked, 1):
+                entry = fused.setdefault((collection_name, point.id), [point, collection_name, 0.0])
+                entry[2] += 1.0 / (RRF_K + rank)
+
+        candidates = []
+        for point, collection_name, score in sorted(fused.values(), key=lambda entry: entry[2], reverse=True)[:n_results * MMR_OVERFETCH]:
+            point.score = score
+            candidates.append((point, collection_name))
+
+        results = self._diversify(candidates, query_vector, n_results)
+        print(f"Hybrid search fused {len(dense_hits)} dense and {len(sparse_hits)} sparse candidates into {len(results)} results")
+        return results
+
+    def _diversify(self, candidates: List[Tuple[models.ScoredPoint, str]], query_vector: List[float], n_results: int) -> List[Tuple[models.ScoredPoint, str]]:
+        """Dedupe by product, then pick a diverse top-n with MMR using the candidates' scores as relevance."""
+        unique = {}
+        for result, collection_name in candidates:
+            unique_id = result.payload.get('product_id') or (collection_name, result.id)
+            if unique_id not in unique or result.score > unique[unique_id][0].score:
+                unique[unique_id] = (result, collection_name)
+        candidates = list(unique.values())
+
+        order = mmr_rerank(
+            query_vector,
+            [dense_vector(result) for result, _ in candidates],
+            n_results,
+            relevance=[result.score for result, _ in candidates]
+        )
+        return [candidates[i] for i in order]
+
+    def embed(self, image: Optional[Union[str, Image.Image]] = None, text: Optional[str] = None) -> np.ndarray:
+        """Normalized FashionCLIP vector of an image (URL or PIL) or, failing that, a text description."""
+        if image is not None:
+            return self._get_image_embedding(image)
+        if text:
+            return self._get_text_embedding(text)
+        raise ValueError("Please provide an image or a text to embed.")
+
+    def complete_outfit(self, wardrobe_vectors: List[List[float]], owned_categories: Optional[List[str]] = None,
+                        n_results: int = 10, filters: Optional[Dict[str, Any]] = None,
+                        deadline=None) -> List[Tuple[models.ScoredPoint, str]]:
+        """
+        Catalogue items that go with a set of wardrobe items. Every wardrobe vector is searched in
+        one batched request per collection, skipping collections for categories already owned;
+        a product's relevance is its similarity summed over the wardrobe divided by the wardrobe
+        size, so pieces that match the whole wardrobe beat pieces that match one item closely.
+        """
+        vectors = np.asarray(wardrobe_vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) == 0:
+            raise ValueError("Please provide at least one wardrobe vector.")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        centroid = vectors.mean(axis=0).tolist()
+
+        collections = [col.name for col in self.client.get_collections().collections]
+        collections = collections_excluding_categories(collections_for_categories(collections, filters), owned_categories)
+        query_filter = build_search_filter(filters)
+
+        pooled = {}
+        for collection_name in collections:
+            if deadline is not None and not deadline.has(COLLECTION_MIN_BUDGET) and (pooled or deadline.expired()):
+                print(f"Request budget nearly spent - skipping remaining collections from {collection_name}")
+                break
+            try:
+                layout = get_collection_layout(self.client, collection_name)
+                responses = self.client.query_batch_points(
+                    collection_name=collection_name,
+                    requests=[models.QueryRequest(
+                        **layout.dense_query(vector.tolist()),
+                        filter=query_filter,
+                        limit=HYBRID_CANDIDATES,
+                        with_payload=True,
+                        with_vector=layout.with_vector,
+                        params=search_params()
+                    ) for vector in vectors],
+                    timeout=deadline.remaining_seconds() if deadline else None
+                )
+            except Exception as e:
+                print(f"Error searching collection {collection_name}: {str(e)}")
+                continue
+            for response in responses:
+                for point in response.points:
+                    entry = pooled.setdefault((collection_name, point.id), [point, collection_name, 0.0])
+                    entry[2] += point.score / len(vectors)
+
+        candidates = []
+        for point, collection_name, score in sorted(pooled.values(), key=lambda entry: entry[2], reverse=True)[:n_results * MMR_OVERFETCH]:
+            point.score = score
+            candidates.append((point, collection_name))
+        return self._diversify(candidates, centroid, n_results)
+
+    def search(self, text: Optional[str] = None, image: Optional[Union[str, Image.Image]] = None, n_results: int = 5, deadline=None,
+               filters: Optional[Dict[str, Any]] = None, image_embedding: Optional[List[float]] = None) -> Optional[List[Tuple[models.ScoredPoint, str]]]:
         """
         Perform a multimodal search across all collections by combining text and image embeddings.
         At least one modality must be provided.
+        Text queries run the hybrid dense + sparse search unless SEARCH_MODE is "dense".
+        `filters` (price_range, colors, categories, gender) are applied as an indexed payload
+        filter inside each ANN query; `image_embedding` is a precomputed FashionCLIP image vector.
+        If a request deadline is given, every vector search is bounded by the remaining budget;
+        when it runs low, embedding boosts are skipped and lower-priority collections are dropped.
         """
-        if not text and not image:
+        if not text and not image and image_embedding is None:
             raise ValueError("Please provide at least a text or image input.")
         
         # Print debug information for monitoring
@@ -88,7 +273,11 @@ class CategoryFreeSearch:
         embeddings = []
         if image:
             print("Processing image input...")
-            embeddings.append(self._get_image_embedding(image))
+            embeddings.append(self._get_image_embedding(image, timeout=deadline.timeout(cap=10) if deadline else 10))
+        if image_embedding is not None:
+            image_embedding = np.asarray(image_embedding, dtype=np.float32)
+            norm = np.linalg.norm(image_embedding)
+            embeddings.append(image_embedding if norm == 0 else image_embedding / norm)
         if text:
             print("Processing text input...")
             embeddings.append(self._get_text_embedding(text))
@@ -103,10 +292,17 @@ class CategoryFreeSearch:
             print(f"Error retrieving collections: {str(e)}")
             return None
         
-        valid_collections = [col.name for col in collections.collections]
+        valid_collections = collections_for_categories([col.name for col in collections.collections], filters)
         if not valid_collections:
             print("No valid collections found.")
             return None
+        query_filter = build_search_filter(filters)
+
+        if text and SEARCH_MODE == "hybrid":
+            results = self._hybrid_search(text, base_query_vector, valid_collections, n_results, deadline, query_filter)
+            if results:
+                return results
+            print("Hybrid search returned nothing - falling back to dense search")
 
         # Extract query keywords to improve search relevance
         query_keywords = []
@@ -290,8 +486,16 @@ class CategoryFreeSearch:
         
         all_results = []
         
+        # Embedding boosts cost an extra text encoding each, so they are the first thing dropped
+        allow_boosting = deadline is None or deadline.has(BOOST_MIN_BUDGET)
+        if not allow_boosting:
+            print("Request budget is low - skipping embedding boosts")
+        
         # Search across all collections with priority given to more relevant ones
         for collection_name in prioritized_collections:
+            if deadline is not None and not deadline.has(COLLECTION_MIN_BUDGET) and (all_results or deadline.expired()):
+                print(f"Request budget nearly spent - skipping remaining collections from {collection_name}")
+                break
             try:
                 # Use more results for specific categories
                 limit = results_per_specific if collection_name in specific_categories else results_per_general
@@ -303,27 +507,31 @@ class CategoryFreeSearch:
                 
                 # If this is a specific category we care about, boost the embedding for it
                 query_vector = base_query_vector
-                if collection_name in specific_categories:
+                if allow_boosting and collection_name in specific_categories:
                     query_vector = self._boost_embedding_for_category(base_query_vector, collection_name)
                     print(f"Applied category boosting for {collection_name}")
                 
                 # Apply color boosting if colors were found but no specific categories
-                if found_colors and not specific_categories and len(found_colors) == 1:
+                if allow_boosting and found_colors and not specific_categories and len(found_colors) == 1:
                     query_vector = self._boost_embedding_for_color(query_vector, found_colors[0])
                     print(f"Applied color boosting for {found_colors[0]}")
                 
                 # Apply outfit type boosting if this is an outfit search
-                if "outfit" in query_keywords and outfit_types and len(outfit_types) == 1:
+                if allow_boosting and "outfit" in query_keywords and outfit_types and len(outfit_types) == 1:
                     query_vector = self._boost_embedding_for_outfit(query_vector, outfit_types[0])
                     print(f"Applied outfit boosting for {outfit_types[0]}")
                 
-                results = self.client.search(
+                layout = get_collection_layout(self.client, collection_name)
+                results = self.client.query_points(
                     collection_name=collection_name,
-                    query_vector=query_vector,
-                    limit=limit,
+                    **layout.dense_query(query_vector),
+                    query_filter=query_filter,
+                    limit=limit * MMR_OVERFETCH,
                     with_payload=True,
-                    search_params=models.SearchParams(hnsw_ef=128)
-                )
+                    with_vectors=layout.with_vector,
+                    search_params=search_params(),
+                    timeout=deadline.remaining_seconds() if deadline else None
+                ).points
                 
                 if results:
                     print(f"Found {len(results)} results in {collection_name}")
@@ -343,60 +551,13 @@ class CategoryFreeSearch:
                 print(f"Error searching collection {collection_name}: {str(e)}")
                 continue
       
-        # Sort all results by score (descending, as higher is better)
-        sorted_results = sorted(all_results, key=lambda x: x[0].score, reverse=True)
-        print(f"Total results found across all collections: {len(sorted_results)}")
-        
-        # Debug the best results
-        if sorted_results:
-            print("Top 3 results by score:")
-            for i, (result, col) in enumerate(sorted_results[:3]):
-                print(f"{i+1}. {col} - {result.payload.get('product_name', 'N/A')} (score: {result.score})")
-        
-        # Deduplicate and get the top n_results
-        final_results = []
-        seen_ids = set()
-        
-        # First, ensure diversity by including at least one item from different categories if possible
-        added_categories = set()
-        diverse_results = []
-        
-        # Prioritize specific category results first
-        if specific_categories:
-            for result, col_name in sorted_results:
-                if col_name in specific_categories and col_name not in added_categories:
-                    diverse_results.append((result, col_name))
-                    added_categories.add(col_name)
-                    
-                    unique_id = result.payload.get('product_id') or result.id
-                    seen_ids.add(unique_id)
-                    
-                    if len(diverse_results) >= min(n_results, len(specific_categories)):
-                        break
-            
-        # Then add diversity from remaining categories
-        for result, col_name in sorted_results:
-            if col_name not in added_categories:
-                diverse_results.append((result, col_name))
-                added_categories.add(col_name)
-                
-                unique_id = result.payload.get('product_id') or result.id
-                seen_ids.add(unique_id)
-                
-                if len(diverse_results) >= min(n_results, len(prioritized_collections)):
-                    break
+        print(f"Total results found across all collections: {len(all_results)}")
         
-        # Then add remaining results based on score
-        for result, col_name in sorted_results:
-            unique_id = result.payload.get('product_id') or result.id
-            if unique_id not in seen_ids:
-                seen_ids.add(unique_id)
-                diverse_results.append((result, col_name))
-                
-            if len(diverse_results) >= n_results:
-                break
+        # Category-boosted scores are the relevance term; MMR spreads the top-n across
+        # categories and near-duplicates in one vectorized pass
+        diverse_results = self._diversify(all_results, base_query_vector, n_results)
         
-        print(f"Final diverse results: {len(diverse_results)} items from {len(added_categories)} categories")
+        print(f"Final diverse results: {len(diverse_results)} items from {len(set(col for _, col in diverse_results))} categories")
         for i, (result, col_name) in enumerate(diverse_results):
             print(f"Result {i+1}: {col_name} - {result.payload.get('product_name', 'N/A')}")
             
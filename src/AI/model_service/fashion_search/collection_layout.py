@@ -0,0 +1,65 @@
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+from qdrant_client import QdrantClient, models
+
+from .sparse_text import SPARSE_VECTOR_NAME
+
+# Vector names written by ingestion (model_structure DatabaseService)
+MEAN_VECTOR_NAME = "mean"
+IMAGES_VECTOR_NAME = "images"
+
+
+class CollectionLayout:
+    """
+    Which vectors a collection carries. Older collections hold one unnamed mean-of-images
+    vector; newer ones add a per-image multivector scored with MAX_SIM and a sparse text vector.
+    """
+
+    def __init__(self, dense_name: Optional[str] = None, multivector_name: Optional[str] = None, sparse_name: Optional[str] = None):
+        self.dense_name = dense_name
+        self.multivector_name = multivector_name
+        self.sparse_name = sparse_name
+
+    @classmethod
+    def from_collection_info(cls, info: models.CollectionInfo) -> "CollectionLayout":
+        vectors = info.config.params.vectors
+        sparse_vectors = info.config.params.sparse_vectors or {}
+        sparse_name = SPARSE_VECTOR_NAME if SPARSE_VECTOR_NAME in sparse_vectors else None
+        if not isinstance(vectors, dict):
+            return cls(sparse_name=sparse_name)
+
+        dense_name = MEAN_VECTOR_NAME if MEAN_VECTOR_NAME in vectors else None
+        multivector_name = None
+        images = vectors.get(IMAGES_VECTOR_NAME)
+        if images is not None and images.multivector_config is not None:
+            multivector_name = IMAGES_VECTOR_NAME
+        return cls(dense_name=dense_name or multivector_name, multivector_name=multivector_name, sparse_name=sparse_name)
+
+    def dense_query(self, vector: List[float]) -> Dict[str, Any]:
+        """query/using arguments for a dense query; products are scored by max-sim over their images when possible."""
+        if self.multivector_name:
+            return {"query": [vector], "using": self.multivector_name}
+        return {"query": vector, "using": self.dense_name}
+
+    @property
+    def with_vector(self) -> Union[bool, List[str]]:
+        """Fetch only the single product vector, never the per-image block."""
+        if self.dense_name and self.dense_name != self.multivector_name:
+            return [self.dense_name]
+        return True
+
+
+_layouts: Dict[str, CollectionLayout] = {}
+_layouts_lock = threading.Lock()
+
+
+def get_collection_layout(client: QdrantClient, collection_name: str) -> CollectionLayout:
+    """Cached per process; collections do not change shape while the service runs."""
+    with _layouts_lock:
+        layout = _layouts.get(collection_name)
+    if layout is None:
+        layout = CollectionLayout.from_collection_info(client.get_collection(collection_name))
+        with _layouts_lock:
+            _layouts[collection_name] = layout
+    return layout
@@ -0,0 +1,148 @@
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+from cachetools import LRUCache
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+# Leave empty to keep the cache in memory only
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(tempfile.gettempdir(), "embedding_cache"))
+# The disk tier is pruned, least recently used first, once it grows past this size
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# An image can be replaced at the same URL, so URL-keyed entries expire; content keys never go stale
+EMBEDDING_URL_TTL = float(os.getenv("EMBEDDING_URL_TTL", str(24 * 3600)))
+URL_KEY_PREFIX = "url-"
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def image_key(image: Image.Image) -> str:
+    """Key a decoded image by its pixels, so the same upload hits regardless of transport."""
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def url_key(url: str) -> str:
+    return URL_KEY_PREFIX + hashlib.sha256(url.encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for image embeddings: an in-process LRU in front of one .npy file
+    per key on disk. Entries are namespaced by model so switching models never serves
+    stale vectors. The disk tier is bounded by max_bytes (least recently read files go
+    first), URL-keyed entries expire after url_ttl seconds, and callers get copies.
+    """
+
+    def __init__(self, namespace: str, max_items: int = EMBEDDING_CACHE_SIZE, cache_dir: Optional[str] = EMBEDDING_CACHE_DIR,
+                 max_bytes: int = EMBEDDING_CACHE_MAX_BYTES, url_ttl: float = EMBEDDING_URL_TTL):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.url_ttl = url_ttl
+        # key -> (vector, time it was computed)
+        self._memory = LRUCache(maxsize=max_items)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._dir = Path(cache_dir) / namespace if cache_dir else None
+        if self._dir is not None:
+            self._dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self._dir / key[-2:] / f"{key}.npy"
+
+    def _expired(self, key: str, stored_at: float) -> bool:
+        return key.startswith(URL_KEY_PREFIX) and time.time() - stored_at > self.url_ttl
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(key, entry[1]):
+                del self._memory[key]
+                entry = None
+        if entry is not None:
+            return entry[0].copy()
+        if self._dir is None:
+            return None
+
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        # mtime is when the vector was written, atime when it was last read (for pruning)
+        if self._expired(key, stat.st_mtime):
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            vector = np.load(path)
+            os.utime(path, (time.time(), stat.st_mtime))
+        except Exception as e:
+            logger.warning(f"Dropping unreadable embedding cache entry {path}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+        with self._lock:
+            self._memory[key] = (vector, stat.st_mtime)
+        return vector.copy()
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        vector = np.array(vector, copy=True)
+        with self._lock:
+            self._memory[key] = (vector, time.time())
+        if self._dir is None:
+            return
+
+        path = self._path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial array
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, vector)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not persist embedding cache entry {key}: {str(e)}")
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % 100 == 0
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        try:
+            stats = [(path, path.stat()) for path in self._dir.glob("*/*.npy")]
+        except OSError:
+            return
+        total = sum(stat.st_size for _, stat in stats)
+        for path, stat in sorted(stats, key=lambda item: item[1].st_atime):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= stat.st_size
+            except OSError:
+                pass
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(namespace: str) -> EmbeddingCache:
+    """Process-wide cache per model namespace; searchers are created per request and share it."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = EmbeddingCache(namespace)
+        return _caches[namespace]
@@ -0,0 +1,73 @@
+import io
+from typing import List, Union
+
+import numpy as np
+from PIL import Image
+
+# Matches the CLIPProcessor config shipped with FashionCLIP (ViT-B/32)
+CLIP_IMAGE_SIZE = 224
+CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32).reshape(3, 1, 1)
+CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32).reshape(3, 1, 1)
+
+
+def open_image(data: Union[bytes, io.BytesIO], size: int = CLIP_IMAGE_SIZE) -> Image.Image:
+    """
+    Open encoded image bytes at the smallest resolution that still covers `size`.
+    JPEGs are decoded in draft mode (DCT scaling), other formats are shrunk with an
+    integer `reduce`, so a 12MP phone photo never gets fully decoded just to be thrown away.
+    """
+    image = Image.open(data if isinstance(data, io.BytesIO) else io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("RGB", (size, size))
+    else:
+        factor = min(image.size) // size
+        if factor >= 2:
+            # reduce only handles 8-bit RGB(A)/L(A); palette, bilevel and 16-bit images are converted first
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGB")
+            image = image.reduce(factor)
+    return image.convert("RGB")
+
+
+def clip_resize_crop(image: Image.Image, size: int = CLIP_IMAGE_SIZE) -> Image.Image:
+    """Resize the shorter side to `size` (bicubic) and center-crop, as the CLIP processor does."""
+    image = image.convert("RGB")
+    width, height = image.size
+    if (width, height) == (size, size):
+        return image
+
+    scale = size / min(width, height)
+    resized = (max(size, round(width * scale)), max(size, round(height * scale)))
+    image = image.resize(resized, resample=Image.Resampling.BICUBIC)
+
+    left = (resized[0] - size) // 2
+    top = (resized[1] - size) // 2
+    return image.crop((left, top, left + size, top + size))
+
+
+def load_clip_image(data: Union[bytes, io.BytesIO], size: int = CLIP_IMAGE_SIZE) -> Image.Image:
+    """Reduced-resolution decode followed by the CLIP resize/crop."""
+    return clip_resize_crop(open_image(data, size), size)
+
+
+def to_pixel_batch(images: List[Image.Image]) -> np.ndarray:
+    """Stack preprocessed images into a normalized float32 (N, 3, H, W) array."""
+    batch = np.stack([np.asarray(clip_resize_crop(image), dtype=np.float32) for image in images])
+    batch = batch.transpose(0, 3, 1, 2) / 255.0
+    return (batch - CLIP_MEAN) / CLIP_STD
+
+
+def encode_image_batch(fclip, images: List[Image.Image], batch_size: int = 32) -> np.ndarray:
+    """
+    Embed images with FashionCLIP from already preprocessed pixels, skipping the
+    processor's second resize. Returns unnormalized embeddings, like `encode_images`.
+    """
+    import torch
+
+    embeddings = []
+    with torch.no_grad():
+        for start in range(0, len(images), batch_size):
+            pixels = torch.from_numpy(to_pixel_batch(images[start:start + batch_size])).to(fclip.device)
+            features = fclip.model.get_image_features(pixel_values=pixels)
+            embeddings.append(features.cpu().numpy())
+    return np.concatenate(embeddings)
@@ -7,6 +7,10 @@ from qdrant_client import QdrantClient, models
 from fashion_clip.fashion_clip import FashionCLIP
 import os
 from dotenv import load_dotenv
+from .image_preprocessing import encode_image_batch, clip_resize_crop
+from .embedding_cache import get_embedding_cache, image_key
+from .collection_layout import get_collection_layout
+from .search_params import search_params
 
 
 load_dotenv()
@@ -22,8 +26,9 @@ class ImageToImageSearch:
         
         self.client = QdrantClient(url=VECTORDB_URL, api_key=api_key)
         self.fclip = FashionCLIP('fashion-clip')
+        self.embedding_cache = get_embedding_cache('fashion-clip')
     
-    def search(self, image:Image , collection_name: str, n_results: int = 5) -> Optional[List[Tuple[models.ScoredPoint, str]]]:
+    def search(self, image:Image , collection_name: str, n_results: int = 5, timeout: Optional[int] = None) -> Optional[List[Tuple[models.ScoredPoint, str]]]:
         headers = {'User-Agent': 'Mozilla/5.0'}
         # response = requests.get(image_url, headers=headers, timeout=10)
         # response.raise_for_status()
@@ -32,16 +37,24 @@ class ImageToImageSearch:
         #     raise ValueError("URL does not point to a valid image")
 
         # img = Image.open(io.BytesIO(response.content)).convert('RGB').resize((224, 224))
-        img_emb = self.fclip.encode_images([image], batch_size=1)[0]
-        img_emb_normalized = img_emb / np.linalg.norm(img_emb)
+        image = clip_resize_crop(image)
+        key = image_key(image)
+        img_emb_normalized = self.embedding_cache.get(key)
+        if img_emb_normalized is None:
+            img_emb = encode_image_batch(self.fclip, [image])[0]
+            img_emb_normalized = img_emb / np.linalg.norm(img_emb)
+            self.embedding_cache.put(key, img_emb_normalized)
 
-        results = self.client.search(
+        # Max-sim over each product's images where the collection stores them, one hit per product
+        layout = get_collection_layout(self.client, collection_name)
+        results = self.client.query_points(
             collection_name=collection_name,
-            query_vector=img_emb_normalized.tolist(),
+            **layout.dense_query(img_emb_normalized.tolist()),
             limit=n_results,
             with_payload=True,
-            search_params=models.SearchParams(hnsw_ef=128)
-        )
+            search_params=search_params(),
+            timeout=timeout
+        ).points
 
         sorted_results = sorted(results, key=lambda x: x.score)[:n_results]
 
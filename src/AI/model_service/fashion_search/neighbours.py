@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Written by `python -m model_structure build-neighbours`
+NEIGHBOUR_INDEX_DIR = Path(os.getenv(
+    "NEIGHBOUR_INDEX_DIR",
+    str(Path(__file__).resolve().parents[4] / "artifacts" / "neighbours")
+))
+
+
+class NeighbourGraph:
+    """One published version of the graph. Never modified after loading, so readers can hold it across a swap."""
+
+    def __init__(self, version: str, items: List[dict], ids: np.ndarray, scores: np.ndarray):
+        self.version = version
+        self.items = items
+        self.rows: Dict[str, int] = {item["key"]: row for row, item in enumerate(items)}
+        self.ids = ids
+        self.scores = scores
+
+
+class NeighbourIndex:
+    """
+    Read side of the precomputed item-to-item similarity graph. Neighbour ids and scores are
+    memory-mapped, so a lookup is a row read; the live version is re-checked on access and
+    swapped in when the offline job publishes a refresh.
+    """
+
+    def __init__(self, root: Path = NEIGHBOUR_INDEX_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        # Replaced as a whole, never mutated, so a lookup sees one version from start to end
+        self._graph: Optional[NeighbourGraph] = None
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            return (self.root / "CURRENT").read_text().strip()
+        except OSError:
+            return None
+
+    def _load(self, version: str) -> NeighbourGraph:
+        version_dir = self.root / version
+        with open(version_dir / "items.json") as f:
+            items = json.load(f)
+        with open(version_dir / "meta.json") as f:
+            top_k = json.load(f)["top_k"]
+        shape = (len(items), top_k)
+        ids = np.memmap(version_dir / "ids.int32", dtype=np.int32, mode="r", shape=shape)
+        scores = np.memmap(version_dir / "scores.float16", dtype=np.float16, mode="r", shape=shape)
+        logger.info(f"Loaded neighbour graph {version}: {len(items)} items")
+        return NeighbourGraph(version, items, ids, scores)
+
+    def _refresh(self) -> Optional[NeighbourGraph]:
+        graph = self._graph
+        version = self._current_version()
+        if version is None or (graph is not None and graph.version == version):
+            return graph
+        with self._lock:
+            graph = self._graph
+            if graph is None or graph.version != version:
+                try:
+                    graph = self._load(version)
+                    self._graph = graph
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Could not load neighbour graph {version}: {str(e)}")
+        return graph
+
+    def similar(self, key: str, n: int = 5) -> List[dict]:
+        """Neighbours of a catalogue item keyed "<collection>:<point id>", best first."""
+        graph = self._refresh()
+        if graph is None:
+            return []
+        row = graph.rows.get(key)
+        if row is None:
+            return []
+        neighbours = []
+        for neighbour, score in zip(graph.ids[row], graph.scores[row]):
+            if neighbour < 0:
+                continue
+            item = graph.items[neighbour]
+            neighbours.append({"id": item["key"], "name": item["name"], "image_url": item["image_url"], "score": float(score)})
+            if len(neighbours) >= n:
+                break
+        return neighbours
+
+
+_index: Optional[NeighbourIndex] = None
+
+
+def get_neighbour_index() -> NeighbourIndex:
+    global _index
+    if _index is None:
+        _index = NeighbourIndex()
+    return _index
@@ -0,0 +1,240 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client import models
+
+from .collection_layout import get_collection_layout
+from .rerank import dense_vector
+from .search_filters import SLOTS, build_search_filter, slot_for_category
+from .search_params import search_params
+
+BEAM_WIDTH = int(os.getenv("OUTFIT_BEAM_WIDTH", "16"))
+SLOT_CANDIDATES = int(os.getenv("OUTFIT_SLOT_CANDIDATES", "24"))
+# Outfit score = QUERY_WEIGHT * mean query similarity + (1 - QUERY_WEIGHT) * mean pairwise compatibility
+QUERY_WEIGHT = float(os.getenv("OUTFIT_QUERY_WEIGHT", "0.5"))
+PREFERRED_COLOR_BONUS = float(os.getenv("OUTFIT_PREFERRED_COLOR_BONUS", "0.05"))
+
+# StyleProfile fills this in when the user never set a budget, so it is not a constraint
+DEFAULT_BUDGET_RANGE = {"min": 0, "max": 1000}
+
+
+def _collection_gender(collection_name: str) -> str:
+    return "men" if "men_" in collection_name and "women_" not in collection_name else "women"
+
+
+def _seed_gender(seed_item: Dict[str, Any]) -> Optional[str]:
+    """Gender of a seed item when it is known: its gender field, or a men_/women_ collection or category"""
+    gender = str(seed_item.get("gender") or "").lower()
+    if gender in ("men", "women"):
+        return gender
+    for name in (seed_item.get("collection"), seed_item.get("category")):
+        name = str(name or "").lower()
+        if "women_" in name:
+            return "women"
+        if "men_" in name:
+            return "men"
+    return None
+
+
+class OutfitComposer:
+    """
+    Local outfit composition: one item per slot (top, bottom, shoes, outerwear) chosen by beam
+    search over per-slot candidate lists, fetched up front with one query per collection.
+
+    An outfit scores its mean query similarity plus the mean pairwise cosine between its items;
+    the pairwise matrix over all candidates is computed once, so extending every beam with every
+    candidate of the next slot is a single gather-and-sum. Disliked colors remove candidates,
+    preferred colors add a small bonus, the budget caps the outfit's total price, and men's and
+    women's collections are never mixed in one outfit or with a seed item of known gender.
+    """
+
+    def __init__(self, searcher, beam_width: int = BEAM_WIDTH, slot_candidates: int = SLOT_CANDIDATES):
+        self.searcher = searcher
+        self.client = searcher.client
+        self.beam_width = beam_width
+        self.slot_candidates = slot_candidates
+
+    def _query_vector(self, text: Optional[str], image, seed_vector: Optional[Sequence[float]]) -> np.ndarray:
+        embeddings = []
+        if image is not None:
+            embeddings.append(self.searcher._get_image_embedding(image))
+        if seed_vector is not None:
+            seed = np.asarray(seed_vector, dtype=np.float32)
+            norm = np.linalg.norm(seed)
+            embeddings.append(seed if norm == 0 else seed / norm)
+        if text:
+            embeddings.append(self.searcher._get_text_embedding(text))
+        if not embeddings:
+            raise ValueError("Please provide a text, an image or a seed item to compose around.")
+        return np.mean(embeddings, axis=0)
+
+    def _candidates(self, query_vector: np.ndarray, slots: List[str], filters: Optional[Dict[str, Any]],
+                    disliked_colors: set, deadline=None) -> List[Tuple[str, models.ScoredPoint, str]]:
+        query_filter = build_search_filter({key: value for key, value in (filters or {}).items() if key != "price_range"})
+        candidates = []
+        for collection in self.client.get_collections().collections:
+            slot = slot_for_category(collection.name)
+            if slot not in slots:
+                continue
+            if deadline is not None and deadline.expired():
+                break
+            layout = get_collection_layout(self.client, collection.name)
+            try:
+                points = self.client.query_points(
+                    collection_name=collection.name,
+                    **layout.dense_query(query_vector.tolist()),
+                    query_filter=query_filter,
+                    limit=self.slot_candidates,
+                    with_payload=True,
+                    with_vectors=layout.with_vector,
+                    search_params=search_params(),
+                    timeout=deadline.remaining_seconds() if deadline else None
+                ).points
+            except Exception as e:
+                print(f"Error fetching outfit candidates from {collection.name}: {str(e)}")
+                continue
+            for point in points:
+                colors = {color.lower() for color in (point.payload or {}).get("color") or []}
+                if colors & disliked_colors:
+                    continue
+                candidates.append((slot, point, collection.name))
+        return candidates
+
+    def compose(self, text: Optional[str] = None, image=None, seed_item: Optional[Dict[str, Any]] = None,
+                style_profile: Optional[Dict[str, Any]] = None, filters: Optional[Dict[str, Any]] = None,
+                slots: Optional[List[str]] = None, n_outfits: int = 3, deadline=None) -> List[Dict[str, Any]]:
+        """
+        Best n_outfits distinct outfits. `seed_item` ({"slot", "embedding", ...}) is kept fixed
+        and its slot is not filled again; `filters` may carry a price_range whose max caps the
+        outfit total.
+        """
+        style_profile = style_profile or {}
+        slots = [slot for slot in (slots or list(SLOTS)) if slot in SLOTS]
+        seed_vector = (seed_item or {}).get("embedding")
+        if seed_item and seed_item.get("slot") in slots:
+            slots.remove(seed_item["slot"])
+
+        query_vector = self._query_vector(text, image, seed_vector)
+        disliked = {color.lower() for color in style_profile.get("disliked_colors") or []}
+        preferred = {color.lower() for color in style_profile.get("preferred_colors") or []}
+        budget = style_profile.get("budget_range") or {}
+        if budget == DEFAULT_BUDGET_RANGE:
+            budget = {}
+        price_range = (filters or {}).get("price_range") or {}
+        if not isinstance(price_range, dict):
+            price_range = dict(zip(("min", "max"), price_range))
+        max_total = price_range.get("max") if price_range.get("max") is not None else budget.get("max")
+        max_total = float(max_total) if max_total is not None else np.inf
+
+        candidates = self._candidates(query_vector, slots, filters, disliked, deadline)
+        if not candidates:
+            return []
+
+        vectors = np.zeros((len(candidates), len(query_vector)), dtype=np.float32)
+        for row, (_, point, _) in enumerate(candidates):
+            vector = dense_vector(point)
+            if vector is not None:
+                vectors[row] = vector
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+        query = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        query_scores = vectors @ query
+        for row, (_, point, _) in enumerate(candidates):
+            colors = {color.lower() for color in (point.payload or {}).get("color") or []}
+            if colors & preferred:
+                query_scores[row] += PREFERRED_COLOR_BONUS
+        prices = np.array([
+            point.payload.get("price") if isinstance((point.payload or {}).get("price"), (int, float)) else 0.0
+            for _, point, _ in candidates
+        ], dtype=np.float32)
+
+        # Pairwise compatibility of every candidate pair, computed once; mixed-gender pairs are
+        # masked separately so the scores stay finite whatever QUERY_WEIGHT is
+        compatibility = vectors @ vectors.T
+        genders = np.array([_collection_gender(collection) for _, _, collection in candidates])
+        mismatched = genders[:, None] != genders[None, :]
+
+        seed_compatibility = None
+        seed_mismatched = np.zeros(len(candidates), dtype=bool)
+        if seed_vector is not None:
+            seed = np.asarray(seed_vector, dtype=np.float32)
+            seed_compatibility = vectors @ (seed / (np.linalg.norm(seed) or 1.0))
+            seed_gender = _seed_gender(seed_item)
+            if seed_gender is not None:
+                seed_mismatched = genders != seed_gender
+
+        slot_rows = {slot: np.array([row for row, (s, _, _) in enumerate(candidates) if s == slot], dtype=np.int64) for slot in slots}
+        slot_order = [slot for slot in slots if len(slot_rows[slot])]
+
+        # Beam state: chosen rows (beam x depth), summed query score, summed pairwise score, total price
+        chosen = np.zeros((1, 0), dtype=np.int64)
+        query_sum = np.zeros(1, dtype=np.float32)
+        pair_sum = np.zeros(1, dtype=np.float32)
+        total_price = np.zeros(1, dtype=np.float32)
+        final_score = np.zeros(1, dtype=np.float32)
+        n_pairs = 0
+
+        for slot in slot_order:
+            rows = slot_rows[slot]
+            depth = chosen.shape[1]
+            # (beam, candidate) sums of compatibility with every item already in the beam
+            added_pairs = compatibility[chosen][:, :, rows].sum(axis=1) if depth else np.zeros((len(chosen), len(rows)), dtype=np.float32)
+            blocked = mismatched[chosen][:, :, rows].any(axis=1) if depth else np.zeros((len(chosen), len(rows)), dtype=bool)
+            blocked = blocked | seed_mismatched[rows][None, :]
+            if seed_compatibility is not None:
+                added_pairs = added_pairs + seed_compatibility[rows][None, :]
+            new_query = query_sum[:, None] + query_scores[rows][None, :]
+            new_pairs = pair_sum[:, None] + added_pairs
+            new_price = total_price[:, None] + prices[rows][None, :]
+            new_n_pairs = n_pairs + depth + (1 if seed_compatibility is not None else 0)
+
+            score = QUERY_WEIGHT * new_query / (depth + 1)
+            if new_n_pairs:
+                score = score + (1 - QUERY_WEIGHT) * new_pairs / new_n_pairs
+            score = np.where(blocked | (new_price > max_total), -np.inf, score)
+
+            flat = np.argsort(-score, axis=None)[:self.beam_width]
+            beams, picks = np.unravel_index(flat, score.shape)
+            keep = np.isfinite(score[beams, picks])
+            beams, picks = beams[keep], picks[keep]
+            if len(beams) == 0:
+                # Nothing in this slot fits the budget or the rest of the outfit: leave it empty
+                continue
+            chosen = np.concatenate([chosen[beams], rows[picks][:, None]], axis=1)
+            query_sum = new_query[beams, picks]
+            pair_sum = new_pairs[beams, picks]
+            total_price = new_price[beams, picks]
+            final_score = score[beams, picks]
+            n_pairs = new_n_pairs
+
+        if chosen.shape[1] == 0:
+            return []
+
+        outfits = []
+        for beam in range(min(n_outfits, len(chosen))):
+            items = []
+            for row in chosen[beam]:
+                slot, point, collection_name = candidates[row]
+                payload = point.payload or {}
+                items.append({
+                    "slot": slot,
+                    "id": str(payload.get("product_id") or f"{collection_name}:{point.id}"),
+                    "key": f"{collection_name}:{point.id}",
+                    "name": payload.get("product_name", "N/A"),
+                    "price": payload.get("price"),
+                    "image_url": payload.get("image_url", ""),
+                    "link": payload.get("link"),
+                    "category": payload.get("category") or collection_name.replace("clip_", ""),
+                    "color": payload.get("color", []),
+                    "collection": collection_name,
+                    "query_score": round(float(query_scores[row]), 4)
+                })
+            outfits.append({
+                "items": items,
+                "score": round(float(final_score[beam]), 4),
+                "compatibility": round(float(pair_sum[beam] / n_pairs), 4) if n_pairs else None,
+                "total_price": round(float(total_price[beam]), 2)
+            })
+        return outfits
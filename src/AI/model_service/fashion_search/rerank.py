@@ -0,0 +1,105 @@
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .collection_layout import MEAN_VECTOR_NAME, IMAGES_VECTOR_NAME
+
+# 1.0 ranks purely by relevance, 0.0 purely by novelty
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Share of the personalized ranking score that comes from the user's taste vector
+PERSONALIZATION_WEIGHT = float(os.getenv("PERSONALIZATION_WEIGHT", "0.3"))
+
+
+def dense_vector(point) -> Optional[List[float]]:
+    """The single dense product vector of a point fetched with vectors, whatever the collection layout."""
+    vector = point.vector
+    if isinstance(vector, dict):
+        vector = vector.get(MEAN_VECTOR_NAME) or vector.get("") or vector.get(IMAGES_VECTOR_NAME)
+    if vector and isinstance(vector[0], list):
+        # Per-image block only: use its centroid as the product's position for diversity
+        vector = np.mean(vector, axis=0).tolist()
+    return vector
+
+
+def _unit_matrix(vectors: Sequence[Optional[Sequence[float]]], dim: int) -> np.ndarray:
+    """Stack vectors into a row-normalized matrix; missing vectors become zero rows."""
+    matrix = np.zeros((len(vectors), dim), dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[i] = vector
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def _min_max(values: Sequence[float]) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float32)
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+
+def mmr_rerank(query_vector: Sequence[float],
+               candidate_vectors: Sequence[Optional[Sequence[float]]],
+               n_results: int,
+               relevance: Optional[Sequence[float]] = None,
+               lambda_: float = MMR_LAMBDA) -> List[int]:
+    """
+    Maximal Marginal Relevance over a candidate pool, returning the indices of the selected
+    candidates in order. Similarities are computed once as matrix products; each greedy step
+    is a vectorized update of every candidate's closest-selected similarity.
+
+    `relevance` overrides cosine-to-query as the relevance term (e.g. boosted or fused scores);
+    it is min-max scaled so it is on the same footing as the similarity penalty.
+    """
+    k = len(candidate_vectors)
+    if k == 0 or n_results <= 0:
+        return []
+
+    matrix = _unit_matrix(candidate_vectors, len(query_vector))
+
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        scores = matrix @ (query / query_norm if query_norm > 0 else query)
+    else:
+        scores = _min_max(relevance)
+
+    similarity = matrix @ matrix.T
+    max_similarity = np.full(k, -np.inf, dtype=np.float32)
+    available = np.ones(k, dtype=bool)
+    selected = []
+
+    for _ in range(min(n_results, k)):
+        # Nothing selected yet: the novelty penalty is zero and the pick is the most relevant item
+        penalty = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        mmr = lambda_ * scores - (1 - lambda_) * penalty
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, similarity[best])
+
+    return selected
+
+
+def taste_rerank(taste_vector: Sequence[float],
+                 candidate_vectors: Sequence[Optional[Sequence[float]]],
+                 relevance: Sequence[float],
+                 weight: float = PERSONALIZATION_WEIGHT) -> Tuple[List[int], List[float]]:
+    """
+    Personalized order of a candidate pool: one matrix-vector product gives every item's
+    cosine to the user's taste vector, which is blended with the min-max scaled relevance.
+    Returns the new order (indices) and each candidate's compatibility mapped to [0, 1].
+    """
+    if len(candidate_vectors) == 0:
+        return [], []
+    taste = np.asarray(taste_vector, dtype=np.float32)
+    taste_norm = np.linalg.norm(taste)
+    if taste_norm == 0:
+        return list(range(len(candidate_vectors))), [0.5] * len(candidate_vectors)
+
+    matrix = _unit_matrix(candidate_vectors, len(taste))
+    compatibility = (matrix @ (taste / taste_norm) + 1) / 2
+    blended = (1 - weight) * _min_max(relevance) + weight * compatibility
+    order = np.argsort(-blended, kind="stable")
+    return order.tolist(), compatibility.tolist()
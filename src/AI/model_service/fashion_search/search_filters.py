@@ -0,0 +1,111 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from qdrant_client import models
+
+# Collection name fragments that fill each outfit slot, in composition order
+SLOTS = {
+    "top": ["T-SHIRTS", "SHIRTS", "TOPS", "KNITWEAR", "SWEATERS_CARDIGANS", "HOODIES_SWEATSHIRTS", "POLO"],
+    "bottom": ["TROUSERS", "JEANS", "SHORTS", "SKIRTS"],
+    "shoes": ["SHOES"],
+    "outerwear": ["BLAZERS", "JACKETS", "COATS"],
+}
+
+
+def _as_list(value) -> List[Any]:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _category_key(category) -> str:
+    """Same normalisation as the `category_key` payload written at ingestion ('men_POLO SHIRTS' -> 'men_polo_shirts')"""
+    return re.sub(r"[^a-z0-9]+", "_", str(category).lower()).strip("_")
+
+
+def slot_for_category(category: str) -> Optional[str]:
+    """Outfit slot of a collection name or free-text category ("clip_men_SHOES", "Shirts")."""
+    name = category.upper().replace(" ", "_")
+    for slot, fragments in SLOTS.items():
+        # Longest fragment first so T-SHIRTS is not taken for SHIRTS
+        if any(name.endswith(fragment) for fragment in sorted(fragments, key=len, reverse=True)):
+            return slot
+    return None
+
+
+def build_search_filter(filters: Optional[Dict[str, Any]]) -> Optional[models.Filter]:
+    """
+    Translate request filters into a Qdrant payload filter over the indexed fields
+    written at ingestion (numeric `price`, keyword `category_key`/`gender`/`color`).
+
+    price_range accepts {"min": .., "max": ..} or a [min, max] pair; either bound may be None.
+    """
+    if not filters:
+        return None
+
+    conditions = []
+
+    price_range = filters.get("price_range")
+    if price_range:
+        if isinstance(price_range, dict):
+            low, high = price_range.get("min"), price_range.get("max")
+        else:
+            low, high = (list(price_range) + [None, None])[:2]
+        if low is not None or high is not None:
+            conditions.append(models.FieldCondition(
+                key="price",
+                range=models.Range(
+                    gte=float(low) if low is not None else None,
+                    lte=float(high) if high is not None else None
+                )
+            ))
+
+    colors = [color.lower() for color in _as_list(filters.get("colors"))]
+    if colors:
+        conditions.append(models.FieldCondition(key="color", match=models.MatchAny(any=colors)))
+
+    categories = [key for key in (_category_key(category) for category in _as_list(filters.get("categories"))) if key]
+    if categories:
+        conditions.append(models.FieldCondition(key="category_key", match=models.MatchAny(any=categories)))
+
+    gender = filters.get("gender")
+    if gender:
+        conditions.append(models.FieldCondition(key="gender", match=models.MatchAny(any=[gender.lower(), "unisex"])))
+
+    return models.Filter(must=conditions) if conditions else None
+
+
+def collections_for_categories(collections: List[str], filters: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Collections are split by category, so a category filter can also skip whole collections.
+    Falls back to every collection when no name matches, leaving the payload filter to do the work.
+    """
+    categories = _as_list(filters.get("categories")) if filters else []
+    if not categories:
+        return collections
+    wanted = [category.lower() for category in categories]
+    matching = [name for name in collections if any(name.lower().endswith(category) for category in wanted)]
+    return matching or collections
+
+
+def collections_excluding_categories(collections: List[str], categories: List[str]) -> List[str]:
+    """
+    Collections for categories other than the given ones, e.g. the pieces an outfit is still
+    missing. A category with an outfit slot excludes every collection of that slot (owning
+    "Shirts" fills the top, so T-SHIRTS goes too); any other category only excludes the collection
+    it names. Falls back to every collection when the exclusion would leave nothing.
+    """
+    owned = [category for category in _as_list(categories) if category]
+    if not owned:
+        return collections
+    owned_slots = {slot for slot in (slot_for_category(category) for category in owned) if slot}
+    owned_keys = {_category_key(category) for category in owned if not slot_for_category(category)}
+
+    def is_owned(name):
+        if slot_for_category(name) in owned_slots:
+            return True
+        key = _category_key(name)
+        return any(key == owned_key or key.endswith("_" + owned_key) for owned_key in owned_keys)
+
+    remaining = [name for name in collections if not is_owned(name)]
+    return remaining or collections
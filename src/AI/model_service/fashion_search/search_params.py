@@ -0,0 +1,22 @@
+import os
+
+from qdrant_client import models
+
+# Defaults mirror the `index` section of model_structure/configs/config.yaml used at ingestion
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF", "128"))
+SEARCH_QUANTIZATION_RESCORE = os.getenv("SEARCH_QUANTIZATION_RESCORE", "true").lower() == "true"
+SEARCH_QUANTIZATION_OVERSAMPLING = float(os.getenv("SEARCH_QUANTIZATION_OVERSAMPLING", "2.0"))
+
+
+def search_params() -> models.SearchParams:
+    """
+    HNSW search over the quantized index, with oversampled candidates rescored against the
+    original vectors. Qdrant ignores the quantization part for collections that are not quantized.
+    """
+    return models.SearchParams(
+        hnsw_ef=SEARCH_HNSW_EF,
+        quantization=models.QuantizationSearchParams(
+            rescore=SEARCH_QUANTIZATION_RESCORE,
+            oversampling=SEARCH_QUANTIZATION_OVERSAMPLING
+        )
+    )
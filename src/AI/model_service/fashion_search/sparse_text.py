@@ -0,0 +1,67 @@
+import re
+import zlib
+from collections import Counter
+from typing import List, Optional
+
+from qdrant_client import models
+
+# Kept identical to the ingestion copy in model_structure/utils/sparse_text.py:
+# term ids must match between indexed documents and queries.
+SPARSE_VECTOR_NAME = "text"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Typical token count of product_name + details; only used for length normalization
+BM25_AVG_DOC_LEN = 40.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "some", "that", "the", "this", "to", "want", "with", "looking",
+    "find", "show", "need", "please", "can", "you"
+}
+
+
+def _stem(token: str) -> str:
+    # Light plural folding so "dresses"/"dress" and "shoes"/"shoe" share a term
+    if len(token) > 4 and token.endswith("sses"):
+        return token[:-2]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text or not isinstance(text, str):
+        return []
+    text = text.lower()
+    # "t-shirt" and "tshirt" should meet in the middle
+    text = re.sub(r"\b([a-z])-([a-z]+)", r"\1\2", text)
+    return [_stem(token) for token in _TOKEN_RE.findall(text) if token not in _STOPWORDS]
+
+
+def term_id(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def document_sparse_vector(text: str) -> models.SparseVector:
+    """
+    BM25 term-frequency component for a document. IDF is applied by Qdrant
+    (the sparse vector is configured with Modifier.IDF), so it stays correct as the catalog grows.
+    """
+    tokens = tokenize(text)
+    counts = Counter(tokens)
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / BM25_AVG_DOC_LEN)
+    weights = {}
+    for token, tf in counts.items():
+        index = term_id(token)
+        weights[index] = weights.get(index, 0.0) + tf * (BM25_K1 + 1) / (tf + length_norm)
+    return models.SparseVector(indices=list(weights), values=list(weights.values()))
+
+
+def query_sparse_vector(text: str) -> models.SparseVector:
+    """Queries weight each distinct term once; the score is the sum of matched document weights x IDF."""
+    indices = sorted({term_id(token) for token in tokenize(text)})
+    return models.SparseVector(indices=indices, values=[1.0] * len(indices))
@@ -7,6 +7,8 @@ from qdrant_client import QdrantClient, models
 from fashion_clip.fashion_clip import FashionCLIP
 import os
 from dotenv import load_dotenv
+from .collection_layout import get_collection_layout
+from .search_params import search_params
 
 
 load_dotenv()
@@ -24,16 +26,19 @@ class TextToImageSearch:
         self.fclip = FashionCLIP('fashion-clip')
         self.collection_name = collection_name
 
-    def search(self, query_text: str, n_results: int = 5):
+    def search(self, query_text: str, n_results: int = 5, timeout: Optional[int] = None):
         """Perform text-to-image similarity search."""
         text_emb = self.fclip.encode_text([query_text], batch_size=1).ravel()
 
-        results = self.client.search(
+        layout = get_collection_layout(self.client, self.collection_name)
+        results = self.client.query_points(
             collection_name=self.collection_name,
-            query_vector=text_emb.tolist(),
+            **layout.dense_query(text_emb.tolist()),
             limit=n_results,
-            with_payload=True
-        )
+            with_payload=True,
+            search_params=search_params(),
+            timeout=timeout
+        ).points
 
         return results
 
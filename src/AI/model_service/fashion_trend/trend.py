@@ -18,7 +18,7 @@ class TrendFetcher:
         ]
         self.api_key = os.getenv("NEWS_API_KEY")
 
-    def get_current_trends(self) -> str:
+    def get_current_trends(self, timeout: float = 10) -> str:
         if not self.api_key:
             return "Current trends cannot be retrieved because NEWS_API_KEY is not set."
 
@@ -34,7 +34,7 @@ class TrendFetcher:
         }
 
         try:
-            response = requests.get(url, params=params)
+            response = requests.get(url, params=params, timeout=timeout)
             print(f"Request URL: {response.url}")
             print(f"Status Code: {response.status_code}")
             data = response.json()
@@ -72,7 +72,7 @@ class TrendFetcher:
         except Exception as err:
             return f"Error retrieving current trends: {err}"
         
-    def get_image_urls(self) -> str:
+    def get_image_urls(self, timeout: float = 10) -> str:
         if not self.api_key:
             return "Current trends cannot be retrieved because NEWS_API_KEY is not set."
         
@@ -88,7 +88,7 @@ class TrendFetcher:
         }
         
         try:
-            response = requests.get(url, params=params)
+            response = requests.get(url, params=params, timeout=timeout)
             response.raise_for_status()
             data = response.json()
             articles = data.get("articles", [])
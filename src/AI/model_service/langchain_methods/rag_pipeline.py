@@ -1,11 +1,36 @@
-from utils import decode_base64_image
+from utils import decode_base64_image, StageGraph, Deadline
 from fashion_search import TextToImageSearch, ImageToImageSearch
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_google_genai import GoogleGenerativeAI
 import os
 
-def rag_pipeline(query_text, category, image_base64=None, memory=None):
+PIPELINE_TIMEOUT = float(os.getenv("PIPELINE_TIMEOUT", "30"))
+# Budget kept back for the LLM call; with less than this left we answer from retrieval alone
+LLM_MIN_BUDGET = float(os.getenv("LLM_MIN_BUDGET", "4"))
+
+
+def _load_chat_history(memory):
+    if memory is None:
+        return []
+    return memory.load_memory_variables({})[memory.memory_key]
+
+
+def _image_search(image, category, deadline):
+    if image is None:
+        return []
+    image_searcher = ImageToImageSearch(os.getenv("VECTORDB_URL"), os.getenv("VECTORDB_API"))
+    return image_searcher.search(image, category, n_results=5, timeout=deadline.remaining_seconds())
+
+
+def _retrieval_only_answer(context_parts):
+    return (
+        "I couldn't put together a full styling answer in time, "
+        "but here are the products I found for you:\n" + "\n".join(context_parts)
+    )
+
+
+def rag_pipeline(query_text, category, image_base64=None, memory=None, deadline=None):
     """Retrieval-Augmented Generation (RAG) pipeline using LangChain with conversation history."""
     valid_categories = [
         "clip_BASICS", "clip_BLAZERS", "clip_DRESSES_JUMPSUITS", "clip_JACKETS", "clip_KNITWEAR", 
@@ -17,13 +42,20 @@ def rag_pipeline(query_text, category, image_base64=None, memory=None):
     ]
     if category not in valid_categories:
         raise ValueError("Invalid category selected!")
-    
+    deadline = deadline or Deadline(PIPELINE_TIMEOUT)
 
-    text_searcher = TextToImageSearch(collection_name=category)
-    text_results = text_searcher.search(query_text, n_results=5)
+    # Retrieval and memory loading are independent, so they run concurrently
+    # Retrieval gets the budget minus the LLM reserve, but never less than half of what is left
+    graph = StageGraph(timeout=max(deadline.remaining() - LLM_MIN_BUDGET, deadline.remaining() / 2))
+    graph.add("text_search", lambda: TextToImageSearch(collection_name=category).search(
+        query_text, n_results=5, timeout=deadline.remaining_seconds()), default=[])
+    graph.add("chat_history", lambda: _load_chat_history(memory), default=[])
+    graph.add("image", lambda: decode_base64_image(image_base64) if image_base64 else None)
+    graph.add("image_search", lambda image: _image_search(image, category, deadline), deps=["image"], default=[])
+    stage_results = graph.run()
 
     context_parts = ["Retrieved products based on the text query:"]
-    for result in text_results:
+    for result in stage_results["text_search"]:
         payload = result.payload
         context_parts.append(
             f"Product: {payload.get('product_name', 'N/A')}, "
@@ -33,13 +65,8 @@ def rag_pipeline(query_text, category, image_base64=None, memory=None):
 
 
     if image_base64:
-        
-        image = decode_base64_image(image_base64)
-        
-        image_searcher = ImageToImageSearch(os.getenv("VECTORDB_URL"), os.getenv("VECTORDB_API"))
-        image_results = image_searcher.search(image, category, n_results=5)
         context_parts.append("\nRetrieved products based on the image query:")
-        for result, col_name in image_results:
+        for result, col_name in stage_results["image_search"]:
             payload = result.payload
             context_parts.append(
                 f"Product: {payload.get('product_name', 'N/A')}, "
@@ -74,8 +101,26 @@ def rag_pipeline(query_text, category, image_base64=None, memory=None):
     )
     
     
-    llm = GoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.7, google_api_key=os.getenv("GOOGLE_API_KEY"))
-    chain = LLMChain(llm=llm, prompt=prompt, memory=memory)
-    response = chain.run(context=context_str, query_text=query_text, image_base64= image_base64, chat_history=memory)
+    degraded = False
+    if not deadline.has(LLM_MIN_BUDGET):
+        print(f"Request budget nearly spent ({deadline.remaining():.1f}s left) - returning retrieval-only answer")
+        response = _retrieval_only_answer(context_parts)
+        degraded = True
+    else:
+        llm = GoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.7, google_api_key=os.getenv("GOOGLE_API_KEY"),
+                                 timeout=deadline.remaining())
+        chain = LLMChain(llm=llm, prompt=prompt)
+        try:
+            response = chain.run(context=context_str, query_text=query_text, image_base64= image_base64, chat_history=stage_results["chat_history"])
+        except Exception as e:
+            if not deadline.expired():
+                raise
+            print(f"LLM call ran out of request budget: {str(e)}")
+            response = _retrieval_only_answer(context_parts)
+            degraded = True
+    
+    # A retrieval-only fallback is not something the assistant said; keep it out of later prompts
+    if memory is not None and not degraded:
+        memory.save_context({"query_text": query_text}, {"text": response})
     
     return response
\ No newline at end of file
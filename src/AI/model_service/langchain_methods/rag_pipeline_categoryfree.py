@@ -1,4 +1,4 @@
-from utils import decode_base64_image
+from utils import decode_base64_image, StageGraph, Deadline
 from fashion_search import TextToImageSearch, ImageToImageSearch, CategoryFreeSearch
 from fashion_trend import TrendFetcher
 from langchain.chains import LLMChain
@@ -6,12 +6,101 @@ from langchain.prompts import PromptTemplate
 from langchain_google_genai import GoogleGenerativeAI
 import os
 
-def rag_pipeline(query_text, category, image_base64=None, memory=None):
-    
-    trend_fetcher = TrendFetcher()
-    current_trends = trend_fetcher.get_current_trends()
-    image_urls = trend_fetcher.get_image_urls()
-    
+PIPELINE_TIMEOUT = float(os.getenv("PIPELINE_TIMEOUT", "30"))
+# Budget kept back for the LLM call; with less than this left we answer from retrieval alone
+LLM_MIN_BUDGET = float(os.getenv("LLM_MIN_BUDGET", "4"))
+
+
+def _load_chat_history(memory):
+    if memory is None:
+        return []
+    return memory.load_memory_variables({})[memory.memory_key]
+
+
+def _retrieval_only_answer(context_parts):
+    return (
+        "I couldn't put together a full styling answer in time, "
+        "but here are the products I found for you:\n" + "\n".join(context_parts)
+    )
+
+
+def _category_free_search(query_text, image_input, deadline=None):
+    context_parts = ["Retrieved products based on category-free search:"]
+    original_query = query_text  # Store the original query for reference
+    try:
+        # Extract keywords from query to help guide the category-free search
+        query_type = "general"
+        query_keywords = []
+        common_keywords = {
+            "dress": "DRESSES_JUMPSUITS",
+            "shirt": "SHIRTS",
+            "t-shirt": "T-SHIRTS",
+            "blazer": "BLAZERS",
+            "jacket": "JACKETS",
+            "trouser": "TROUSERS",
+            "pant": "TROUSERS",
+            "men": "men",
+            "women": "women",
+            "knitwear": "KNITWEAR",
+            "shoe": "SHOES"
+        }
+        
+        # Process query for better understanding
+        query_lower = query_text.lower()
+        for keyword, category_part in common_keywords.items():
+            if keyword in query_lower:
+                query_keywords.append(category_part)
+                
+        # Determine if we need to prioritize specific categories based on query
+        enhanced_query = query_text
+        if query_keywords:
+            # If we found relevant keywords, include them in the query for better search
+            enhanced_query = f"{query_text} {' '.join(query_keywords)}"
+            
+        searcher = CategoryFreeSearch() 
+        
+        # Print what we're searching for
+        print(f"Searching for: {enhanced_query} (original: {query_text})")
+        
+        # Use enhanced query for search
+        results = searcher.search(text=enhanced_query, image=image_input, n_results=5, deadline=deadline)
+        
+        if results:
+            # First, determine what categories were returned
+            found_categories = set([col_name for _, col_name in results])
+            context_parts.append(f"Found products across {len(found_categories)} different categories: {', '.join(found_categories)}")
+            
+            # Add the original query for context
+            context_parts.append(f"User's original search query: '{original_query}'")
+            
+            for result, col_name in results:
+                payload = result.payload
+                # Add the category to the product info for better context
+                context_parts.append(
+                    f"Product: {payload.get('product_name', 'N/A')} (Category: {col_name.replace('clip_', '')}), "
+                    f"Price: {payload.get('price', 'N/A')}, "
+                    f"Image URL: {payload.get('image_url', '')}"
+                )
+        else:
+            context_parts.append("No products found for the given query.")
+    except Exception as e:
+        context_parts.append(f"Error during category-free retrieval: {str(e)}")
+    return context_parts
+
+
+def _image_search(image, category, deadline):
+    if image is None:
+        return []
+    image_searcher = ImageToImageSearch(os.getenv("VECTORDB_URL"), os.getenv("VECTORDB_API"))
+    return image_searcher.search(image, category, n_results=5, timeout=deadline.remaining_seconds())
+
+
+def rag_pipeline(query_text, category, image_base64=None, memory=None, deadline=None, image=None):
+    """
+    `image` is an already decoded PIL image (the binary transport from the backend);
+    `image_base64` is still accepted for JSON callers and is only decoded when no image is given.
+    """
+    deadline = deadline or Deadline(PIPELINE_TIMEOUT)
     
     valid_categories = [
         "clip_BASICS", "clip_BLAZERS", "clip_DRESSES_JUMPSUITS", "clip_JACKETS", "clip_KNITWEAR", 
@@ -24,76 +113,37 @@ def rag_pipeline(query_text, category, image_base64=None, memory=None):
     if category not in valid_categories:
         raise ValueError("Invalid category selected!")
     
+    # Trend fetching, image decoding, retrieval and memory loading are independent,
+    # so they run concurrently and the LLM call only waits for the slowest of them
+    # Retrieval gets the budget minus the LLM reserve, but never less than half of what is left
+    trend_fetcher = TrendFetcher()
+    retrieval_budget = max(deadline.remaining() - LLM_MIN_BUDGET, deadline.remaining() / 2)
+    graph = StageGraph(timeout=retrieval_budget)
+    graph.add("trends", lambda: trend_fetcher.get_current_trends(timeout=deadline.timeout(cap=10)),
+              default="Current trends could not be retrieved.")
+    graph.add("trend_images", lambda: trend_fetcher.get_image_urls(timeout=deadline.timeout(cap=10)), default=[])
+    graph.add("chat_history", lambda: _load_chat_history(memory), default=[])
+    graph.add("image", lambda: image if image is not None else (decode_base64_image(image_base64) if image_base64 else None))
+    
+    if category == "No Category":
+        graph.add("category_free", lambda image: _category_free_search(query_text, image, deadline), deps=["image"],
+                  default=["Retrieved products based on category-free search:", "Category-free retrieval failed."],
+                  timeout_default=["Retrieved products based on category-free search:", "Category-free retrieval timed out."])
+    else:
+        graph.add("text_search", lambda: TextToImageSearch(collection_name=category).search(
+            query_text, n_results=5, timeout=deadline.remaining_seconds()), default=[])
+        graph.add("image_search", lambda image: _image_search(image, category, deadline), deps=["image"], default=[])
+    
+    stage_results = graph.run()
+    current_trends = stage_results["trends"]
+    
     context_parts = []
-    original_query = query_text  # Store the original query for reference
     
     if category == "No Category":
-        context_parts.append("Retrieved products based on category-free search:")
-        try:
-            # Extract keywords from query to help guide the category-free search
-            query_type = "general"
-            query_keywords = []
-            common_keywords = {
-                "dress": "DRESSES_JUMPSUITS",
-                "shirt": "SHIRTS",
-                "t-shirt": "T-SHIRTS",
-                "blazer": "BLAZERS",
-                "jacket": "JACKETS",
-                "trouser": "TROUSERS",
-                "pant": "TROUSERS",
-                "men": "men",
-                "women": "women",
-                "knitwear": "KNITWEAR",
-                "shoe": "SHOES"
-            }
-            
-            # Process query for better understanding
-            query_lower = query_text.lower()
-            for keyword, category_part in common_keywords.items():
-                if keyword in query_lower:
-                    query_keywords.append(category_part)
-                    
-            # Determine if we need to prioritize specific categories based on query
-            enhanced_query = query_text
-            if query_keywords:
-                # If we found relevant keywords, include them in the query for better search
-                enhanced_query = f"{query_text} {' '.join(query_keywords)}"
-                
-            image_input = decode_base64_image(image_base64) if image_base64 else None
-            searcher = CategoryFreeSearch() 
-            
-            # Print what we're searching for
-            print(f"Searching for: {enhanced_query} (original: {query_text})")
-            
-            # Use enhanced query for search
-            results = searcher.search(text=enhanced_query, image=image_input, n_results=5)
-            
-            if results:
-                # First, determine what categories were returned
-                found_categories = set([col_name for _, col_name in results])
-                context_parts.append(f"Found products across {len(found_categories)} different categories: {', '.join(found_categories)}")
-                
-                # Add the original query for context
-                context_parts.append(f"User's original search query: '{original_query}'")
-                
-                for result, col_name in results:
-                    payload = result.payload
-                    # Add the category to the product info for better context
-                    context_parts.append(
-                        f"Product: {payload.get('product_name', 'N/A')} (Category: {col_name.replace('clip_', '')}), "
-                        f"Price: {payload.get('price', 'N/A')}, "
-                        f"Image URL: {payload.get('image_url', '')}"
-                    )
-            else:
-                context_parts.append("No products found for the given query.")
-        except Exception as e:
-            context_parts.append(f"Error during category-free retrieval: {str(e)}")
+        context_parts.extend(stage_results["category_free"])
     else:
-        
-        text_searcher = TextToImageSearch(collection_name=category)
-        text_results = text_searcher.search(query_text, n_results=5)
         context_parts.append("Retrieved products based on the text query:")
-        for result in text_results:
+        for result in stage_results["text_search"]:
             payload = result.payload
             context_parts.append(
                 f"Product: {payload.get('product_name', 'N/A')}, "
@@ -102,12 +152,9 @@ def rag_pipeline(query_text, category, image_base64=None, memory=None):
             )
         
         
-        if image_base64:
-            image = decode_base64_image(image_base64)
-            image_searcher = ImageToImageSearch(os.getenv("VECTORDB_URL"), os.getenv("VECTORDB_API"))
-            image_results = image_searcher.search(image, category, n_results=5)
+        if image is not None or image_base64:
             context_parts.append("Retrieved products based on the image query:")
-            for result, col_name in image_results:
+            for result, col_name in stage_results["image_search"]:
                 payload = result.payload
                 context_parts.append(
                     f"Product: {payload.get('product_name', 'N/A')}, "
@@ -156,19 +203,39 @@ def rag_pipeline(query_text, category, image_base64=None, memory=None):
         """
     )
     
-    llm = GoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        temperature=0.7,
-        google_api_key=os.getenv("GOOGLE_API_KEY")
-    )
-    chain = LLMChain(llm=llm, prompt=prompt, memory=memory)
-    response = chain.run(
-        context=context_str,
-        query_text=query_text,
-        image_base64=image_base64,
-        trends=current_trends,
-        chat_history=memory
-    )
+    degraded = False
+    if not deadline.has(LLM_MIN_BUDGET):
+        print(f"Request budget nearly spent ({deadline.remaining():.1f}s left) - returning retrieval-only answer")
+        response = _retrieval_only_answer(context_parts)
+        degraded = True
+    else:
+        llm = GoogleGenerativeAI(
+            model="gemini-2.0-flash",
+            temperature=0.7,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            timeout=deadline.remaining()
+        )
+        # History was already loaded by its own stage, so the chain runs without memory
+        # and the turn is written back explicitly
+        chain = LLMChain(llm=llm, prompt=prompt)
+        try:
+            response = chain.run(
+                context=context_str,
+                query_text=query_text,
+                image_base64=image_base64,
+                trends=current_trends,
+                chat_history=stage_results["chat_history"]
+            )
+        except Exception as e:
+            if not deadline.expired():
+                raise
+            print(f"LLM call ran out of request budget: {str(e)}")
+            response = _retrieval_only_answer(context_parts)
+            degraded = True
+    
+    # A retrieval-only fallback is not something the assistant said; keep it out of later prompts
+    if memory is not None and not degraded:
+        memory.save_context({"query_text": query_text}, {"text": response})
     
     return response
 
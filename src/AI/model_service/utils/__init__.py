@@ -1 +1,5 @@
-from .decode_base64_image import decode_base64_image
\ No newline at end of file
+from .decode_base64_image import decode_base64_image
+from .decode_rgb_image import decode_rgb_image
+from .stage_graph import StageGraph
+from .deadline import Deadline, DEADLINE_HEADER
+from .auth import verify_token
@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import jwt
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+JWT_SECRET = os.getenv("JWT_SECRET")
+PUBLIC_KEY_PATH = os.getenv(
+    "PUBLIC_KEY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../web/backend/keys/public.pem")
+)
+# Only asked when no local key can verify a token (e.g. the public key is not mounted)
+BACKEND_AUTH_URL = os.getenv("BACKEND_AUTH_URL", "http://localhost:3001/auth/check")
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+
+def _load_public_key() -> Optional[str]:
+    try:
+        with open(PUBLIC_KEY_PATH, "r") as f:
+            return f.read()
+    except OSError as e:
+        logger.warning(f"Public key not loaded from {PUBLIC_KEY_PATH}: {str(e)}")
+        return None
+
+
+# Read once at import instead of on every request
+PUBLIC_KEY = _load_public_key()
+
+
+class DecodedTokenCache:
+    """
+    LRU of successfully verified tokens keyed by the token's sha256, each entry valid until the
+    token's own `exp`. Tokens without an `exp` claim are never cached.
+    """
+
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return dict(payload)
+
+    def put(self, token: str, payload: Dict[str, Any]):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(payload), float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+token_cache = DecodedTokenCache()
+
+
+def _decode_locally(token: str, algorithm: Optional[str]):
+    """(payload or None, whether a local key was available for the algorithm)."""
+    if algorithm == "RS256" and PUBLIC_KEY:
+        key = PUBLIC_KEY
+    elif algorithm == "HS256" and JWT_SECRET:
+        key = JWT_SECRET
+    else:
+        return None, False
+    try:
+        return jwt.decode(token, key, algorithms=[algorithm]), True
+    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
+        logger.warning(f"{algorithm} verification failed: {str(e)}")
+        return None, True
+
+
+def _verify_with_backend(token: str) -> Optional[Dict[str, Any]]:
+    try:
+        response = requests.get(BACKEND_AUTH_URL, headers={"Authorization": f"Bearer {token}"}, timeout=5)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not connect to backend auth service: {str(e)}")
+        return None
+    if not response.ok:
+        logger.warning(f"Backend auth service verification failed: {response.status_code}")
+        return None
+    return response.json().get("user") or None
+
+
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Decoded payload of a valid token, or None. Tokens are verified locally with the key for
+    their algorithm (public key for RS256, JWT_SECRET for HS256) and successful decodes are
+    cached until expiry; the backend is only asked when no local key applies.
+    """
+    try:
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
+
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+        except jwt.InvalidTokenError as e:
+            logger.warning(f"Malformed token: {str(e)}")
+            return None
+
+        payload, verified_locally = _decode_locally(token, algorithm)
+        if not verified_locally:
+            payload = _verify_with_backend(token)
+        if payload:
+            token_cache.put(token, payload)
+        return payload
+    except Exception as e:
+        logger.error(f"Unexpected error in token verification: {str(e)}")
+        return None
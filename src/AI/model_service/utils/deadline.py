@@ -0,0 +1,43 @@
+import math
+import time
+from typing import Optional
+
+# Remaining budget in milliseconds; relative so clock skew between services does not matter
+DEADLINE_HEADER = "X-Request-Budget-Ms"
+
+
+class Deadline:
+    """Per-request time budget that downstream calls derive their timeouts from."""
+
+    def __init__(self, budget_seconds: float):
+        self._expires_at = time.monotonic() + max(0.0, budget_seconds)
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default_seconds: float) -> "Deadline":
+        """Build a deadline from the incoming budget header, falling back to a local default."""
+        try:
+            budget = float(value) / 1000.0
+        except (TypeError, ValueError):
+            return cls(default_seconds)
+        return cls(min(budget, default_seconds))
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def remaining_seconds(self) -> int:
+        """Remaining budget as whole seconds (at least 1), for clients that only take integers."""
+        return max(1, math.ceil(self.remaining()))
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Remaining budget usable as an HTTP timeout, optionally capped."""
+        remaining = max(0.1, self.remaining())
+        return remaining if cap is None else min(cap, remaining)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def to_header(self) -> str:
+        return str(int(self.remaining() * 1000))
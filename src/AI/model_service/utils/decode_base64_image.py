@@ -1,10 +1,9 @@
 from PIL import Image
+from fashion_search.image_preprocessing import load_clip_image
 import base64
-import io
 
 def decode_base64_image(image_base64: str) -> Image.Image:
-    """Decode a base 64 encoded image string and return Pil iamge object"""
+    """Decode a base 64 encoded image string straight to the 224x224 RGB image CLIP consumes"""
     image_base64 = image_base64.split(",")[1]
     image_data = base64.b64decode(image_base64)
-    image = Image.open(io.BytesIO(image_data)).convert('RGB')
-    return image
\ No newline at end of file
+    return load_clip_image(image_data)
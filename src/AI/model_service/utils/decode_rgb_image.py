@@ -0,0 +1,11 @@
+from PIL import Image
+from typing import Optional
+import hashlib
+
+def decode_rgb_image(pixels: bytes, width: int, height: int, sha256: Optional[str] = None) -> Image.Image:
+    """Rebuild a PIL image from raw RGB bytes sent by the backend, checking size and content hash"""
+    if len(pixels) != width * height * 3:
+        raise ValueError(f"Expected {width * height * 3} bytes for a {width}x{height} RGB image, got {len(pixels)}")
+    if sha256 and hashlib.sha256(pixels).hexdigest() != sha256:
+        raise ValueError("Image content hash does not match")
+    return Image.frombytes("RGB", (width, height), pixels)
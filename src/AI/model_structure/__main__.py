@@ -1,16 +1,88 @@
+import argparse
 import logging
-from services import DatabaseService, ClipEmbeddingService
+from services import DatabaseService, ClipEmbeddingService, IndexBenchmarkService, NeighbourGraphService, RecommendationService
 
 logger = logging.getLogger(__file__)
 
 
+def _read_lines(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Catalogue index tools")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("init", help="create and fill the collections (default)")
+
+    quantize = subparsers.add_parser("quantize", help="apply the quantization from config.yaml to existing collections")
+    quantize.add_argument("collections", nargs="+")
+
+    sparse = subparsers.add_parser("add-sparse-vectors", help="add the BM25 sparse text vectors to existing collections (copies and recreates each one)")
+    sparse.add_argument("collections", nargs="+")
+
+    payload = subparsers.add_parser("add-filter-payload", help="backfill numeric price, gender, color and category keys on existing collections")
+    payload.add_argument("collections", nargs="+")
+
+    compare = subparsers.add_parser("compare-quantization", help="recall/latency of quantized vs full-precision search")
+    compare.add_argument("collection")
+    compare.add_argument("--queries", type=int, default=100)
+    compare.add_argument("--limit", type=int, default=10)
+    compare.add_argument("--query-file", help="text queries, one per line, instead of the built-in shopper queries")
+    compare.add_argument("--image-urls", help="file of image URLs, one per line, not in the collection; added as image queries")
+
+    neighbours = subparsers.add_parser("build-neighbours", help="precompute the item-to-item similarity graph")
+    neighbours.add_argument("collections", nargs="*", help="defaults to every collection")
+    neighbours.add_argument("--full", action="store_true", help="rebuild from scratch instead of refreshing incrementally")
+
+    recommendations = subparsers.add_parser("build-recommendations", help="precompute per-user recommendations and trending lists")
+    recommendations.add_argument("--full", action="store_true", help="rescore every user instead of only changed ones")
+
+    args = parser.parse_args()
+
+    if args.command == "build-recommendations":
+        service = RecommendationService(embedding_service=ClipEmbeddingService())
+        service.refresh(full=args.full)
+        service.refresh_trending()
+        return
+
+    if args.command == "build-neighbours":
+        service = NeighbourGraphService()
+        if args.full:
+            service.build(args.collections or None)
+        else:
+            service.refresh(args.collections or None)
+        return
+
+    if args.command == "add-sparse-vectors":
+        # Backfills only read payloads, so the CLIP model is not loaded
+        database = DatabaseService(embedding_service=None)
+        for collection_name in args.collections:
+            database.add_sparse_vectors(collection_name)
+        return
+
+    if args.command == "add-filter-payload":
+        database = DatabaseService(embedding_service=None)
+        for collection_name in args.collections:
+            database.add_filter_payload(collection_name)
+        return
+
+    if args.command == "compare-quantization":
+        query_texts = _read_lines(args.query_file) if args.query_file else None
+        image_urls = _read_lines(args.image_urls) if args.image_urls else None
+        IndexBenchmarkService(embedding_service=ClipEmbeddingService()).compare(
+            args.collection, n_queries=args.queries, limit=args.limit, query_texts=query_texts, image_urls=image_urls)
+        return
+
     embedding = ClipEmbeddingService()
     database = DatabaseService(embedding_service=embedding)
 
+    if args.command == "quantize":
+        for collection_name in args.collections:
+            database.apply_quantization(collection_name)
+        return
+
     database.initialize_collection()
 
 if __name__ == "__main__":
     main()
-
-    
\ No newline at end of file
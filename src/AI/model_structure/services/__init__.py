@@ -6,6 +6,9 @@ from pathlib import Path
 from .config_service import ConfigService
 from .database_service import DatabaseService
 from .clip_embedding_service import ClipEmbeddingService
+from .index_benchmark_service import IndexBenchmarkService
+from .neighbour_service import NeighbourGraphService
+from .recommendation_service import RecommendationService
 
 
 config_path = Path.joinpath(Path(__file__).parent.parent, "configs/logger_config.yaml")
@@ -11,3 +11,10 @@ class EmbeddingService:
     def image_to_vector(self, image_urls):
         pass
 
+    @abstractmethod
+    def image_to_vectors(self, image_urls):
+        pass
+
+    @abstractmethod
+    def text_to_vectors(self, texts):
+        pass
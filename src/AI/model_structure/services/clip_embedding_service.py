@@ -6,6 +6,8 @@ import io
 import numpy as np
 import logging
 from services.base_embedding_service import EmbeddingService
+from utils.image_preprocessing import load_clip_image
+from utils.embedding_cache import get_embedding_cache, content_key, url_key
 
 logger = logging.getLogger(__name__)
 
@@ -14,28 +16,61 @@ class ClipEmbeddingService(EmbeddingService):
     def __init__(self):
         logger.info("CLIP Embedding Selected")
         self.model = SentenceTransformer('clip-ViT-B-32')
+        # Products share images across listings and re-ingestion reuses them all
+        self.embedding_cache = get_embedding_cache('clip-ViT-B-32')
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
 
     def image_to_vector(self, image_urls) -> Tuple[Optional[np.ndarray], List[str]]:
-        vectors = []
+        vectors, valid_urls = self.image_to_vectors(image_urls)
+        if vectors is None:
+            return None, []
+        return np.mean(vectors, axis=0), valid_urls  # average vector for multiple images
+
+    def text_to_vectors(self, texts) -> np.ndarray:
+        """Text embeddings in the same space as the catalogue image vectors, (n_texts, dim)."""
+        return self.model.encode(list(texts), batch_size=64, show_progress_bar=False)
+
+    def image_to_vectors(self, image_urls) -> Tuple[Optional[np.ndarray], List[str]]:
+        """One embedding per image, (n_images, dim), in the order of the returned valid urls."""
+        vectors = {}
         valid_urls = []
+        pending_images = []
+        pending_keys = []
 
         for url in image_urls:
+            cached = self.embedding_cache.get(url_key(url))
+            if cached is not None:
+                vectors[url] = cached
+                valid_urls.append(url)
+                continue
             try:
                 response = requests.get(url, headers=self.headers, stream=True)
                 if response.status_code == 200:
-                    image = Image.open(io.BytesIO(response.content)).convert("RGB")
-                    image = image.resize((224, 224))  # resize images
-                    vector = self.model.encode(image, show_progress_bar=False)
-                    vectors.append(vector)
+                    key = content_key(response.content)
+                    cached = self.embedding_cache.get(key)
+                    if cached is not None:
+                        vectors[url] = cached
+                        self.embedding_cache.put(url_key(url), cached)
+                    else:
+                        # Reduced-resolution decode + CLIP resize/crop, so the model's own resize is a no-op
+                        pending_images.append(load_clip_image(response.content))
+                        pending_keys.append((url, key))
                     valid_urls.append(url)
                 else:
                     logger.warning(f"Failed to fetch image: {url}")
             except Exception as e:
                 logger.error(f"Error processing image {url}: {e}")
 
+        if pending_images:
+            # One batched forward pass for the images not seen before
+            encoded = self.model.encode(pending_images, batch_size=len(pending_images), show_progress_bar=False)
+            for (url, key), vector in zip(pending_keys, encoded):
+                self.embedding_cache.put(key, vector)
+                self.embedding_cache.put(url_key(url), vector)
+                vectors[url] = vector
+
         if vectors:
-            return np.mean(vectors, axis=0), valid_urls  # average vector for multiple images
+            return np.stack([vectors[url] for url in valid_urls]), valid_urls
         return None, []
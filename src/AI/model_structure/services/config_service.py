@@ -1,3 +1,4 @@
+import os
 import logging
 import yaml
 from pathlib import Path
@@ -35,3 +36,69 @@ class ConfigService(metaclass=Singleton):
     @property
     def target_categories(self):
         return self._config.database_init.categories
+
+    # index
+    @property
+    def quantization(self):
+        return self._config.index.quantization
+
+    @property
+    def quantization_always_ram(self):
+        return self._config.index.always_ram
+
+    @property
+    def quantization_quantile(self):
+        return self._config.index.quantile
+
+    @property
+    def quantization_rescore(self):
+        return self._config.index.rescore
+
+    @property
+    def quantization_oversampling(self):
+        return self._config.index.oversampling
+
+    @property
+    def hnsw_ef(self):
+        return self._config.index.hnsw_ef
+
+    # neighbours
+    @property
+    def neighbours_dir(self):
+        # NEIGHBOUR_INDEX_DIR (shared .env) wins, so the writer and model_service read the same place
+        if os.getenv("NEIGHBOUR_INDEX_DIR"):
+            return Path(os.getenv("NEIGHBOUR_INDEX_DIR"))
+        return Path.joinpath(base_root_path.parent, self._config.neighbours.dir)
+
+    @property
+    def neighbours_top_k(self):
+        return self._config.neighbours.top_k
+
+    @property
+    def neighbours_block_size(self):
+        return self._config.neighbours.block_size
+
+    # recommendations
+    @property
+    def recommendations_top_n(self):
+        return self._config.recommendations.top_n
+
+    @property
+    def recommendations_user_block(self):
+        return self._config.recommendations.user_block
+
+    @property
+    def recommendations_catalogue_block(self):
+        return self._config.recommendations.catalogue_block
+
+    @property
+    def recommendations_taste_weight(self):
+        return self._config.recommendations.taste_weight
+
+    @property
+    def trending_days(self):
+        return self._config.recommendations.trending_days
+
+    @property
+    def trending_half_life_days(self):
+        return self._config.recommendations.trending_half_life_days
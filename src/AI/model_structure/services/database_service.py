@@ -1,10 +1,16 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, SparseVectorParams, Modifier, PointVectors, PayloadSchemaType,
+    SetPayload, SetPayloadOperation, MultiVectorConfig, MultiVectorComparator,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig
+)
 from services import ConfigService
 from services.base_embedding_service import EmbeddingService
 import os
 from dotenv import load_dotenv
 from utils import extract_all_images
+from utils.sparse_text import SPARSE_VECTOR_NAME, document_sparse_vector
+from utils.product_attributes import parse_price, detect_colors, detect_gender, category_keys
 import pandas
 import logging
 from rich.progress import track
@@ -14,6 +20,19 @@ load_dotenv()
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Named dense vectors: the mean of a product's images, and every image kept as a multivector
+MEAN_VECTOR_NAME = "mean"
+IMAGES_VECTOR_NAME = "images"
+
+# Payload fields search filters on; indexed so filtered ANN queries do not scan payloads
+PAYLOAD_INDEXES = {
+    "price": PayloadSchemaType.FLOAT,
+    "category": PayloadSchemaType.KEYWORD,
+    "category_key": PayloadSchemaType.KEYWORD,
+    "gender": PayloadSchemaType.KEYWORD,
+    "color": PayloadSchemaType.KEYWORD,
+}
+
 class DatabaseService:
     def __init__(self, embedding_service: EmbeddingService):
         self.config_service = ConfigService()
@@ -28,11 +47,203 @@ class DatabaseService:
         )
 
 
+    def _quantization_config(self):
+        mode = self.config_service.quantization
+        always_ram = self.config_service.quantization_always_ram
+        if mode == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=self.config_service.quantization_quantile,
+                always_ram=always_ram
+            ))
+        if mode == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=always_ram))
+        if mode not in (None, "none"):
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        return None
+
+    def apply_quantization(self, collection_name):
+        """Quantize an existing collection according to config.yaml; Qdrant rebuilds the index in the background."""
+        quantization_config = self._quantization_config()
+        if quantization_config is None:
+            logger.info(f"Quantization disabled, leaving {collection_name} unchanged")
+            return
+        self._client.update_collection(collection_name=collection_name, quantization_config=quantization_config)
+        logger.info(f"{self.config_service.quantization} quantization applied to {collection_name}")
+
     def _create_collection(self, collection_name, size: int = 512, distance: Distance = Distance.COSINE):
         # collection creation
+        # Each product keeps all of its image vectors, scored with MAX_SIM so a detail or back
+        # shot can match on its own; the mean vector is kept for diversity reranking and
+        # fast single-vector lookups. Product text is indexed as a BM25-style sparse vector
+        # with IDF computed by Qdrant for hybrid retrieval.
         self._client.create_collection(
-            collection_name=collection_name, vectors_config=VectorParams(size=512, distance=Distance.COSINE)
+            collection_name=collection_name,
+            vectors_config={
+                MEAN_VECTOR_NAME: VectorParams(size=size, distance=distance),
+                IMAGES_VECTOR_NAME: VectorParams(
+                    size=size,
+                    distance=distance,
+                    multivector_config=MultiVectorConfig(comparator=MultiVectorComparator.MAX_SIM)
+                ),
+            },
+            sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)},
+            quantization_config=self._quantization_config()
         )
+
+        self._create_payload_indexes(collection_name)
+
+    def _create_payload_indexes(self, collection_name):
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            self._client.create_payload_index(collection_name=collection_name, field_name=field_name, field_schema=field_schema)
+
+    @staticmethod
+    def _filter_payload(price, product_name, details, category, collection_name, source_name) -> dict:
+        # The collection name says men/women for every dataset but the women-only one, whose
+        # file name does; asking the file first would tag a men's collection after the configured file
+        gender = detect_gender(collection_name)
+        if gender == "unisex":
+            gender = detect_gender(source_name, category)
+        return {
+            "price": parse_price(price),
+            "price_text": price if isinstance(price, str) else None,
+            "gender": gender,
+            "color": detect_colors(f"{product_name} {details}"),
+            "category_key": category_keys(category),
+        }
+
+    def add_filter_payload(self, collection_name, batch_size: int = 256):
+        """Backfill numeric price, gender and color on a collection ingested before filtered search, and index them."""
+        source_name = self.config_service.source_dataset.name
+        offset = None
+        while True:
+            points, offset = self._client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=["price", "price_text", "product_name", "details", "category"],
+                with_vectors=False
+            )
+            if points:
+                self._client.batch_update_points(
+                    collection_name=collection_name,
+                    update_operations=[
+                        SetPayloadOperation(set_payload=SetPayload(
+                            payload=self._filter_payload(
+                                point.payload.get("price_text") or point.payload.get("price"),
+                                point.payload.get("product_name"),
+                                point.payload.get("details"),
+                                point.payload.get("category") or collection_name,
+                                collection_name,
+                                source_name
+                            ),
+                            points=[point.id]
+                        ))
+                        for point in points
+                    ]
+                )
+            if offset is None:
+                break
+        self._create_payload_indexes(collection_name)
+        logger.info(f"Filter payload added to {collection_name}")
+
+    @staticmethod
+    def _product_text(payload) -> str:
+        return " ".join(str(payload.get(field) or "") for field in ("product_name", "details"))
+
+    def _sparse_point(self, point) -> PointStruct:
+        # Collections from before named vectors keep their single dense vector under ""
+        vector = dict(point.vector) if isinstance(point.vector, dict) else {"": point.vector}
+        vector[SPARSE_VECTOR_NAME] = document_sparse_vector(self._product_text(point.payload))
+        return PointStruct(id=point.id, vector=vector, payload=point.payload)
+
+    def _copy_with_sparse_vectors(self, source, target, batch_size: int):
+        offset = None
+        while True:
+            points, offset = self._client.scroll(
+                collection_name=source,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                self._client.upsert(collection_name=target, points=[self._sparse_point(point) for point in points], wait=True)
+            if offset is None:
+                break
+        source_count = self._client.count(collection_name=source, exact=True).count
+        target_count = self._client.count(collection_name=target, exact=True).count
+        if source_count != target_count:
+            raise RuntimeError(f"Copied {target_count} of {source_count} points from {source} to {target}")
+
+    def add_sparse_vectors(self, collection_name, batch_size: int = 256):
+        """
+        Add the sparse text vector to a collection created before hybrid retrieval. Qdrant cannot
+        add a sparse vector name to an existing collection, so the points are copied into a
+        temporary collection that has one, and the collection is recreated under its own name
+        from that copy. The searchers find collections by listing them, which does not return
+        aliases, so the name is kept rather than pointed at the copy.
+        """
+        collection = self._client.get_collection(collection_name)
+        params = collection.config.params
+        sparse_vectors = dict(params.sparse_vectors or {})
+        temporary_name = f"{collection_name}__sparse_migration"
+        if SPARSE_VECTOR_NAME in sparse_vectors and self._client.collection_exists(temporary_name):
+            # An earlier run stopped while copying back; the temporary collection holds every point
+            logger.info(f"Resuming the copy of {temporary_name} back into {collection_name}")
+            self._copy_with_sparse_vectors(temporary_name, collection_name, batch_size)
+            self._client.delete_collection(temporary_name)
+            logger.info(f"Sparse text vectors added to {collection_name}")
+            return
+        if SPARSE_VECTOR_NAME in sparse_vectors:
+            # Already migrated; just recompute the vectors in place
+            offset = None
+            while True:
+                points, offset = self._client.scroll(
+                    collection_name=collection_name,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=["product_name", "details"],
+                    with_vectors=False
+                )
+                if points:
+                    self._client.update_vectors(
+                        collection_name=collection_name,
+                        points=[
+                            PointVectors(id=point.id, vector={SPARSE_VECTOR_NAME: document_sparse_vector(self._product_text(point.payload))})
+                            for point in points
+                        ]
+                    )
+                if offset is None:
+                    break
+            logger.info(f"Sparse text vectors refreshed on {collection_name}")
+            return
+
+        sparse_vectors[SPARSE_VECTOR_NAME] = SparseVectorParams(modifier=Modifier.IDF)
+
+        def create(name):
+            self._client.create_collection(
+                collection_name=name,
+                vectors_config=params.vectors,
+                sparse_vectors_config=sparse_vectors,
+                quantization_config=collection.config.quantization_config
+            )
+            self._create_payload_indexes(name)
+
+        if self._client.collection_exists(temporary_name):
+            # Left over from an interrupted run; the original is still the source of truth
+            self._client.delete_collection(temporary_name)
+        create(temporary_name)
+        logger.info(f"Copying {collection_name} into {temporary_name} with sparse text vectors")
+        self._copy_with_sparse_vectors(collection_name, temporary_name, batch_size)
+
+        # From here until the copy back finishes, searches of this collection return partial results
+        self._client.delete_collection(collection_name)
+        create(collection_name)
+        logger.info(f"Recreating {collection_name} from {temporary_name}")
+        self._copy_with_sparse_vectors(temporary_name, collection_name, batch_size)
+        self._client.delete_collection(temporary_name)
+        logger.info(f"Sparse text vectors added to {collection_name}")
     
     def initialize_collection(self):
         source_dataset = self.config_service.source_dataset
@@ -63,23 +274,28 @@ class DatabaseService:
                 if not image_urls:
                     continue  # Skip products with no images
 
-                vector, valid_urls= self.embedding_service.image_to_vector(image_urls)  # Compute vector representation
-                if vector is None:
+                vectors, valid_urls = self.embedding_service.image_to_vectors(image_urls)  # One vector per image
+                if vectors is None:
                     continue  # Skip if no valid vector
 
                 payload = {
                     "image_url":valid_urls[0],
                     "product_name": row["Product_Name"],
                     "link": row["Link"],
-                    "price": row["Price"],
                     "details": row["Details"],
                     "category": row["category"],
                     "image_urls": image_urls  # Store all image URLs
                 }
+                # Numeric price plus gender/color keywords for payload-filtered search
+                payload.update(self._filter_payload(row["Price"], row["Product_Name"], row["Details"], row["category"], collection_name, source_dataset.name))
 
                 self._client.upsert(collection_name=collection_name, points=[PointStruct(
                     id=ID,
-                    vector=vector.tolist(),
+                    vector={
+                        MEAN_VECTOR_NAME: vectors.mean(axis=0).tolist(),
+                        IMAGES_VECTOR_NAME: vectors.tolist(),
+                        SPARSE_VECTOR_NAME: document_sparse_vector(self._product_text(payload))
+                    },
                     payload= payload,
                 )])
                 ID +=1
@@ -0,0 +1,118 @@
+from qdrant_client import QdrantClient
+from qdrant_client.models import SearchParams, QuantizationSearchParams
+from services import ConfigService
+from services.base_embedding_service import EmbeddingService
+from typing import Dict, List, Optional
+import numpy as np
+import os
+import time
+import logging
+from dotenv import load_dotenv
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Shopper-style text queries. Stored vectors queried against their own index find themselves
+# at rank one, which flatters recall; these are embedded with CLIP and never stored
+QUERY_COLORS = ["black", "white", "red", "blue", "navy", "green", "beige", "brown", "grey", "pink"]
+QUERY_ITEMS = ["dress", "shirt", "t-shirt", "blazer", "jacket", "trousers", "jeans", "skirt",
+               "sweater", "cardigan", "shorts", "coat", "shoes", "sneakers", "hoodie"]
+QUERY_STYLES = ["{color} {item}", "casual {color} {item}", "elegant {color} {item} for a wedding",
+                "oversized {color} {item}", "{color} linen {item} for summer"]
+
+
+def default_query_texts() -> List[str]:
+    return [style.format(color=color, item=item) for style in QUERY_STYLES for item in QUERY_ITEMS for color in QUERY_COLORS]
+
+
+class IndexBenchmarkService:
+    """
+    Compares recall and latency of the catalogue index search modes against exact
+    (brute-force) search, using held-out queries: CLIP embeddings of text queries and,
+    optionally, of image URLs that are not in the collection.
+    """
+
+    def __init__(self, embedding_service: EmbeddingService):
+        self.config_service = ConfigService()
+        self.embedding_service = embedding_service
+        self._client = QdrantClient(
+            url=self.config_service.database_url,
+            api_key=os.getenv("VECTORDB_API"),
+        )
+
+    def _vector_name(self, collection_name) -> Optional[str]:
+        vectors = self._client.get_collection(collection_name).config.params.vectors
+        if isinstance(vectors, dict):
+            return "mean" if "mean" in vectors else next(iter(vectors))
+        return None
+
+    def _held_out_queries(self, n_queries: int, query_texts: Optional[List[str]], image_urls: Optional[List[str]]) -> List[List[float]]:
+        texts = query_texts or default_query_texts()
+        # Spread the sample over the whole list rather than taking the first colours of the first style
+        step = max(1, len(texts) // n_queries)
+        queries = [vector.tolist() for vector in self.embedding_service.text_to_vectors(texts[::step][:n_queries])]
+        if image_urls:
+            vectors, _ = self.embedding_service.image_to_vectors(image_urls)
+            if vectors is not None:
+                queries.extend(vector.tolist() for vector in vectors)
+        return queries
+
+    def _run(self, collection_name, queries, using, limit: int, params: SearchParams):
+        ids, latencies = [], []
+        for query in queries:
+            started = time.perf_counter()
+            points = self._client.query_points(
+                collection_name=collection_name,
+                query=query,
+                using=using,
+                limit=limit,
+                with_payload=False,
+                search_params=params
+            ).points
+            latencies.append((time.perf_counter() - started) * 1000)
+            ids.append([point.id for point in points])
+        return ids, np.array(latencies)
+
+    def search_modes(self) -> Dict[str, SearchParams]:
+        hnsw_ef = self.config_service.hnsw_ef
+        return {
+            "hnsw_full_precision": SearchParams(hnsw_ef=hnsw_ef, quantization=QuantizationSearchParams(ignore=True)),
+            "quantized": SearchParams(hnsw_ef=hnsw_ef, quantization=QuantizationSearchParams(rescore=False)),
+            "quantized_rescored": SearchParams(hnsw_ef=hnsw_ef, quantization=QuantizationSearchParams(
+                rescore=True,
+                oversampling=self.config_service.quantization_oversampling
+            )),
+        }
+
+    def compare(self, collection_name, n_queries: int = 100, limit: int = 10, query_texts: Optional[List[str]] = None,
+                image_urls: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Recall@limit and latency per search mode. Queries are n_queries of query_texts (the built-in
+        shopper queries by default) plus every image_url, none of them taken from the collection.
+        """
+        info = self._client.get_collection(collection_name)
+        if not info.points_count:
+            logger.warning(f"{collection_name} is empty, nothing to compare")
+            return {}
+        using = self._vector_name(collection_name)
+        queries = self._held_out_queries(n_queries, query_texts, image_urls)
+
+        logger.info(f"{collection_name}: {info.points_count} points, quantization: {info.config.quantization_config}")
+
+        truth, exact_latencies = self._run(collection_name, queries, using, limit, SearchParams(exact=True, quantization=QuantizationSearchParams(ignore=True)))
+        report = {"exact": {"recall": 1.0, "mean_ms": float(exact_latencies.mean()), "p95_ms": float(np.percentile(exact_latencies, 95))}}
+
+        for mode, params in self.search_modes().items():
+            ids, latencies = self._run(collection_name, queries, using, limit, params)
+            recall = np.mean([len(set(found) & set(expected)) / max(1, len(expected)) for found, expected in zip(ids, truth)])
+            report[mode] = {
+                "recall": float(recall),
+                "mean_ms": float(latencies.mean()),
+                "p95_ms": float(np.percentile(latencies, 95))
+            }
+
+        logger.info(f"Recall@{limit} and latency over {len(queries)} queries on {collection_name}:")
+        for mode, stats in report.items():
+            logger.info(f"  {mode:<20} recall={stats['recall']:.3f}  mean={stats['mean_ms']:.1f}ms  p95={stats['p95_ms']:.1f}ms")
+        return report
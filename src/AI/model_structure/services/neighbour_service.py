@@ -0,0 +1,241 @@
+from qdrant_client import QdrantClient
+from services import ConfigService
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import json
+import os
+import shutil
+import time
+import logging
+from dotenv import load_dotenv
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+
+class NeighbourGraphService:
+    """
+    Offline item-to-item similarity graph over the whole catalogue.
+
+    Every item's top-K neighbours are found with blocked matrix multiplies over the
+    normalized embeddings and written as a versioned directory of:
+      ids.int32      (N, K) row indices of the neighbours, memory-mappable
+      scores.float16 (N, K) cosine similarities
+      items.json     row -> {key, name, image_url}, key is "<collection>:<point id>"
+      embeddings.npy (N, d) float16, kept for incremental refreshes
+      meta.json      sizes and build time
+    A CURRENT file names the live version and is swapped atomically, so readers never
+    see a half-written graph.
+    """
+
+    def __init__(self):
+        self.config_service = ConfigService()
+        self._client = QdrantClient(
+            url=self.config_service.database_url,
+            api_key=os.getenv("VECTORDB_API"),
+        )
+        self.root = self.config_service.neighbours_dir
+        self.top_k = self.config_service.neighbours_top_k
+        self.block_size = self.config_service.neighbours_block_size
+
+    # catalogue
+    def _vector_name(self, collection_name) -> Optional[str]:
+        vectors = self._client.get_collection(collection_name).config.params.vectors
+        if isinstance(vectors, dict):
+            return "mean" if "mean" in vectors else next(iter(vectors))
+        return None
+
+    def load_catalogue(self, collections: Optional[List[str]] = None, payload_fields: Optional[List[str]] = None) -> Tuple[List[dict], np.ndarray]:
+        """Items ({key, name, image_url} plus payload_fields) and unit-length vectors of the given collections, all by default."""
+        payload_fields = payload_fields or []
+        collections = collections or [col.name for col in self._client.get_collections().collections]
+        items, vectors = [], []
+        for collection_name in collections:
+            using = self._vector_name(collection_name)
+            offset = None
+            while True:
+                points, offset = self._client.scroll(
+                    collection_name=collection_name,
+                    limit=512,
+                    offset=offset,
+                    with_payload=["product_name", "image_url"] + payload_fields,
+                    with_vectors=[using] if using else True
+                )
+                for point in points:
+                    vector = point.vector[using] if using else point.vector
+                    if vector is None:
+                        continue
+                    items.append({
+                        "key": f"{collection_name}:{point.id}",
+                        "name": point.payload.get("product_name", "N/A"),
+                        "image_url": point.payload.get("image_url", ""),
+                        **{field: point.payload.get(field) for field in payload_fields}
+                    })
+                    vectors.append(vector)
+                if offset is None:
+                    break
+            logger.info(f"Loaded {collection_name}, catalogue size {len(items)}")
+
+        embeddings = np.asarray(vectors, dtype=np.float32)
+        if len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+        return items, embeddings
+
+    # top-k kernels
+    def _top_k(self, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Row-wise top-k of a score block, sorted descending."""
+        k = min(k, scores.shape[1])
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+    def _rows_against(self, embeddings: np.ndarray, rows: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-K neighbours of `rows` among `targets` (both row indices into embeddings), self excluded.
+        Slots that cannot be filled (tiny target sets) hold id -1 and score -inf.
+        """
+        k = min(self.top_k, len(targets))
+        ids = np.full((len(rows), k), -1, dtype=np.int32)
+        scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+        target_vectors = embeddings[targets].T
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            similarity = embeddings[block] @ target_vectors
+            # Never list an item as its own neighbour
+            similarity[block[:, None] == targets[None, :]] = -np.inf
+            top, top_scores = self._top_k(similarity, k)
+            ids[start:start + len(block)] = np.where(np.isfinite(top_scores), targets[top], -1)
+            scores[start:start + len(block)] = top_scores
+        return ids, scores
+
+    def _merge(self, ids_a, scores_a, ids_b, scores_b) -> Tuple[np.ndarray, np.ndarray]:
+        ids = np.concatenate([ids_a, ids_b], axis=1)
+        scores = np.concatenate([scores_a, scores_b], axis=1)
+        top, top_scores = self._top_k(scores, self.top_k)
+        return np.take_along_axis(ids, top, axis=1), top_scores
+
+    # storage
+    def _current_dir(self) -> Optional[Path]:
+        pointer = self.root / CURRENT_FILE
+        if not pointer.exists():
+            return None
+        version = self.root / pointer.read_text().strip()
+        return version if version.exists() else None
+
+    def _publish(self, items: List[dict], embeddings: np.ndarray, ids: np.ndarray, scores: np.ndarray):
+        self.root.mkdir(parents=True, exist_ok=True)
+        version = f"v{int(time.time() * 1000)}"
+        version_dir = self.root / version
+        version_dir.mkdir()
+
+        ids_file = np.memmap(version_dir / "ids.int32", dtype=np.int32, mode="w+", shape=ids.shape)
+        ids_file[:] = ids
+        ids_file.flush()
+        scores_file = np.memmap(version_dir / "scores.float16", dtype=np.float16, mode="w+", shape=scores.shape)
+        scores_file[:] = np.where(np.isfinite(scores), scores, 0)
+        scores_file.flush()
+        np.save(version_dir / "embeddings.npy", embeddings.astype(np.float16))
+        with open(version_dir / "items.json", "w") as f:
+            json.dump(items, f)
+        with open(version_dir / "meta.json", "w") as f:
+            json.dump({"n_items": len(items), "top_k": int(ids.shape[1]), "built_at": time.time()}, f)
+
+        pointer_tmp = self.root / f"{CURRENT_FILE}.tmp"
+        pointer_tmp.write_text(version)
+        os.replace(pointer_tmp, self.root / CURRENT_FILE)
+
+        # Keep the previous version around for readers that still have it mapped
+        versions = sorted(path for path in self.root.iterdir() if path.is_dir() and path.name.startswith("v"))
+        for old in versions[:-2]:
+            shutil.rmtree(old, ignore_errors=True)
+        logger.info(f"Published neighbour graph {version}: {len(items)} items x {ids.shape[1]} neighbours")
+
+    # jobs
+    def build(self, collections: Optional[List[str]] = None):
+        items, embeddings = self.load_catalogue(collections)
+        if len(items) < 2:
+            logger.warning("Catalogue too small for a neighbour graph")
+            return
+        all_rows = np.arange(len(items))
+        ids, scores = self._rows_against(embeddings, all_rows, all_rows)
+        k = min(self.top_k, len(items) - 1)
+        ids, scores = ids[:, :k], scores[:, :k]
+        self._publish(items, embeddings, ids, scores)
+
+    def refresh(self, collections: Optional[List[str]] = None):
+        """
+        Incremental update: only new items are scored against the whole catalogue, existing
+        rows are merged with the new candidates, and rows that pointed at removed items are
+        recomputed. Items whose vectors changed count as removed and re-added. Falls back
+        to a full build when there is no previous graph. With `collections`, only those are
+        re-read; the other collections keep their items from the current graph.
+        """
+        current = self._current_dir()
+        if current is None:
+            logger.info("No neighbour graph yet, running a full build")
+            return self.build(collections)
+
+        with open(current / "items.json") as f:
+            old_items = json.load(f)
+        with open(current / "meta.json") as f:
+            old_k = json.load(f)["top_k"]
+        old_ids = np.memmap(current / "ids.int32", dtype=np.int32, mode="r").reshape(len(old_items), old_k)
+        old_scores = np.memmap(current / "scores.float16", dtype=np.float16, mode="r").reshape(len(old_items), old_k).astype(np.float32)
+        old_embeddings = np.load(current / "embeddings.npy").astype(np.float32)
+
+        items, embeddings = self.load_catalogue(collections)
+        if collections:
+            refreshed = set(collections)
+            untouched = [row for row, item in enumerate(old_items) if item["key"].rsplit(":", 1)[0] not in refreshed]
+            items = [old_items[row] for row in untouched] + items
+            embeddings = np.concatenate([old_embeddings[untouched], embeddings]) if len(embeddings) else old_embeddings[untouched]
+        if len(items) < 2:
+            logger.warning("Catalogue too small for a neighbour graph")
+            return
+        new_index: Dict[str, int] = {item["key"]: row for row, item in enumerate(items)}
+
+        # Remap old rows/ids to the new ordering; -1 marks removed items
+        old_to_new = np.array([new_index.get(item["key"], -1) for item in old_items], dtype=np.int64)
+        kept_old = np.flatnonzero(old_to_new >= 0)
+        # Items re-embedded in place are treated as removed and re-added
+        changed = np.abs(old_embeddings[kept_old] - embeddings[old_to_new[kept_old]]).max(axis=1) > 1e-2
+        old_to_new[kept_old[changed]] = -1
+        kept_old = kept_old[~changed]
+        added = np.setdiff1d(np.arange(len(items)), old_to_new[kept_old])
+        if len(added) == 0 and len(kept_old) == len(old_items):
+            logger.info("Catalogue unchanged, neighbour graph is current")
+            return
+
+        k = min(self.top_k, len(items) - 1)
+        ids = np.full((len(items), k), -1, dtype=np.int32)
+        scores = np.full((len(items), k), -np.inf, dtype=np.float32)
+
+        remapped = np.where(old_ids[kept_old] >= 0, old_to_new[old_ids[kept_old]], -1)
+        lost_neighbour = (remapped < 0).any(axis=1) | (old_k < k)
+        reusable = kept_old[~lost_neighbour]
+        stale = np.concatenate([old_to_new[kept_old[lost_neighbour]], added]).astype(np.int64)
+        all_rows = np.arange(len(items))
+
+        if len(reusable):
+            reuse_rows = old_to_new[reusable]
+            reuse_ids = remapped[~lost_neighbour][:, :k].astype(np.int32)
+            reuse_scores = old_scores[reusable][:, :k]
+            if len(added):
+                # Existing items only need scoring against the newcomers
+                new_ids, new_scores = self._rows_against(embeddings, reuse_rows, added)
+                reuse_ids, reuse_scores = self._merge(reuse_ids, reuse_scores, new_ids, new_scores)
+            ids[reuse_rows] = reuse_ids[:, :k]
+            scores[reuse_rows] = reuse_scores[:, :k]
+
+        if len(stale):
+            stale_ids, stale_scores = self._rows_against(embeddings, stale, all_rows)
+            ids[stale] = stale_ids[:, :k]
+            scores[stale] = stale_scores[:, :k]
+
+        logger.info(f"Refreshed neighbour graph: {len(added)} added, {len(old_items) - len(kept_old)} removed, {len(stale)} rows recomputed")
+        self._publish(items, embeddings, ids, scores)
@@ -0,0 +1,303 @@
+from pymongo import MongoClient, UpdateOne
+from services import ConfigService
+from services.base_embedding_service import EmbeddingService
+from services.neighbour_service import NeighbourGraphService
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import hashlib
+import os
+import logging
+from dotenv import load_dotenv
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Same weights the backend uses when folding interactions into taste vectors
+INTERACTION_WEIGHTS = {
+    "view": 1.0,
+    "like": 3.0,
+    "try_on": 3.0,
+    "add_to_cart": 4.0,
+    "purchase": 5.0,
+    "dislike": -2.0,
+}
+
+ITEM_FIELDS = ["price", "category", "gender", "color", "link"]
+# StyleProfile fills this in when the user never set a budget, so it is not a constraint
+DEFAULT_BUDGET_RANGE = {"min": 0, "max": 1000}
+
+class RecommendationService:
+    """
+    Offline per-user recommendations and trending lists, served by the backend with one
+    indexed read.
+
+    A user's vector blends the decayed interaction taste vector (user_tastes) with a CLIP
+    text embedding of the stated style profile. Users are scored against the catalogue in
+    (user_block x catalogue_block) matrix multiplies, keeping a running top-N per user, so
+    memory stays bounded whatever the catalogue size. Budget and disliked colors are
+    applied as masks inside each block.
+
+    Each stored list records the taste version / profile timestamp and the catalogue
+    fingerprint it was computed from; a refresh only rescores users where either moved.
+    """
+
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None):
+        self.config_service = ConfigService()
+        self.embedding_service = embedding_service
+        self.catalogue = NeighbourGraphService()
+        db = MongoClient(os.getenv("MONGO_URL_COMBINED")).fashion_db
+        self.user_profiles = db.user_profiles
+        self.user_tastes = db.user_tastes
+        self.user_interactions = db.user_interactions
+        self.user_recommendations = db.user_recommendations
+        self.trending_items = db.trending_items
+        self.user_recommendations.create_index("user_id", unique=True)
+        self.trending_items.create_index("category", unique=True)
+
+        self.top_n = self.config_service.recommendations_top_n
+        self.user_block = self.config_service.recommendations_user_block
+        self.catalogue_block = self.config_service.recommendations_catalogue_block
+        self.taste_weight = self.config_service.recommendations_taste_weight
+
+    # catalogue
+    def _load_catalogue(self) -> Tuple[List[dict], np.ndarray, str]:
+        items, embeddings = self.catalogue.load_catalogue(payload_fields=ITEM_FIELDS)
+        digest = hashlib.sha1()
+        for item in items:
+            digest.update(item["key"].encode())
+        digest.update(embeddings.astype(np.float16).tobytes())
+        return items, embeddings, digest.hexdigest()[:16]
+
+    # users
+    @staticmethod
+    def _profile_text(profile: dict) -> Optional[str]:
+        colors = profile.get("preferred_colors") or []
+        styles = profile.get("preferred_styles") or []
+        categories = profile.get("preferred_categories") or []
+        if not (colors or styles or categories):
+            return None
+        parts = []
+        if styles:
+            parts.append(" and ".join(styles) + " style")
+        parts.append(" and ".join(categories) if categories else "clothing")
+        if colors:
+            parts.append("in " + " or ".join(colors))
+        return "a photo of " + " ".join(parts)
+
+    def _load_users(self, dim: int) -> Dict[str, dict]:
+        users: Dict[str, dict] = {}
+        for taste in self.user_tastes.find({}, {"user_id": 1, "vector": 1, "version": 1}):
+            if not taste.get("vector"):
+                continue
+            vector = np.frombuffer(taste["vector"], dtype=np.float16).astype(np.float32)
+            if vector.shape[0] != dim:
+                continue
+            users[taste["user_id"]] = {"taste": vector, "taste_version": taste.get("version", 0)}
+
+        for profile in self.user_profiles.find({}):
+            user = users.setdefault(profile["user_id"], {"taste": None, "taste_version": 0})
+            user["profile"] = profile
+            user["profile_text"] = self._profile_text(profile)
+            updated_at = profile.get("updated_at")
+            user["profile_updated"] = updated_at.timestamp() if updated_at else 0
+
+        for user in users.values():
+            user["state"] = f"{user['taste_version']}:{user.get('profile_updated', 0)}"
+        return users
+
+    def _user_vectors(self, users: List[dict], dim: int) -> np.ndarray:
+        texts = [user.get("profile_text") for user in users]
+        text_rows = [i for i, text in enumerate(texts) if text]
+        profile_vectors = np.zeros((len(users), dim), dtype=np.float32)
+        if text_rows and self.embedding_service is not None:
+            encoded = self.embedding_service.text_to_vectors([texts[i] for i in text_rows])
+            profile_vectors[text_rows] = np.asarray(encoded, dtype=np.float32)
+
+        taste_vectors = np.zeros((len(users), dim), dtype=np.float32)
+        for i, user in enumerate(users):
+            if user["taste"] is not None:
+                taste_vectors[i] = user["taste"]
+
+        def normalize(matrix):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+        taste_vectors, profile_vectors = normalize(taste_vectors), normalize(profile_vectors)
+        has_taste = np.linalg.norm(taste_vectors, axis=1) > 0
+        has_profile = np.linalg.norm(profile_vectors, axis=1) > 0
+        # Users with only one signal use it on its own
+        taste_share = np.where(has_taste & has_profile, self.taste_weight, has_taste.astype(np.float32))
+        return normalize(taste_share[:, None] * taste_vectors + (1 - taste_share[:, None]) * profile_vectors)
+
+    # constraints
+    @staticmethod
+    def _item_constraints(items: List[dict]) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+        prices = np.array([item["price"] if isinstance(item.get("price"), (int, float)) else np.nan for item in items], dtype=np.float32)
+        vocabulary: Dict[str, int] = {}
+        for item in items:
+            for color in item.get("color") or []:
+                vocabulary.setdefault(color.lower(), len(vocabulary))
+        item_colors = np.zeros((len(items), max(1, len(vocabulary))), dtype=np.float32)
+        for row, item in enumerate(items):
+            for color in item.get("color") or []:
+                item_colors[row, vocabulary[color.lower()]] = 1
+        return prices, item_colors, vocabulary
+
+    @staticmethod
+    def _user_constraints(users: List[dict], vocabulary: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        budget_min = np.full(len(users), -np.inf, dtype=np.float32)
+        budget_max = np.full(len(users), np.inf, dtype=np.float32)
+        disliked = np.zeros((len(users), max(1, len(vocabulary))), dtype=np.float32)
+        for row, user in enumerate(users):
+            profile = user.get("profile") or {}
+            budget = profile.get("budget_range") or {}
+            if budget == DEFAULT_BUDGET_RANGE:
+                budget = {}
+            if budget.get("min") is not None:
+                budget_min[row] = budget["min"]
+            if budget.get("max") is not None:
+                budget_max[row] = budget["max"]
+            for color in profile.get("disliked_colors") or []:
+                if color.lower() in vocabulary:
+                    disliked[row, vocabulary[color.lower()]] = 1
+        return budget_min, budget_max, disliked
+
+    # scoring
+    def _top_n(self, user_vectors, embeddings, prices, item_colors, budget_min, budget_max, disliked) -> Tuple[np.ndarray, np.ndarray]:
+        """Running top-N of every user over the catalogue, one (user_block x catalogue_block) product at a time."""
+        n = min(self.top_n, len(embeddings))
+        ids = np.full((len(user_vectors), n), -1, dtype=np.int64)
+        scores = np.full((len(user_vectors), n), -np.inf, dtype=np.float32)
+        for user_start in range(0, len(user_vectors), self.user_block):
+            users = slice(user_start, user_start + self.user_block)
+            block_ids, block_scores = ids[users], scores[users]
+            for item_start in range(0, len(embeddings), self.catalogue_block):
+                items = slice(item_start, item_start + self.catalogue_block)
+                similarity = user_vectors[users] @ embeddings[items].T
+                price = prices[items][None, :]
+                in_budget = np.isnan(price) | ((price >= budget_min[users, None]) & (price <= budget_max[users, None]))
+                clashes = (disliked[users] @ item_colors[items].T) > 0
+                similarity[~in_budget | clashes] = -np.inf
+
+                candidate_ids = np.concatenate([block_ids, np.broadcast_to(np.arange(item_start, item_start + similarity.shape[1]), similarity.shape)], axis=1)
+                candidate_scores = np.concatenate([block_scores, similarity], axis=1)
+                top = np.argpartition(-candidate_scores, n - 1, axis=1)[:, :n]
+                block_ids = np.take_along_axis(candidate_ids, top, axis=1)
+                block_scores = np.take_along_axis(candidate_scores, top, axis=1)
+            order = np.argsort(-block_scores, axis=1)
+            ids[users] = np.take_along_axis(block_ids, order, axis=1)
+            scores[users] = np.take_along_axis(block_scores, order, axis=1)
+        return ids, scores
+
+    # jobs
+    def refresh(self, full: bool = False):
+        """Recompute recommendations for users whose taste, profile or catalogue changed (all users with full=True)."""
+        items, embeddings, catalogue_version = self._load_catalogue()
+        if not items:
+            logger.warning("Catalogue is empty, no recommendations to compute")
+            return
+
+        users = self._load_users(embeddings.shape[1])
+        if not full:
+            stored = {
+                doc["user_id"]: (doc.get("state"), doc.get("catalogue_version"))
+                for doc in self.user_recommendations.find({}, {"user_id": 1, "state": 1, "catalogue_version": 1})
+            }
+            users = {
+                user_id: user for user_id, user in users.items()
+                if stored.get(user_id) != (user["state"], catalogue_version)
+            }
+        if not users:
+            logger.info("Recommendations are current")
+            return
+
+        user_ids = list(users)
+        user_list = [users[user_id] for user_id in user_ids]
+        user_vectors = self._user_vectors(user_list, embeddings.shape[1])
+        prices, item_colors, vocabulary = self._item_constraints(items)
+        budget_min, budget_max, disliked = self._user_constraints(user_list, vocabulary)
+        ids, scores = self._top_n(user_vectors, embeddings, prices, item_colors, budget_min, budget_max, disliked)
+
+        now = datetime.now()
+        operations = []
+        for row, user_id in enumerate(user_ids):
+            if not np.linalg.norm(user_vectors[row]):
+                continue
+            recommendations = [
+                {
+                    "id": items[item]["key"],
+                    "name": items[item]["name"],
+                    "image_url": items[item]["image_url"],
+                    **{field: items[item].get(field) for field in ITEM_FIELDS},
+                    "score": round(float(score), 4)
+                }
+                for item, score in zip(ids[row], scores[row])
+                if item >= 0 and np.isfinite(score)
+            ]
+            operations.append(UpdateOne(
+                {"user_id": user_id},
+                {"$set": {
+                    "user_id": user_id,
+                    "items": recommendations,
+                    "state": users[user_id]["state"],
+                    "catalogue_version": catalogue_version,
+                    "generated_at": now
+                }},
+                upsert=True
+            ))
+        if operations:
+            self.user_recommendations.bulk_write(operations, ordered=False)
+        logger.info(f"Wrote recommendations for {len(operations)} users against catalogue {catalogue_version}")
+
+    def refresh_trending(self):
+        """Time-decayed interaction counts per product, overall and per category."""
+        now = datetime.now()
+        half_life_ms = self.config_service.trending_half_life_days * 86400 * 1000
+        weight = {"$switch": {
+            "branches": [{"case": {"$eq": ["$interaction_type", kind]}, "then": value} for kind, value in INTERACTION_WEIGHTS.items()],
+            # Interaction types without a weight do not count towards trending
+            "default": 0.0
+        }}
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": now - timedelta(days=self.config_service.trending_days)}}},
+            # Oldest first, so $last below keeps the most recent category and product data
+            {"$sort": {"timestamp": 1}},
+            {"$group": {
+                "_id": "$product_id",
+                "category": {"$last": "$category"},
+                "product_data": {"$last": "$product_data"},
+                "interactions": {"$sum": 1},
+                "trending_score": {"$sum": {"$multiply": [
+                    weight,
+                    {"$pow": [0.5, {"$divide": [{"$subtract": [now, "$timestamp"]}, half_life_ms]}]}
+                ]}}
+            }},
+            # Products mostly disliked end up at or below zero and are not trending
+            {"$match": {"trending_score": {"$gt": 0}}},
+            {"$sort": {"trending_score": -1}}
+        ]
+
+        by_category: Dict[Optional[str], List[dict]] = {None: []}
+        for product in self.user_interactions.aggregate(pipeline, allowDiskUse=True):
+            data = {key: value for key, value in (product.get("product_data") or {}).items() if key != "embedding"}
+            item = {
+                **data,
+                "id": product["_id"],
+                "category": product.get("category") or data.get("category"),
+                "interactions": product["interactions"],
+                "trending_score": round(product["trending_score"], 3)
+            }
+            for key in {None, (item["category"] or "").lower() or None}:
+                bucket = by_category.setdefault(key, [])
+                if len(bucket) < self.top_n:
+                    bucket.append(item)
+
+        operations = [
+            UpdateOne({"category": category}, {"$set": {"category": category, "items": items, "generated_at": now}}, upsert=True)
+            for category, items in by_category.items()
+        ]
+        self.trending_items.bulk_write(operations, ordered=False)
+        self.trending_items.delete_many({"generated_at": {"$lt": now}})
+        logger.info(f"Wrote trending lists for {len(operations) - 1} categories")
@@ -1 +1,5 @@
-from .extract_images import extract_all_images
\ No newline at end of file
+from .extract_images import extract_all_images
+from .image_preprocessing import open_image, clip_resize_crop, load_clip_image
+from .embedding_cache import EmbeddingCache, get_embedding_cache, content_key, url_key
+from .sparse_text import SPARSE_VECTOR_NAME, tokenize, document_sparse_vector, query_sparse_vector
+from .product_attributes import parse_price, detect_colors, detect_gender
@@ -0,0 +1,47 @@
+import io
+from typing import Union
+
+from PIL import Image
+
+# CLIP ViT-B/32 input resolution
+CLIP_IMAGE_SIZE = 224
+
+
+def open_image(data: Union[bytes, io.BytesIO], size: int = CLIP_IMAGE_SIZE) -> Image.Image:
+    """
+    Open encoded image bytes at the smallest resolution that still covers `size`.
+    JPEGs are decoded in draft mode (DCT scaling), other formats are shrunk with an
+    integer `reduce`, so a 12MP phone photo never gets fully decoded just to be thrown away.
+    """
+    image = Image.open(data if isinstance(data, io.BytesIO) else io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("RGB", (size, size))
+    else:
+        factor = min(image.size) // size
+        if factor >= 2:
+            # reduce only handles 8-bit RGB(A)/L(A); palette, bilevel and 16-bit images are converted first
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGB")
+            image = image.reduce(factor)
+    return image.convert("RGB")
+
+
+def clip_resize_crop(image: Image.Image, size: int = CLIP_IMAGE_SIZE) -> Image.Image:
+    """Resize the shorter side to `size` (bicubic) and center-crop, as the CLIP processor does."""
+    image = image.convert("RGB")
+    width, height = image.size
+    if (width, height) == (size, size):
+        return image
+
+    scale = size / min(width, height)
+    resized = (max(size, round(width * scale)), max(size, round(height * scale)))
+    image = image.resize(resized, resample=Image.Resampling.BICUBIC)
+
+    left = (resized[0] - size) // 2
+    top = (resized[1] - size) // 2
+    return image.crop((left, top, left + size, top + size))
+
+
+def load_clip_image(data: Union[bytes, io.BytesIO], size: int = CLIP_IMAGE_SIZE) -> Image.Image:
+    """Reduced-resolution decode followed by the CLIP resize/crop."""
+    return clip_resize_crop(open_image(data, size), size)
@@ -0,0 +1,83 @@
+import re
+from typing import List, Optional
+
+# Same color families the category-free search recognises in queries
+COLOR_KEYWORDS = {
+    "red": ["red", "burgundy", "maroon", "crimson", "scarlet"],
+    "blue": ["blue", "navy", "azure", "turquoise", "teal", "cyan"],
+    "green": ["green", "olive", "lime", "emerald", "sage", "mint"],
+    "yellow": ["yellow", "gold", "amber", "mustard"],
+    "black": ["black", "onyx"],
+    "white": ["white", "ivory", "cream", "off-white", "ecru"],
+    "pink": ["pink", "rose", "fuchsia", "magenta"],
+    "purple": ["purple", "violet", "lavender", "lilac", "mauve"],
+    "orange": ["orange", "coral", "peach", "tangerine"],
+    "brown": ["brown", "tan", "beige", "khaki", "camel", "chocolate"],
+    "gray": ["gray", "grey", "silver", "charcoal"],
+    "multicolor": ["multicolor", "colorful", "patterned", "floral", "striped", "checkered"]
+}
+
+
+def parse_price(value) -> Optional[float]:
+    """Turn scraped prices like '1.299,00 TL', '1,299.00' or '$29.99' into a float."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)  # NaN check
+
+    text = re.sub(r"[^\d.,]", "", str(value))
+    if not text:
+        return None
+    if "," in text and "." in text:
+        # Whichever separator comes last is the decimal point
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    else:
+        separator = "," if "," in text else "."
+        whole, _, fraction = text.rpartition(separator)
+        # A lone separator followed by exactly three digits groups thousands ('2.599 TL')
+        if whole and len(fraction) != 3:
+            text = f"{whole.replace(separator, '')}.{fraction}"
+        else:
+            text = text.replace(separator, "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def detect_colors(text: str) -> List[str]:
+    if not text or not isinstance(text, str):
+        return []
+    words = set(re.findall(r"[a-z]+(?:-[a-z]+)?", text.lower()))
+    return [color for color, variations in COLOR_KEYWORDS.items() if words.intersection(variations)]
+
+
+def category_keys(category: str) -> List[str]:
+    """
+    Lowercase, underscore-separated keys a category filter matches, with and without the
+    gender prefix: 'men_POLO SHIRTS' -> ['men_polo_shirts', 'polo_shirts'].
+    """
+    key = re.sub(r"[^a-z0-9]+", "_", str(category or "").lower()).strip("_")
+    if not key:
+        return []
+    keys = [key]
+    for prefix in ("women_", "men_"):
+        if key.startswith(prefix) and len(key) > len(prefix):
+            keys.append(key[len(prefix):])
+            break
+    return keys
+
+
+def detect_gender(*sources: str) -> str:
+    """Gender from the dataset file and category names, e.g. 'zara_women.csv' or 'men_SHIRTS'."""
+    tokens = set()
+    for source in sources:
+        tokens.update(re.split(r"[^a-z]+", str(source).lower()))
+    if "women" in tokens or "woman" in tokens:
+        return "women"
+    if "men" in tokens or "man" in tokens:
+        return "men"
+    return "unisex"
@@ -1,9 +1,13 @@
 from typing import Dict, List, Union, Optional, Any
 import json
+import asyncio
 import logging
 from concurrent.futures import ThreadPoolExecutor
 
 from .model_service.fashion_search.categoryfree_search import CategoryFreeSearch
+from .model_service.fashion_search.outfit_composer import OutfitComposer
+from .model_service.fashion_search.neighbours import get_neighbour_index
+from .model_service.fashion_search.rerank import dense_vector, taste_rerank
 from .model_service.langchain_methods.rag_pipeline_categoryfree import rag_pipeline
 from .gemini_service import GeminiService
 from .vector_data_service import VectorDataService
@@ -17,6 +21,7 @@ class MultiModalIntegration:
         self.config = config or {}
         
         self.category_free_search = CategoryFreeSearch()
+        self.outfit_composer = OutfitComposer(self.category_free_search)
         self.gemini_service = GeminiService()
         self.vector_data_service = VectorDataService()
         self.feature_extractor = FeatureExtractor()
@@ -30,7 +35,8 @@ class MultiModalIntegration:
                            wardrobe_items: Optional[List[Dict[str, Any]]] = None,
                            style_profile: Optional[Dict[str, Any]] = None,
                            search_type: str = "item",
-                           filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                           filters: Optional[Dict[str, Any]] = None,
+                           taste_vector: Optional[List[float]] = None) -> Dict[str, Any]:
         """
         Process a multimodal query using all available RAG components
         
@@ -42,6 +48,7 @@ class MultiModalIntegration:
             style_profile: Optional user style profile for personalization
             search_type: Type of search ("item" or "outfit")
             filters: Optional filters for the search
+            taste_vector: Optional decayed interaction embedding of the user, used to re-rank results
             
         Returns:
             Dictionary containing search results and recommendations
@@ -76,7 +83,8 @@ class MultiModalIntegration:
                 enhanced_query, 
                 image_embedding, 
                 filters, 
-                user_id
+                user_id,
+                taste_vector
             )
             
             # Step 4: If outfit search, compose an outfit from search results
@@ -149,38 +157,77 @@ class MultiModalIntegration:
                              query: str, 
                              image_embedding: Optional[List[float]] = None,
                              filters: Optional[Dict[str, Any]] = None,
-                             user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+                             user_id: Optional[str] = None,
+                             taste_vector: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """Perform a search using the category-free search component"""
         try:
-            # Extract any color mentions for color boosting
-            colors = []
-            if filters and "colors" in filters:
-                colors = filters["colors"]
+            page = filters.get("page", 1) if filters else 1
+            page_size = filters.get("page_size", 20) if filters else 20
             
-            # Extract any category mentions for category boosting
-            categories = []
-            if filters and "categories" in filters:
-                categories = filters["categories"]
-            
-            # Perform the search with multimodal inputs
-            search_results = await self.category_free_search.search(
-                query=query,
+            # Price, color, category and gender filters run inside the ANN query as indexed
+            # payload conditions instead of being approximated with embedding boosts
+            search_results = await asyncio.to_thread(
+                self.category_free_search.search,
+                text=query,
                 image_embedding=image_embedding,
-                user_id=user_id,
-                colors=colors,
-                categories=categories,
-                price_range=filters.get("price_range") if filters else None,
-                sort_by=filters.get("sort_by") if filters else None,
-                page=filters.get("page", 1) if filters else 1,
-                page_size=filters.get("page_size", 20) if filters else 20
-            )
+                n_results=page * page_size,
+                filters=filters
+            ) or []
+            
+            items = [self._result_to_item(result, collection_name) for result, collection_name in search_results]
+            
+            sort_by = filters.get("sort_by") if filters else None
+            if taste_vector is not None:
+                # Re-rank the whole pool before paging so personalization can promote
+                # items from later pages
+                items = self._personalize(items, taste_vector, rerank=sort_by not in ("price_asc", "price_desc"))
+            for item in items:
+                item.pop("embedding", None)
             
-            logger.info(f"Search returned {len(search_results)} results")
-            return search_results
+            if sort_by in ("price_asc", "price_desc"):
+                # Sort the whole pool before paging; unpriced items go last in either direction
+                priced = [item for item in items if isinstance(item["price"], (int, float))]
+                unpriced = [item for item in items if not isinstance(item["price"], (int, float))]
+                priced.sort(key=lambda item: item["price"], reverse=sort_by == "price_desc")
+                items = priced + unpriced
+            items = items[(page - 1) * page_size:page * page_size]
+            
+            logger.info(f"Search returned {len(items)} results")
+            return items
         except Exception as e:
             logger.error(f"Error performing search: {str(e)}")
             return []
     
+    @staticmethod
+    def _result_to_item(result, collection_name: str) -> Dict[str, Any]:
+        payload = result.payload or {}
+        return {
+            "id": str(payload.get("product_id") or f"{collection_name}:{result.id}"),
+            "key": f"{collection_name}:{result.id}",
+            "name": payload.get("product_name", "N/A"),
+            "price": payload.get("price"),
+            "image_url": payload.get("image_url", ""),
+            "link": payload.get("link"),
+            "category": payload.get("category"),
+            "gender": payload.get("gender"),
+            "colors": payload.get("color", []),
+            "collection": collection_name,
+            "score": result.score,
+            "embedding": dense_vector(result)
+        }
+    
+    @staticmethod
+    def _personalize(items: List[Dict[str, Any]], taste_vector: List[float], rerank: bool = True) -> List[Dict[str, Any]]:
+        """Score every item against the user's taste vector in one pass and re-rank by the blend"""
+        order, compatibility = taste_rerank(
+            taste_vector,
+            [item.get("embedding") for item in items],
+            [item.get("score") or 0.0 for item in items]
+        )
+        for item, score in zip(items, compatibility):
+            item["style_compatibility"] = round(score, 3)
+        return [items[i] for i in order] if rerank else items
+    
     async def _compose_outfit(self, 
                              query: str, 
                              search_results: List[Dict[str, Any]],
@@ -203,6 +250,28 @@ class MultiModalIntegration:
                 if "colors" in filters and filters["colors"]:
                     color_scheme = " and ".join(filters["colors"])
             
+            # Compose locally by beam search over catalogue candidates; Gemini is the fallback
+            outfits = await asyncio.to_thread(
+                self.outfit_composer.compose,
+                text=query,
+                style_profile=style_profile,
+                filters=filters
+            )
+            if outfits:
+                return {
+                    "query": query,
+                    "outfit": {"items": outfits[0]["items"], "score": outfits[0]["score"], "total_price": outfits[0]["total_price"]},
+                    "alternatives": outfits[1:],
+                    "metadata": {
+                        "theme": theme,
+                        "occasion": occasion,
+                        "season": season,
+                        "color_scheme": color_scheme,
+                        "composer": "beam_search",
+                        "total_search_results": len(search_results)
+                    }
+                }
+            
             # Generate the outfit using Gemini
             outfit = await self.gemini_service.generate_outfit(
                 search_results=search_results[:10],  # Top 10 search results
@@ -277,7 +346,7 @@ class MultiModalIntegration:
                 enhanced_item = item.copy()
                 
                 # Add style compatibility score if style profile is available
-                if style_profile:
+                if style_profile and "style_compatibility" not in enhanced_item:
                     enhanced_item["style_compatibility"] = self._calculate_style_compatibility(
                         item, style_profile
                     )
@@ -312,19 +381,35 @@ class MultiModalIntegration:
     def _get_similar_items(self, 
                           search_results: List[Dict[str, Any]],
                           query: str) -> Dict[str, List[Dict[str, Any]]]:
-        """Get similar items for each search result"""
-        # This would use vector similarity search
-        # For now, return empty dict
-        return {}
+        """Get similar items for each search result from the precomputed neighbour graph"""
+        neighbour_index = get_neighbour_index()
+        similar_items = {}
+        for item in search_results:
+            neighbours = neighbour_index.similar(item.get("key") or item.get("id"), n=5)
+            if neighbours:
+                similar_items[item["id"]] = neighbours
+        return similar_items
     
     def _calculate_style_compatibility(self, 
                                       item: Dict[str, Any],
                                       style_profile: Dict[str, Any]) -> float:
-        """Calculate style compatibility score between an item and user profile"""
-        # This would implement a scoring algorithm
-        # For now, return a random score between 0.5 and 1.0
-        import random
-        return round(random.uniform(0.5, 1.0), 2)
+        """
+        Profile-only compatibility for users without interaction history: share of the
+        item's colors and category that match the stated preferences, minus dislikes
+        """
+        colors = {color.lower() for color in item.get("colors") or []}
+        preferred_colors = {color.lower() for color in style_profile.get("preferred_colors") or []}
+        disliked_colors = {color.lower() for color in style_profile.get("disliked_colors") or []}
+        preferred_categories = {category.lower() for category in style_profile.get("preferred_categories") or []}
+
+        score = 0.5
+        if colors and preferred_colors:
+            score += 0.3 * len(colors & preferred_colors) / len(colors)
+        if colors and disliked_colors:
+            score -= 0.3 * len(colors & disliked_colors) / len(colors)
+        if preferred_categories and (item.get("category") or "").lower() in preferred_categories:
+            score += 0.2
+        return round(min(1.0, max(0.0, score)), 2)
 
 # Create a singleton instance for easy import
 integration = MultiModalIntegration() 
\ No newline at end of file
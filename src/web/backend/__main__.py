@@ -17,6 +17,13 @@ app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size
 # Create uploads directory if it doesn't exist
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'profile_photos'), exist_ok=True)
 
+# Indexes declared by the social and profile models (see models/indexes.py)
+try:
+    from models.indexes import ensure_indexes
+    ensure_indexes()
+except Exception as e:
+    print(f"Could not ensure model indexes: {str(e)}")
+
 # Register the API blueprint with all routes
 api_blueprint = register_routes()
 app.register_blueprint(api_blueprint, url_prefix='/api')
@@ -20,6 +20,7 @@ def register_routes():
     from . import social
     from . import outfits
     from . import gemini
+    from . import jobs
     
     # Return the blueprint after all routes are registered
     return api_blueprint
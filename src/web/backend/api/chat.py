@@ -4,11 +4,19 @@ import requests
 from . import api_blueprint
 from auth import auth_required
 from box import Box
-from utils.compress_base64_image import compress_base64_image
+from utils.encode_clip_image import encode_clip_image
+from utils.deadline import Deadline, DEADLINE_HEADER
 import traceback
+import os
+
+# End-to-end budget for a chat turn; the model service plans its stages against what is left of it
+CHAT_REQUEST_BUDGET = float(os.getenv("CHAT_REQUEST_BUDGET", "60"))
+# Extra time granted on top of the forwarded budget so the model service can still send its fallback answer
+CHAT_RESPONSE_GRACE = float(os.getenv("CHAT_RESPONSE_GRACE", "2"))
 
 @api_blueprint.route("/chat", methods=["POST"])
 def chat():
+    deadline = Deadline(CHAT_REQUEST_BUDGET)
     try:
         # Extract the auth token from the Authorization header
         auth_header = request.headers.get('Authorization')
@@ -39,18 +47,18 @@ def chat():
         if hasattr(body, 'imageBase64'):
             image_base64 = body.imageBase64
         
-        # Only compress image if it exists
-        compressed_image_base64 = None
-        if image_base64:
-            compressed_image_base64 = compress_base64_image(image_base64)
-
-        # Prepare request to model service
+        # Send the image as raw 224x224 RGB pixels in a multipart body instead of
+        # re-encoding it to base64 JSON; the model service embeds them as-is
         request_body = {
             "email": email,
             "query": query,
-            "image_base64": compressed_image_base64,
             "category": category
         }
+        files = None
+        if image_base64:
+            pixels, width, height, digest = encode_clip_image(image_base64)
+            request_body.update({"image_width": width, "image_height": height, "image_sha256": digest})
+            files = {"image": ("image.rgb", pixels, "application/octet-stream")}
 
         current_app.logger.info(f"Sending request to model service for user: {email}, query: {query[:50]}...")
         
@@ -58,9 +66,10 @@ def chat():
         try:
             response = requests.post(
                 "http://localhost:3002/ai/cat_free", # for docker host is: model_service:3002
-                json=request_body,
-                headers={"Authorization": f"Bearer {token}"},
-                timeout=1000  # Set a reasonable timeout
+                data=request_body,
+                files=files,
+                headers={"Authorization": f"Bearer {token}", DEADLINE_HEADER: deadline.to_header()},
+                timeout=deadline.timeout() + CHAT_RESPONSE_GRACE
             )
             
             # Check for response errors
@@ -75,6 +84,9 @@ def chat():
 
             return jsonify({"message": "Successfully executed.", "response": response_data.response}), 200
             
+        except requests.exceptions.Timeout as e:
+            current_app.logger.error(f"Model service did not answer within the request budget: {str(e)}")
+            return jsonify({"error": "Model service timed out", "details": str(e)}), 504
         except requests.exceptions.RequestException as e:
             current_app.logger.error(f"Error connecting to model service: {str(e)}")
             return jsonify({"error": "Cannot connect to model service", "details": str(e)}), 503
@@ -1,6 +1,7 @@
 from flask import request, jsonify, current_app
 from . import api_blueprint
-import jwt
+from auth import verify_token
+from services import run_as_job
 import os
 import json
 import base64
@@ -15,16 +16,6 @@ from gemini_service import GeminiService
 # Initialize Gemini Service
 gemini_service = GeminiService()
 
-# Helper function to verify token
-def verify_token(token):
-    try:
-        payload = jwt.decode(token, os.getenv('JWT_SECRET'), algorithms=["HS256"])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
 # Helper function to validate required fields
 def validate_required_fields(data, required_fields):
     for field in required_fields:
@@ -37,6 +28,7 @@ def validate_required_fields(data, required_fields):
 #
 
 @api_blueprint.route('/gemini/outfit-composition', methods=['POST'])
+@run_as_job("gemini_outfit_composition")
 def generate_outfit_composition():
     """Generate a complete outfit based on user preferences and optional seed item or theme"""
     auth_header = request.headers.get('Authorization')
@@ -103,6 +95,7 @@ def generate_outfit_composition():
 #
 
 @api_blueprint.route('/gemini/body-measurements', methods=['POST'])
+@run_as_job("gemini_body_measurements")
 def detect_gemini_body_measurements():
     """Detect estimated body measurements from a full-body photo"""
     auth_header = request.headers.get('Authorization')
@@ -161,6 +154,7 @@ def detect_gemini_body_measurements():
         return jsonify({"error": str(e)}), 500
 
 @api_blueprint.route('/gemini/outfit-analysis', methods=['POST'])
+@run_as_job("gemini_outfit_analysis")
 def analyze_outfit():
     """Analyze an outfit image to identify items and provide styling feedback"""
     auth_header = request.headers.get('Authorization')
@@ -226,6 +220,7 @@ def analyze_outfit():
 #
 
 @api_blueprint.route('/gemini/stylist-advice', methods=['POST'])
+@run_as_job("gemini_stylist_advice")
 def get_stylist_advice():
     """Get AI stylist advice for specific fashion questions or situations"""
     auth_header = request.headers.get('Authorization')
@@ -268,6 +263,7 @@ def get_stylist_advice():
         return jsonify({"error": str(e)}), 500
 
 @api_blueprint.route('/gemini/seasonal-wardrobe', methods=['POST'])
+@run_as_job("gemini_seasonal_wardrobe")
 def plan_seasonal_wardrobe():
     """Generate a seasonal wardrobe plan based on existing items and user preferences"""
     auth_header = request.headers.get('Authorization')
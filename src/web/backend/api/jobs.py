@@ -0,0 +1,33 @@
+from flask import jsonify, request
+from . import api_blueprint
+from services import JobService
+from services.job_service import token_owner
+
+
+@api_blueprint.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a background job; once finished it carries the route's response and status code"""
+    job = JobService().get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found or expired"}), 404
+
+    # Owner is the verified user id; another user's job looks the same as a missing one
+    if job.get("owner") and job["owner"] != token_owner(request.headers.get('Authorization')):
+        return jsonify({"error": "Job not found or expired"}), 404
+
+    data = {
+        "job_id": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job["created_at"].isoformat(),
+        "started_at": job["started_at"].isoformat() if job.get("started_at") else None,
+        "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None
+    }
+    if job["status"] == "done":
+        data["result"] = job.get("result")
+        data["status_code"] = job.get("status_code")
+    elif job["status"] == "failed":
+        data["error"] = job.get("error")
+        data["status_code"] = job.get("status_code")
+
+    return jsonify(data), 200
@@ -1,28 +1,20 @@
 from flask import request, jsonify, current_app
 from . import api_blueprint
-import jwt
+from services import run_as_job
+from auth import verify_token
 import os
 import json
 import base64
 from models.user_profile import StyleProfile, WardrobeItem
 from models.social import Post
+from models.wardrobe_index import wardrobe_index
+from utils.wardrobe_embedding import embed_wardrobe_item, embed_in_background, MODEL_SERVICE_URL
 from datetime import datetime
 import uuid
 import tempfile
 import requests
 import random
 
-# Helper function to verify token
-def verify_token(token):
-    try:
-        response = requests.get("http://localhost:3001/auth/check", headers={"Authorization": f"Bearer {token}"})
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except Exception as e:
-        current_app.logger.error(f"Token verification error: {str(e)}")
-        return None
-
 @api_blueprint.route('/outfits/compose', methods=['POST'])
 def compose_outfit():
     try:
@@ -31,10 +23,10 @@ def compose_outfit():
             return jsonify({"error": "Authentication required"}), 401
         
         auth_status = verify_token(token)
-        if not auth_status.get('success'):
-            return jsonify({"error": auth_status.get('message', 'Authentication failed')}), 401
+        if not auth_status:
+            return jsonify({"error": "Invalid or expired token"}), 401
         
-        user_id = auth_status.get('user_id')
+        user_id = auth_status.get('user_id') or auth_status.get('email')
         data = request.get_json()
         
         if not data or not isinstance(data, dict):
@@ -94,6 +86,55 @@ def compose_outfit():
             search_query += f"in {color_scheme} colors "
         if seed_item and seed_item.get('category'):
             search_query += f"to match {seed_item.get('color', '')} {seed_item.get('category', '')} "
+        
+        # Compose locally first: beam search over catalogue candidates in the model service,
+        # Gemini is only asked for the narrative when the client wants one
+        try:
+            response = requests.post(
+                f"{MODEL_SERVICE_URL}/ai/compose_outfit",
+                json={
+                    "text": search_query.strip() or None,
+                    "seed_item": seed_item,
+                    "style_profile": user_preferences,
+                    "filters": data.get('filters'),
+                    "slots": data.get('slots'),
+                    "n_outfits": int(data.get('n_outfits', 3))
+                },
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=30
+            )
+            outfits = response.json().get('outfits', []) if response.ok else []
+            if outfits:
+                best = outfits[0]
+                outfit = {
+                    "id": str(uuid.uuid4()),
+                    "title": f"{(theme or occasion or season or 'Your').title()} outfit",
+                    "description": "",
+                    "items": best['items'],
+                    "score": best['score'],
+                    "total_price": best['total_price'],
+                    "alternatives": outfits[1:]
+                }
+                if data.get('narrative', False):
+                    try:
+                        from gemini_service import GeminiService
+                        narrative = GeminiService().describe_outfit(best['items'], theme, occasion, season)
+                        if "error" not in narrative:
+                            outfit['title'] = narrative.get('title', outfit['title'])
+                            outfit['description'] = narrative.get('description', '')
+                            for item, reason in zip(outfit['items'], narrative.get('reasons', [])):
+                                item['reason'] = reason
+                    except Exception as e:
+                        current_app.logger.warning(f"Outfit narrative unavailable: {str(e)}")
+                
+                return jsonify({
+                    "success": True,
+                    "outfit": outfit,
+                    "message": "Outfit composed successfully"
+                })
+            current_app.logger.warning(f"Local outfit composer returned no outfit ({response.status_code}), falling back to Gemini")
+        except Exception as e:
+            current_app.logger.warning(f"Local outfit composer unavailable, falling back to Gemini: {str(e)}")
             
         search_items = []
         
@@ -207,10 +248,10 @@ def search_outfits():
             return jsonify({"error": "Authentication required"}), 401
         
         auth_status = verify_token(token)
-        if not auth_status.get('success'):
-            return jsonify({"error": auth_status.get('message', 'Authentication failed')}), 401
+        if not auth_status:
+            return jsonify({"error": "Invalid or expired token"}), 401
         
-        user_id = auth_status.get('user_id')
+        user_id = auth_status.get('user_id') or auth_status.get('email')
         data = request.get_json()
         
         if not data or not isinstance(data, dict):
@@ -380,10 +421,10 @@ def add_outfit_to_wardrobe():
             return jsonify({"error": "Authentication required"}), 401
         
         auth_status = verify_token(token)
-        if not auth_status.get('success'):
-            return jsonify({"error": auth_status.get('message', 'Authentication failed')}), 401
+        if not auth_status:
+            return jsonify({"error": "Invalid or expired token"}), 401
         
-        user_id = auth_status.get('user_id')
+        user_id = auth_status.get('user_id') or auth_status.get('email')
         data = request.get_json()
         
         if not data or not isinstance(data, dict):
@@ -417,7 +458,8 @@ def add_outfit_to_wardrobe():
                     purchased_date=item_details.get('purchased_date', None)
                 )
                 
-                # Save the item
+                # Embed it so it is searchable in the wardrobe index, then save
+                embed_wardrobe_item(wardrobe_item, token)
                 result = wardrobe_item.save()
                 
                 return jsonify({
@@ -463,7 +505,8 @@ def add_outfit_to_wardrobe():
                             purchased_date=None
                         )
                         
-                        # Save the item
+                        # Embed it so it is searchable in the wardrobe index, then save
+                        embed_wardrobe_item(wardrobe_item, token)
                         result = wardrobe_item.save()
                         added_items.append({
                             'id': result,
@@ -534,6 +577,7 @@ def share_outfit():
     })
 
 @api_blueprint.route('/outfits/analyze', methods=['POST'])
+@run_as_job("outfit_analysis")
 def analyze_outfit_image():
     """Analyze an outfit image to identify items and provide styling feedback"""
     auth_header = request.headers.get('Authorization')
@@ -606,4 +650,64 @@ def analyze_outfit_image():
         })
     except Exception as e:
         current_app.logger.error(f"Error analyzing outfit: {str(e)}")
-        return jsonify({"error": str(e)}), 500 
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500 
+
+@api_blueprint.route('/outfits/complete', methods=['POST'])
+def complete_outfit_from_wardrobe():
+    """Find catalogue items that complete the user's wardrobe items, with one batched vector search"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return jsonify({"error": "Authorization required"}), 401
+    
+    token = auth_header.split(' ')[1]
+    payload = verify_token(token)
+    if not payload:
+        return jsonify({"error": "Invalid or expired token"}), 401
+    
+    user_id = payload.get('user_id') or payload.get('email')
+    data = request.json or {}
+    
+    try:
+        items, matrix = wardrobe_index.get(user_id)
+        
+        # Items without an embedding (added before embeddings existed, or whose embedding failed
+        # on write) are embedded in the background; this request uses the ones already embedded
+        pending_embeddings = embed_in_background(wardrobe_index.unembedded(user_id), token)
+        
+        item_ids = data.get('item_ids')
+        rows = [row for row, item in enumerate(items) if not item_ids or item.id in item_ids]
+        if not rows:
+            return jsonify({"error": "No embedded wardrobe items to complete", "pending_embeddings": pending_embeddings}), 404
+        
+        response = requests.post(
+            f"{MODEL_SERVICE_URL}/ai/complete_outfit",
+            json={
+                "vectors": matrix[rows].tolist(),
+                "owned_categories": list({items[row].category for row in rows if items[row].category}),
+                "n_results": int(data.get('n_results', 8)),
+                "filters": data.get('filters')
+            },
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=30
+        )
+        if not response.ok:
+            return jsonify({"error": "Outfit completion failed", "details": response.text}), 502
+        suggestions = response.json().get('items', [])
+        
+        # Which owned pieces each suggestion goes with: one matrix product over the wardrobe
+        matches = wardrobe_index.match(user_id, [suggestion.pop('embedding', None) for suggestion in suggestions], k=2)
+        for suggestion, pairs in zip(suggestions, matches):
+            suggestion['pairs_with'] = [
+                {"id": item.id, "name": item.custom_name or item.product_name, "category": item.category, "score": round(score, 3)}
+                for item, score in pairs
+            ]
+        
+        return jsonify({
+            "success": True,
+            "items": suggestions,
+            "wardrobe_items": [items[row].to_dict() for row in rows],
+            "pending_embeddings": pending_embeddings
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error completing outfit: {str(e)}")
+        return jsonify({"error": "An error occurred during outfit completion", "details": str(e)}), 500
@@ -1,8 +1,10 @@
 from flask import request, jsonify, current_app, Blueprint
 from . import api_blueprint
-import jwt
+from auth import verify_token
 import os
 from models.user_profile import StyleProfile, BodyMeasurements, WardrobeItem, UserInteraction, UserPhoto
+from utils.wardrobe_embedding import embed_wardrobe_item
+from services import run_as_job
 from datetime import datetime
 import uuid
 import tempfile
@@ -11,16 +13,6 @@ import base64
 # Create a dedicated profile blueprint
 profile_bp = Blueprint('profile', __name__)
 
-# Helper function to verify token
-def verify_token(token):
-    try:
-        payload = jwt.decode(token, os.getenv('JWT_SECRET'), algorithms=["HS256"])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
 # Style Profile Endpoints
 @profile_bp.route('/profile/style', methods=['GET'])
 def get_style_profile():
@@ -249,6 +241,11 @@ def detect_body_measurements():
         current_app.logger.error(f"Error in body measurement detection: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@api_blueprint.route('/profile/measurements/detect', methods=['POST'])
+@run_as_job("measurement_detection")
+def api_detect_body_measurements():
+    return detect_body_measurements()
+
 # User Wardrobe Endpoints
 @profile_bp.route('/profile/wardrobe', methods=['GET'])
 def get_wardrobe():
@@ -313,6 +310,8 @@ def add_wardrobe_item():
         purchased_date=data.get('purchased_date')
     )
     
+    # Embed the item so outfit completion can search against it
+    embed_wardrobe_item(item, token)
     item.save()
     
     return jsonify({
@@ -65,6 +65,12 @@ async def search(
             from src.web.backend.models.user_profile import get_user_style_profile
             style_profile = await get_user_style_profile(user_id)
         
+        # Decayed taste vector from the user's interactions, used to re-rank results
+        taste_vector = None
+        if user_id:
+            from src.web.backend.models.user_taste import UserTaste
+            taste_vector = UserTaste.get_vector(user_id)
+        
         # Process the query using our integrated multimodal system
         results = await integration.process_query(
             query=search_request.query,
@@ -72,7 +78,8 @@ async def search(
             wardrobe_items=wardrobe_items,
             style_profile=style_profile,
             search_type=search_request.search_type,
-            filters=search_request.filters
+            filters=search_request.filters,
+            taste_vector=taste_vector
         )
         
         # Log the search for analytics
@@ -137,6 +144,12 @@ async def image_search(
             from src.web.backend.models.user_profile import get_user_style_profile
             style_profile = await get_user_style_profile(user_id)
         
+        # Decayed taste vector from the user's interactions, used to re-rank results
+        taste_vector = None
+        if user_id:
+            from src.web.backend.models.user_taste import UserTaste
+            taste_vector = UserTaste.get_vector(user_id)
+        
         # Process the query using our integrated multimodal system
         results = await integration.process_query(
             query=caption,
@@ -145,7 +158,8 @@ async def image_search(
             wardrobe_items=wardrobe_items,
             style_profile=style_profile,
             search_type=search_type,
-            filters=parsed_filters
+            filters=parsed_filters,
+            taste_vector=taste_vector
         )
         
         # Clean up temporary file
@@ -260,33 +274,17 @@ async def get_trending_items(
             except Exception as e:
                 logger.warning(f"Token verification failed: {str(e)}")
         
-        # For now, return mock trending data
-        trending_items = [
-            {
-                "id": f"item_{i}",
-                "name": f"Trending Item {i}",
-                "brand": f"Brand {i % 5 + 1}",
-                "category": category or f"Category {i % 7 + 1}",
-                "color": f"Color {i % 8 + 1}",
-                "price": 50 + (i * 10),
-                "currency": "USD",
-                "rating": 4.0 + (i % 10) / 10,
-                "image_url": f"https://placehold.co/300x400/9CA3AF/FFFFFF?text=Trending+{i}",
-                "trending_score": 90 - (i * 3),
-                "trending_days": i % 5 + 1
-            }
-            for i in range(limit)
-        ]
-        
-        # Filter by category if provided
-        if category:
-            trending_items = [item for item in trending_items if item["category"].lower() == category.lower()]
+        # Served from the lists precomputed by the offline recommendation job
+        from src.web.backend.models.recommendations import TrendingItems
+        trending = TrendingItems.get(category, limit) or {}
+        trending_items = trending.get("items", [])
         
         return {
             "items": trending_items,
             "metadata": {
                 "total": len(trending_items),
                 "category": category,
+                "generated_at": trending["generated_at"].isoformat() if trending.get("generated_at") else None,
                 "query_time": datetime.now().isoformat()
             }
         }
@@ -318,6 +316,21 @@ async def get_personalized_recommendations(
         except Exception as e:
             raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
         
+        # Precomputed list from the offline recommendation job: one indexed read
+        from src.web.backend.models.recommendations import UserRecommendations
+        precomputed = UserRecommendations.get_for_user(user_id, limit)
+        if precomputed and precomputed.get("items"):
+            return {
+                "items": precomputed["items"],
+                "metadata": {
+                    "total": len(precomputed["items"]),
+                    "context": context,
+                    "precomputed": True,
+                    "generated_at": precomputed["generated_at"].isoformat() if precomputed.get("generated_at") else None
+                }
+            }
+        
+        # Users the job has not seen yet fall back to generating on request
         # Get user's style profile
         from src.web.backend.models.user_profile import get_user_style_profile
         style_profile = await get_user_style_profile(user_id)
@@ -1,22 +1,12 @@
 from flask import request, jsonify, current_app
 from . import api_blueprint
-import jwt
+from auth import verify_token
 import os
 import json
 from models.social import Post, Comment, Like, OutfitChallenge, ChallengeEntry, StylistConsultation, FollowRelationship
 from datetime import datetime
 import uuid
 
-# Helper function to verify token
-def verify_token(token):
-    try:
-        payload = jwt.decode(token, os.getenv('JWT_SECRET'), algorithms=["HS256"])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
 #
 # Community Feed Endpoints
 #
@@ -35,23 +25,25 @@ def get_community_feed():
     
     user_id = payload.get('user_id') or payload.get('email')
     
-    # Optional parameters
-    page = int(request.args.get('page', 1))
+    # Optional parameters; `cursor` is the next_cursor of the previous page
+    cursor = request.args.get('cursor')
     limit = int(request.args.get('limit', 20))
+    following_only = request.args.get('following', '').lower() in ('1', 'true')
     
     try:
         # Get feed posts
-        posts = Post.get_feed(page=page, limit=limit)
+        posts, next_cursor = Post.get_feed(user_id=user_id, limit=limit, cursor=cursor, include_following_only=following_only)
         
         return jsonify({
             "message": "Posts retrieved successfully",
             "data": {
                 "posts": [post.to_dict() for post in posts],
-                "page": page,
                 "limit": limit,
-                "total": len(posts)  # In a real app, you'd return actual total count
+                "next_cursor": next_cursor
             }
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error retrieving feed: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -269,16 +261,24 @@ def get_challenge(challenge_id):
         if not challenge:
             return jsonify({"error": "Challenge not found"}), 404
         
-        # Get entries for this challenge
-        entries = ChallengeEntry.get_challenge_entries(challenge_id)
+        # Get a page of entries for this challenge
+        entries, next_cursor = ChallengeEntry.get_challenge_entries(
+            challenge_id,
+            limit=int(request.args.get('limit', 50)),
+            cursor=request.args.get('cursor'),
+            sort_by=request.args.get('sort', 'created_at')
+        )
         
         return jsonify({
             "message": "Challenge retrieved successfully",
             "data": {
                 "challenge": challenge.to_dict(),
-                "entries": [entry.to_dict() for entry in entries]
+                "entries": [entry.to_dict() for entry in entries],
+                "next_cursor": next_cursor
             }
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error retrieving challenge: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -563,12 +563,17 @@ def get_followers():
     user_id = payload.get('user_id') or payload.get('email')
     
     try:
-        followers = FollowRelationship.get_followers(user_id)
+        followers, next_cursor = FollowRelationship.get_followers(
+            user_id, limit=int(request.args.get('limit', 50)), cursor=request.args.get('cursor')
+        )
         
         return jsonify({
             "message": "Followers retrieved successfully",
-            "data": followers
+            "data": followers,
+            "next_cursor": next_cursor
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error retrieving followers: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -588,12 +593,17 @@ def get_following():
     user_id = payload.get('user_id') or payload.get('email')
     
     try:
-        following = FollowRelationship.get_following(user_id)
+        following, next_cursor = FollowRelationship.get_following(
+            user_id, limit=int(request.args.get('limit', 50)), cursor=request.args.get('cursor')
+        )
         
         return jsonify({
             "message": "Following list retrieved successfully",
-            "data": following
+            "data": following,
+            "next_cursor": next_cursor
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error retrieving following list: {str(e)}")
         return jsonify({"error": str(e)}), 500 
\ No newline at end of file
@@ -2,18 +2,18 @@ from flask import request, jsonify, current_app
 import requests
 import os
 import base64
-from io import BytesIO
 from dotenv import load_dotenv
 from . import api_blueprint
-import uuid
-import tempfile
+from services import run_as_job
+from utils.tryon_cache import tryon_cache, canonical_image_url
+from utils.tryon_inputs import load_tryon_inputs, is_data_url
 import json
-import re
 
 
 load_dotenv()
 
 @api_blueprint.route('/tryon', methods=['POST'])
+@run_as_job("tryon")
 def try_on():
     """
     API endpoint for virtual try-on feature using RapidAPI's try-on-diffusion API.
@@ -29,144 +29,32 @@ def try_on():
         data = request.form.to_dict()
         files = request.files
         
-        avatar_path = None
-        clothing_path = None
-        
-        try:
+        if 'avatar_image' in files and 'clothing_image' in files:
+            avatar_source = files['avatar_image']
+            clothing_source = files['clothing_image']
             
-            if 'avatar_image' in files and 'clothing_image' in files:
-                
-                avatar_file = files['avatar_image']
-                clothing_file = files['clothing_image']
-                
-              
-                result = try_on_with_files(avatar_file, clothing_file, api_key)
+        elif 'avatar_image_url' in data and 'clothing_image_url' in data:
+            avatar_source = data.get('avatar_image_url')
+            clothing_source = data.get('clothing_image_url')
+            
+            # Two web URLs are fetched by the try-on API itself
+            if not is_data_url(avatar_source) and not is_data_url(clothing_source):
+                result = try_on_with_url(avatar_source, clothing_source, api_key)
                 return jsonify(result)
-                
-            elif 'avatar_image_url' in data and 'clothing_image_url' in data:
-                avatar_url = data.get('avatar_image_url')
-                clothing_url = data.get('clothing_image_url')
-                
-               
-                is_avatar_base64 = avatar_url.startswith('data:image')
-                
-                is_clothing_base64 = clothing_url.startswith('data:image')
-                
-              
-                if is_avatar_base64 and is_clothing_base64:
-                    
-                    temp_dir = tempfile.gettempdir()
-                    
-                  
-                    try:
-                        avatar_data = re.sub('^data:image/.+;base64,', '', avatar_url)
-                        avatar_binary = base64.b64decode(avatar_data)
-                        avatar_name = f"{uuid.uuid4()}.jpg"
-                        avatar_path = os.path.join(temp_dir, avatar_name)
-                        
-                        with open(avatar_path, 'wb') as f:
-                            f.write(avatar_binary)
-                        
-                      
-                        clothing_data = re.sub('^data:image/.+;base64,', '', clothing_url)
-                        clothing_binary = base64.b64decode(clothing_data)
-                        clothing_name = f"{uuid.uuid4()}.jpg"
-                        clothing_path = os.path.join(temp_dir, clothing_name)
-                        
-                        with open(clothing_path, 'wb') as f:
-                            f.write(clothing_binary)
-                        
-                      
-                        result = try_on_with_temp_files(avatar_path, clothing_path, api_key)
-                        return jsonify(result)
-                    except Exception as e:
-                        return jsonify({"error": f"Failed to process base64 images: {str(e)}"}), 400
-                
-                
-                elif is_avatar_base64 and not is_clothing_base64:
-                    
-                    temp_dir = tempfile.gettempdir()
-                    
-                    try:
-                    
-                        avatar_data = re.sub('^data:image/.+;base64,', '', avatar_url)
-                        avatar_binary = base64.b64decode(avatar_data)
-                        avatar_name = f"{uuid.uuid4()}.jpg"
-                        avatar_path = os.path.join(temp_dir, avatar_name)
-                        
-                        with open(avatar_path, 'wb') as f:
-                            f.write(avatar_binary)
-                        
-                        
-                        try:
-                            clothing_binary = download_image_from_url(clothing_url)
-                            clothing_name = f"{uuid.uuid4()}.jpg"
-                            clothing_path = os.path.join(temp_dir, clothing_name)
-                            
-                            with open(clothing_path, 'wb') as f:
-                                f.write(clothing_binary)
-                        except Exception as e:
-                            return jsonify({"error": f"Failed to download clothing image: {str(e)}"}), 400
-                        
-                        
-                        result = try_on_with_temp_files(avatar_path, clothing_path, api_key)
-                        return jsonify(result)
-                    except Exception as e:
-                        return jsonify({"error": f"Failed to process mixed format images: {str(e)}"}), 400
-                
-                
-                elif not is_avatar_base64 and not is_clothing_base64:
-                    result = try_on_with_url(avatar_url, clothing_url, api_key)
-                    return jsonify(result)
-                
-                
-                elif not is_avatar_base64 and is_clothing_base64:
-                   
-                    temp_dir = tempfile.gettempdir()
-                    
-                    try:
-                        
-                        try:
-                            avatar_binary = download_image_from_url(avatar_url)
-                            avatar_name = f"{uuid.uuid4()}.jpg"
-                            avatar_path = os.path.join(temp_dir, avatar_name)
-                            
-                            with open(avatar_path, 'wb') as f:
-                                f.write(avatar_binary)
-                        except Exception as e:
-                            return jsonify({"error": f"Failed to download avatar image: {str(e)}"}), 400
-                        
-                        
-                        clothing_data = re.sub('^data:image/.+;base64,', '', clothing_url)
-                        clothing_binary = base64.b64decode(clothing_data)
-                        clothing_name = f"{uuid.uuid4()}.jpg"
-                        clothing_path = os.path.join(temp_dir, clothing_name)
-                        
-                        with open(clothing_path, 'wb') as f:
-                            f.write(clothing_binary)
-                        
-                        
-                        result = try_on_with_temp_files(avatar_path, clothing_path, api_key)
-                        return jsonify(result)
-                    except Exception as e:
-                        return jsonify({"error": f"Failed to process mixed format images: {str(e)}"}), 400
-                
-                else:
-                    return jsonify({
-                        "error": "Invalid URL format. URLs must be either web URLs or properly formatted base64 images."
-                    }), 400
-                
-            else:
-                return jsonify({
-                    "error": "Invalid request. Provide either both 'avatar_image_url' and 'clothing_image_url' OR both 'avatar_image' and 'clothing_image' files."
-                }), 400
-                
-        finally:
             
-            if avatar_path and os.path.exists(avatar_path):
-                os.remove(avatar_path)
-            if clothing_path and os.path.exists(clothing_path):
-                os.remove(clothing_path)
+        else:
+            return jsonify({
+                "error": "Invalid request. Provide either both 'avatar_image_url' and 'clothing_image_url' OR both 'avatar_image' and 'clothing_image' files."
+            }), 400
+        
+        # Decode/download both images concurrently and keep them in memory
+        try:
+            avatar, clothing = load_tryon_inputs(avatar_source, clothing_source)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        result = try_on_with_images(avatar, clothing, api_key)
+        return jsonify(result)
                 
     except Exception as e:
         current_app.logger.error(f"Try-on API error: {str(e)}")
@@ -179,12 +67,13 @@ def try_on_with_url(avatar_url, clothing_url, api_key):
     url = "https://try-on-diffusion.p.rapidapi.com/try-on-url"
     
     
-    if "zara.net" in clothing_url:
-        
-        clothing_url = clothing_url.replace('///', '/')
-        if '://' in clothing_url:
-            protocol, rest = clothing_url.split('://', 1)
-            clothing_url = f"{protocol}://{rest.replace('//', '/')}"
+    clothing_url = canonical_image_url(clothing_url)
+    
+    # Same avatar and garment as an earlier try-on: serve the stored render
+    cache_key = tryon_cache.key(avatar_url, clothing_url)
+    cached = tryon_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     payload = {
         "avatar_image_url": avatar_url,
@@ -217,24 +106,25 @@ def try_on_with_url(avatar_url, clothing_url, api_key):
         
         try:
             result = response.json()
-            return result
         except ValueError:
             
             img_data = response.content
             
             base64_img = base64.b64encode(img_data).decode('utf-8')
-            return {
+            result = {
                 "success": True,
                 "image": base64_img,
                 "content_type": response.headers.get("Content-Type", "image/png")
             }
+        tryon_cache.put(cache_key, result)
+        return result
     except Exception as e:
         print(f"Error in try_on_with_url: {str(e)}")
         return {"error": f"Error accessing image URLs: {str(e)}"}
 
-def try_on_with_temp_files(avatar_path, clothing_path, api_key):
+def try_on_with_images(avatar, clothing, api_key):
     """
-    Function to handle try-on with temporary image files
+    Function to handle try-on with in-memory images, streamed straight into the multipart upload
     """
     url = "https://try-on-diffusion.p.rapidapi.com/try-on-file"
     
@@ -244,9 +134,15 @@ def try_on_with_temp_files(avatar_path, clothing_path, api_key):
     }
     
     try:
+        # Keyed on the original image content, so a retry with the same photos hits however they were sent
+        cache_key = tryon_cache.key(avatar.source_bytes, clothing.source_bytes)
+        cached = tryon_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         files = {
-            "avatar_image": (os.path.basename(avatar_path), open(avatar_path, 'rb'), "image/jpeg"),
-            "clothing_image": (os.path.basename(clothing_path), open(clothing_path, 'rb'), "image/jpeg")
+            "avatar_image": avatar.as_upload(),
+            "clothing_image": clothing.as_upload()
         }
         
         response = requests.post(url, files=files, headers=headers)
@@ -265,75 +161,18 @@ def try_on_with_temp_files(avatar_path, clothing_path, api_key):
         
         try:
             result = response.json()
-            return result
         except ValueError:
             
             img_data = response.content
             
             base64_img = base64.b64encode(img_data).decode('utf-8')
-            return {
+            result = {
                 "success": True,
                 "image": base64_img,
                 "content_type": response.headers.get("Content-Type", "image/png")
             }
+        tryon_cache.put(cache_key, result)
+        return result
     except Exception as e:
         current_app.logger.error(f"Error processing files: {str(e)}")
         return {"error": f"Error processing files: {str(e)}"}
-
-def try_on_with_files(avatar_file, clothing_file, api_key):
-   
-    avatar_path = None
-    clothing_path = None
-    
-    try:
-        
-        avatar_name = f"{uuid.uuid4()}.{avatar_file.filename.split('.')[-1]}"
-        clothing_name = f"{uuid.uuid4()}.{clothing_file.filename.split('.')[-1]}"
-        
-        
-        temp_dir = tempfile.gettempdir()
-        avatar_path = os.path.join(temp_dir, avatar_name)
-        clothing_path = os.path.join(temp_dir, clothing_name)
-        
-        avatar_file.save(avatar_path)
-        clothing_file.save(clothing_path)
-        
-        return try_on_with_temp_files(avatar_path, clothing_path, api_key)
-            
-    except Exception as e:
-        raise e
-    finally:
-        
-        if avatar_path and os.path.exists(avatar_path):
-            os.remove(avatar_path)
-        if clothing_path and os.path.exists(clothing_path):
-            os.remove(clothing_path)
-
-
-def download_image_from_url(image_url):
-    """Download an image from URL and return as binary data"""
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
-    
-    if "zara.net" in image_url:
-       
-        image_url = image_url.replace('///', '/')
-        if '://' in image_url:
-            protocol, rest = image_url.split('://', 1)
-            image_url = f"{protocol}://{rest.replace('//', '/')}"
-    
-    print(f"Downloading image from URL: {image_url}")
-    
-    try:
-        response = requests.get(image_url, headers=headers, timeout=30)
-        response.raise_for_status() 
-        content_type = response.headers.get('Content-Type', '')
-        if not content_type.startswith('image/'):
-            print(f"Warning: Content-Type is not an image: {content_type}")
-        
-        return response.content
-    except Exception as e:
-        print(f"Error downloading image from {image_url}: {str(e)}")
-        raise ValueError(f"Failed to download image from URL: {image_url}. Error: {str(e)}") 
\ No newline at end of file
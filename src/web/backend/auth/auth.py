@@ -7,6 +7,10 @@ from pathlib import Path
 import logging
 import traceback
 import os
+from dotenv import load_dotenv
+from .token_cache import token_cache
+
+load_dotenv()
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -80,6 +84,9 @@ except Exception as e:
     PRIVATE_KEY = None
     PUBLIC_KEY = None
 
+# Read once; verify_token runs on every authenticated request
+JWT_SECRET = os.getenv('JWT_SECRET')
+
 TOKEN_EXP_MINUTES = 60  # Increasing token lifetime to reduce expiration issues
 
 def create_token(email):
@@ -113,37 +120,54 @@ def create_token(email):
         logger.error(f"Error creating token: {str(e)}\n{traceback.format_exc()}")
         raise
 
+def _decode_token(token):
+    """Verify the signature with the key matching the token's algorithm; None if invalid"""
+    try:
+        algorithm = jwt.get_unverified_header(token).get("alg")
+    except jwt.InvalidTokenError as e:
+        logger.warning(f"Malformed token: {str(e)}")
+        return None
+    
+    if algorithm == "RS256":
+        if not PUBLIC_KEY:
+            logger.warning("RS256 token received but no public key is loaded")
+            return None
+        try:
+            data = jwt.decode(token, PUBLIC_KEY, algorithms=["RS256"])
+            logger.debug(f"Token verified with RS256: {data.get('email')}")
+            return data
+        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
+            logger.warning(f"RS256 token verification failed: {str(e)}")
+            return None
+    
+    if algorithm == "HS256":
+        # Same fallback create_token uses when JWT_SECRET is not set
+        jwt_secret = JWT_SECRET or 'default-secret-key-for-development-only'
+        try:
+            data = jwt.decode(token, jwt_secret, algorithms=["HS256"])
+            logger.debug(f"Token verified with HS256: {data.get('email')}")
+            return data
+        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
+            logger.warning(f"HS256 token verification failed: {str(e)}")
+            return None
+    
+    logger.warning(f"Unsupported token algorithm: {algorithm}")
+    return None
+
 def verify_token(token):
+    """
+    Decoded payload of a valid token, or None. Successful decodes are cached until the token
+    expires, so only the first request with a token pays for the signature check.
+    """
     try:
-        # First try with RS256
-        if PUBLIC_KEY:
-            try:
-                data = jwt.decode(token, PUBLIC_KEY, algorithms=["RS256"])
-                logger.debug(f"Token verified with RS256: {data.get('email')}")
-                return data
-            except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
-                logger.warning(f"RS256 token verification failed: {str(e)}")
-                # Fall through to try HS256
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
         
-        # Then try with HS256
-        jwt_secret = os.getenv('JWT_SECRET')
-        if jwt_secret:
-            try:
-                data = jwt.decode(token, jwt_secret, algorithms=["HS256"])
-                logger.debug(f"Token verified with HS256: {data.get('email')}")
-                return data
-            except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
-                logger.warning(f"HS256 token verification failed: {str(e)}")
-        else:
-            # Try with default secret as last resort
-            try:
-                data = jwt.decode(token, 'default-secret-key-for-development-only', algorithms=["HS256"])
-                logger.debug(f"Token verified with default secret: {data.get('email')}")
-                return data
-            except (jwt.ExpiredSignatureError, jwt.InvalidTokenError) as e:
-                logger.warning(f"Default secret token verification failed: {str(e)}")
-                
-        return None
+        data = _decode_token(token)
+        if data:
+            token_cache.put(token, data)
+        return data
     except Exception as e:
         logger.error(f"Unexpected error in token verification: {str(e)}\n{traceback.format_exc()}")
         return None
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+import os
+
+# Decoded tokens kept in memory; one entry per active session is plenty
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+
+class DecodedTokenCache:
+    """
+    LRU of successfully verified tokens keyed by the token's sha256, each entry valid until the
+    token's own `exp`. A repeat request with the same token skips the signature check entirely.
+    Tokens without an `exp` claim are never cached.
+    """
+    def __init__(self, max_size=AUTH_TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Callers attach the payload to the request and may modify it
+        return dict(payload)
+
+    def put(self, token, payload):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(payload), float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+token_cache = DecodedTokenCache()
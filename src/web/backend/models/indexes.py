@@ -0,0 +1,166 @@
+"""
+Index registry for the social and profile collections.
+
+Each model declares the indexes its queries need as an `indexes` class attribute; REGISTRY
+pairs the models with their collections. Run from src/web/backend:
+
+    python -m models.indexes ensure    # create missing indexes (also done at startup)
+    python -m models.indexes verify    # compare the live indexes with the declarations
+    python -m models.indexes explain   # report query shapes that scan a whole collection
+"""
+import argparse
+import sys
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from . import social, user_profile
+from .pagination import keyset_query
+
+REGISTRY = [
+    (social.posts, social.Post),
+    (social.comments, social.Comment),
+    (social.likes, social.Like),
+    (social.outfit_challenges, social.OutfitChallenge),
+    (social.challenge_entries, social.ChallengeEntry),
+    (social.stylist_consultations, social.StylistConsultation),
+    (social.follow_relationships, social.FollowRelationship),
+    (user_profile.user_profiles, user_profile.StyleProfile),
+    (user_profile.user_interactions, user_profile.UserInteraction),
+    (user_profile.user_wardrobes, user_profile.WardrobeItem),
+    (user_profile.body_measurements, user_profile.BodyMeasurements),
+    (user_profile.user_photos, user_profile.UserPhoto),
+]
+
+
+def _query_shapes():
+    """(name, collection, filter, sort) for every query the models run, with placeholder values"""
+    now = datetime.now()
+    newest_first = [("created_at", -1), ("_id", -1)]
+    oldest_first = [("created_at", 1), ("_id", 1)]
+    return [
+        ("community feed", social.posts, {"visibility": "public"}, newest_first),
+        ("community feed, next page", social.posts, keyset_query({"visibility": "public"}, newest_first, [now, "id"]), newest_first),
+        ("user posts", social.posts, {"user_id": "id"}, newest_first),
+        ("timeline pull", social.posts, {"user_id": {"$in": ["id"]}, "visibility": {"$ne": "private"}}, newest_first),
+        ("post comments", social.comments, {"post_id": "id"}, oldest_first),
+        ("user has liked", social.likes, {"user_id": "id", "target_id": "id", "target_type": "post"}, None),
+        ("likes of target", social.likes, {"target_id": "id", "target_type": "post"}, None),
+        ("active challenges", social.outfit_challenges, {"start_date": {"$lte": now}, "end_date": {"$gte": now}}, [("end_date", 1)]),
+        ("upcoming challenges", social.outfit_challenges, {"start_date": {"$gt": now}}, [("start_date", 1)]),
+        ("completed challenges", social.outfit_challenges, {"end_date": {"$lt": now}}, [("end_date", -1)]),
+        ("challenge entries by time", social.challenge_entries, {"challenge_id": "id"}, oldest_first),
+        ("challenge entries by votes", social.challenge_entries, {"challenge_id": "id"}, [("vote_count", -1), ("_id", -1)]),
+        ("user challenge entries", social.challenge_entries, {"user_id": "id"}, newest_first),
+        ("user consultations", social.stylist_consultations, {"user_id": "id"}, [("date", -1)]),
+        ("followers", social.follow_relationships, {"followed_id": "id"}, newest_first),
+        ("following", social.follow_relationships, {"follower_id": "id"}, newest_first),
+        ("is following", social.follow_relationships, {"follower_id": "id", "followed_id": "id"}, None),
+        ("followed high-follower authors", social.follow_relationships, {"follower_id": "id", "followed_id": {"$in": ["id"]}}, None),
+        ("style profile", user_profile.user_profiles, {"user_id": "id"}, None),
+        ("interaction history", user_profile.user_interactions, {"user_id": "id"}, [("timestamp", -1)]),
+        ("interaction history by type", user_profile.user_interactions, {"user_id": "id", "interaction_type": "view"}, [("timestamp", -1)]),
+        ("wardrobe", user_profile.user_wardrobes, {"user_id": "id"}, None),
+        ("body measurements", user_profile.body_measurements, {"user_id": "id"}, None),
+        ("profile photo", user_profile.user_photos, {"user_id": "id"}, None),
+    ]
+
+
+def ensure_indexes():
+    """Create the declared indexes (no-op for those that exist). Returns the failures as strings"""
+    failures = []
+    for collection, model in REGISTRY:
+        try:
+            collection.create_indexes(model.indexes)
+        except DuplicateKeyError as e:
+            failures.append(f"{collection.name}: existing duplicates block a unique index, remove them first ({str(e)})")
+        except OperationFailure as e:
+            failures.append(f"{collection.name}: {str(e)}")
+    for failure in failures:
+        print(f"Index creation failed for {failure}")
+    return failures
+
+
+def verify_indexes():
+    """Declared indexes that are missing or differ from the live ones, as strings"""
+    problems = []
+    for collection, model in REGISTRY:
+        live = collection.index_information()
+        for index in model.indexes:
+            spec = index.document
+            name = spec["name"]
+            if name not in live:
+                problems.append(f"{collection.name}.{name}: missing")
+                continue
+            if list(live[name]["key"]) != list(spec["key"].items()):
+                problems.append(f"{collection.name}.{name}: keys {live[name]['key']} instead of {list(spec['key'].items())}")
+            if bool(live[name].get("unique")) != bool(spec.get("unique")):
+                problems.append(f"{collection.name}.{name}: unique={bool(live[name].get('unique'))}, declared unique={bool(spec.get('unique'))}")
+    return problems
+
+
+def _plan_stages(plan):
+    """Every (stage, index name) in an explain() plan tree, classic or slot-based engine"""
+    if isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+    elif isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"], plan.get("indexName")
+        for value in plan.values():
+            if isinstance(value, (dict, list)):
+                yield from _plan_stages(value)
+
+
+def explain_query_shapes():
+    """
+    Run explain() over every query shape and return (name, stages, index names) for each. A
+    COLLSCAN stage means the query reads the whole collection; SORT means an in-memory sort.
+    """
+    reports = []
+    for name, collection, query, sort in _query_shapes():
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.limit(21).explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = list(_plan_stages(plan))
+        reports.append((
+            name,
+            sorted({stage for stage, _ in stages}),
+            sorted({index_name for _, index_name in stages if index_name})
+        ))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Social and profile collection index tools")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("ensure", help="create missing indexes (default)")
+    subparsers.add_parser("verify", help="compare live indexes with the model declarations")
+    subparsers.add_parser("explain", help="report query shapes that scan whole collections or sort in memory")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        problems = verify_indexes()
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} index problem(s)")
+        sys.exit(1 if problems else 0)
+
+    if args.command == "explain":
+        collection_scans = 0
+        for name, stages, index_names in explain_query_shapes():
+            if "COLLSCAN" in stages:
+                collection_scans += 1
+                status = "COLLSCAN"
+            elif "SORT" in stages:
+                status = "in-memory sort"
+            else:
+                status = "ok"
+            print(f"{name:<35} {status:<15} {', '.join(index_names) or '-'}")
+        print(f"{collection_scans} query shape(s) scan a whole collection")
+        sys.exit(1 if collection_scans else 0)
+
+    sys.exit(1 if ensure_indexes() else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import base64
+from bson import json_util
+
+# Largest page a client may ask for
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for the sort key of the last item on a page"""
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Sort key back from a cursor token; ValueError if the token was not made by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        # Naive UTC datetimes, like the ones pymongo returns, so cursor values compare with documents
+        values = json_util.loads(raw.decode("utf-8"), json_options=json_util.JSONOptions(tz_aware=False))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort, values):
+    """
+    Query clause selecting the documents that come after `values` in `sort` order, e.g. for
+    [("created_at", -1), ("_id", -1)]: created_at < v0, or created_at == v0 and _id < v1.
+    With a compound index on the same keys this is an index range seek at any depth.
+    """
+    if len(values) != len(sort):
+        raise ValueError("Invalid cursor")
+    branches = []
+    for position, (field, direction) in enumerate(sort):
+        branch = {sort[i][0]: values[i] for i in range(position)}
+        branch[field] = {"$lt" if direction < 0 else "$gt": values[position]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+def keyset_query(query, sort, values):
+    """`query` restricted to the documents after the sort key `values`"""
+    after = keyset_filter(sort, values)
+    if any(field in query for field, _ in sort) or "$or" in query:
+        return {"$and": [query, after]}
+    # Repeat the equality prefix in every branch so each one is a bounded index scan
+    return {"$or": [dict(query, **branch) for branch in after["$or"]]}
+
+
+def paginate(collection, query, sort, limit=20, cursor=None):
+    """
+    One page of `collection.find(query)` in `sort` order, which must end in a unique field
+    (`_id`). Returns (documents, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    if cursor:
+        query = keyset_query(query, sort, decode_cursor(cursor))
+
+    # One extra document tells whether there is a next page without a count
+    documents = list(collection.find(query).sort(sort).limit(limit + 1))
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor([last.get(field) for field, _ in sort])
+    return documents, next_cursor
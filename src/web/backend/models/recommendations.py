@@ -0,0 +1,36 @@
+from pymongo import MongoClient
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# MongoDB Connection
+MONGO_URL = os.getenv("MONGO_URL_COMBINED")
+client = MongoClient(MONGO_URL)
+db = client.fashion_db
+
+# Written by `python -m model_structure build-recommendations`, unique index on user_id
+user_recommendations = db.user_recommendations
+
+# Written by the same job, one document per category plus category None for overall
+trending_items = db.trending_items
+
+class UserRecommendations:
+    """Precomputed per-user recommendation list, read with a single indexed lookup"""
+    @classmethod
+    def get_for_user(cls, user_id, limit=10):
+        data = user_recommendations.find_one(
+            {"user_id": user_id},
+            {"_id": 0, "items": {"$slice": limit}, "generated_at": 1}
+        )
+        return data
+
+class TrendingItems:
+    """Precomputed trending lists, overall or per category"""
+    @classmethod
+    def get(cls, category=None, limit=10):
+        data = trending_items.find_one(
+            {"category": category.lower() if category else None},
+            {"_id": 0, "items": {"$slice": limit}, "generated_at": 1}
+        )
+        return data
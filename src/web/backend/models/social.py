@@ -1,8 +1,11 @@
 from datetime import datetime
 from bson import ObjectId
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 import os
 from dotenv import load_dotenv
+from .pagination import paginate
+from .timeline import Timeline
 
 load_dotenv()
 
@@ -22,6 +25,12 @@ follow_relationships = db.follow_relationships
 
 class Post:
     """User post model for the style community"""
+    # Keyset pagination: every listing sorts on (created_at, _id) behind its equality filter
+    indexes = [
+        IndexModel([("visibility", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="feed"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_posts")
+    ]
+    
     def __init__(self, user_id, content=None, title=None, image_urls=None, 
                  outfit_items=None, tags=None, visibility="public"):
         self.id = str(ObjectId())
@@ -77,6 +86,8 @@ class Post:
             posts.update_one({"_id": self.id}, {"$set": self.to_dict()})
         else:
             posts.insert_one(self.to_dict())
+            # Push the new post into followers' home timelines
+            Timeline.fan_out(self.to_dict())
         return self
     
     @classmethod
@@ -87,23 +98,21 @@ class Post:
         return None
     
     @classmethod
-    def get_feed(cls, user_id, limit=20, offset=0, include_following_only=False):
-        """Get a feed of posts for a user - can be filtered to following only"""
+    def get_feed(cls, user_id=None, limit=20, cursor=None, include_following_only=False):
+        """Get a page of the feed for a user - can be filtered to following only.
+        Returns (posts, next_cursor)"""
         if include_following_only:
-            following_ids = [f["followed_id"] for f in 
-                             follow_relationships.find({"follower_id": user_id})]
-            query = {"user_id": {"$in": following_ids}, "visibility": {"$ne": "private"}}
+            # Read from the user's precomputed home timeline
+            documents, next_cursor = Timeline.get_page(user_id, limit, cursor)
         else:
-            query = {"visibility": "public"}
-            
-        cursor = posts.find(query).sort("created_at", -1).skip(offset).limit(limit)
-        return [cls.from_dict(post) for post in cursor]
+            documents, next_cursor = paginate(posts, {"visibility": "public"}, [("created_at", -1), ("_id", -1)], limit, cursor)
+        return [cls.from_dict(post) for post in documents], next_cursor
     
     @classmethod
-    def get_user_posts(cls, user_id, limit=20, offset=0):
-        """Get posts by a specific user"""
-        cursor = posts.find({"user_id": user_id}).sort("created_at", -1).skip(offset).limit(limit)
-        return [cls.from_dict(post) for post in cursor]
+    def get_user_posts(cls, user_id, limit=20, cursor=None):
+        """Get a page of posts by a specific user. Returns (posts, next_cursor)"""
+        documents, next_cursor = paginate(posts, {"user_id": user_id}, [("created_at", -1), ("_id", -1)], limit, cursor)
+        return [cls.from_dict(post) for post in documents], next_cursor
     
     def increment_like_count(self):
         posts.update_one({"_id": self.id}, {"$inc": {"like_count": 1}})
@@ -124,11 +133,15 @@ class Post:
     def delete(self):
         # Delete comments and likes when post is deleted
         comments.delete_many({"post_id": self.id})
-        likes.delete_many({"post_id": self.id})
+        likes.delete_many({"target_id": self.id, "target_type": "post"})
         posts.delete_one({"_id": self.id})
 
 class Comment:
     """Comment model for posts"""
+    indexes = [
+        IndexModel([("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="post_comments")
+    ]
+    
     def __init__(self, user_id, post_id, content):
         self.id = str(ObjectId())
         self.user_id = user_id
@@ -169,9 +182,10 @@ class Comment:
         return self
     
     @classmethod
-    def get_post_comments(cls, post_id, limit=50, offset=0):
-        cursor = comments.find({"post_id": post_id}).sort("created_at", 1).skip(offset).limit(limit)
-        return [cls.from_dict(comment) for comment in cursor]
+    def get_post_comments(cls, post_id, limit=50, cursor=None):
+        """Oldest first. Returns (comments, next_cursor)"""
+        documents, next_cursor = paginate(comments, {"post_id": post_id}, [("created_at", 1), ("_id", 1)], limit, cursor)
+        return [cls.from_dict(comment) for comment in documents], next_cursor
     
     def increment_like_count(self):
         comments.update_one({"_id": self.id}, {"$inc": {"like_count": 1}})
@@ -188,6 +202,11 @@ class Comment:
 
 class Like:
     """Like model for posts and comments"""
+    indexes = [
+        # One like per user and target, also under concurrent requests
+        IndexModel([("user_id", ASCENDING), ("target_id", ASCENDING), ("target_type", ASCENDING)], name="like_once", unique=True),
+        IndexModel([("target_id", ASCENDING), ("target_type", ASCENDING)], name="target_likes")
+    ]
     def __init__(self, user_id, target_id, target_type):
         self.id = str(ObjectId())
         self.user_id = user_id
@@ -226,6 +245,12 @@ class Like:
         if existing:
             return self
         
+        # Insert first so a concurrent duplicate is rejected by the unique index before counting
+        try:
+            likes.insert_one(self.to_dict())
+        except DuplicateKeyError:
+            return self
+        
         # Increment like count on the target
         if self.target_type == "post":
             post = Post.get_by_id(self.target_id)
@@ -234,8 +259,6 @@ class Like:
         elif self.target_type == "comment":
             # Increment like count on the comment
             comments.update_one({"_id": self.target_id}, {"$inc": {"like_count": 1}})
-            
-        likes.insert_one(self.to_dict())
         return self
     
     @classmethod
@@ -260,6 +283,11 @@ class Like:
 
 class OutfitChallenge:
     """Outfit challenge model for community challenges"""
+    # Active and completed challenges range over end_date, upcoming ones over start_date
+    indexes = [
+        IndexModel([("end_date", ASCENDING)], name="end_date"),
+        IndexModel([("start_date", ASCENDING)], name="start_date")
+    ]
     def __init__(self, title, description, theme, start_date, end_date, 
                  image_url=None, created_by=None, rules=None, prizes=None):
         self.id = str(ObjectId())
@@ -371,6 +399,12 @@ class OutfitChallenge:
 
 class ChallengeEntry:
     """Entry for an outfit challenge"""
+    indexes = [
+        IndexModel([("challenge_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="challenge_entries_by_time"),
+        IndexModel([("challenge_id", ASCENDING), ("vote_count", DESCENDING), ("_id", DESCENDING)], name="challenge_entries_by_votes"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_entries")
+    ]
+    
     def __init__(self, challenge_id, user_id, title, description, image_urls, 
                  outfit_items=None):
         self.id = str(ObjectId())
@@ -424,17 +458,21 @@ class ChallengeEntry:
         return self
     
     @classmethod
-    def get_challenge_entries(cls, challenge_id, limit=50, offset=0, sort_by="created_at"):
-        """Get entries for a specific challenge"""
+    def get_challenge_entries(cls, challenge_id, limit=50, cursor=None, sort_by="created_at"):
+        """Get a page of entries for a specific challenge. Returns (entries, next_cursor)"""
+        if sort_by not in ("created_at", "vote_count"):
+            raise ValueError(f"Cannot sort entries by {sort_by}")
         sort_order = -1 if sort_by == "vote_count" else 1  # Descending for votes, ascending for time
-        cursor = challenge_entries.find({"challenge_id": challenge_id}).sort(sort_by, sort_order).skip(offset).limit(limit)
-        return [cls.from_dict(entry) for entry in cursor]
+        documents, next_cursor = paginate(
+            challenge_entries, {"challenge_id": challenge_id}, [(sort_by, sort_order), ("_id", sort_order)], limit, cursor
+        )
+        return [cls.from_dict(entry) for entry in documents], next_cursor
     
     @classmethod
-    def get_user_entries(cls, user_id, limit=20, offset=0):
-        """Get all entries by a specific user"""
-        cursor = challenge_entries.find({"user_id": user_id}).sort("created_at", -1).skip(offset).limit(limit)
-        return [cls.from_dict(entry) for entry in cursor]
+    def get_user_entries(cls, user_id, limit=20, cursor=None):
+        """Get a page of entries by a specific user. Returns (entries, next_cursor)"""
+        documents, next_cursor = paginate(challenge_entries, {"user_id": user_id}, [("created_at", -1), ("_id", -1)], limit, cursor)
+        return [cls.from_dict(entry) for entry in documents], next_cursor
     
     def increment_vote_count(self):
         challenge_entries.update_one({"_id": self.id}, {"$inc": {"vote_count": 1}})
@@ -443,6 +481,10 @@ class ChallengeEntry:
 
 class StylistConsultation:
     """Model for AI Stylist Consultations"""
+    indexes = [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING)], name="user_consultations")
+    ]
+    
     def __init__(self, user_id, date, status="scheduled", focus_areas=None, 
                  questions=None, style_preferences=None, consultation_type="ai"):
         self.id = str(ObjectId())
@@ -543,6 +585,13 @@ class StylistConsultation:
 
 class FollowRelationship:
     """Model for user follow relationships"""
+    indexes = [
+        IndexModel([("followed_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="followers"),
+        IndexModel([("follower_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="following"),
+        # One relationship per pair; also serves is_following and the timeline's followed-author lookups
+        IndexModel([("follower_id", ASCENDING), ("followed_id", ASCENDING)], name="follow_pair", unique=True)
+    ]
+    
     def __init__(self, follower_id, followed_id):
         self.id = str(ObjectId())
         self.follower_id = follower_id
@@ -575,7 +624,14 @@ class FollowRelationship:
         })
         
         if not existing:
-            follow_relationships.insert_one(self.to_dict())
+            try:
+                follow_relationships.insert_one(self.to_dict())
+            except DuplicateKeyError:
+                return self
+            try:
+                Timeline.backfill(self.follower_id, self.followed_id)
+            except Exception as e:
+                print(f"Timeline backfill failed: {str(e)}")
         return self
     
     @classmethod
@@ -586,16 +642,16 @@ class FollowRelationship:
         }) is not None
     
     @classmethod
-    def get_followers(cls, user_id, limit=50, offset=0):
-        """Get users who follow the specified user"""
-        cursor = follow_relationships.find({"followed_id": user_id}).skip(offset).limit(limit)
-        return [rel["follower_id"] for rel in cursor]
+    def get_followers(cls, user_id, limit=50, cursor=None):
+        """Get a page of users who follow the specified user, newest first. Returns (ids, next_cursor)"""
+        documents, next_cursor = paginate(follow_relationships, {"followed_id": user_id}, [("created_at", -1), ("_id", -1)], limit, cursor)
+        return [rel["follower_id"] for rel in documents], next_cursor
     
     @classmethod
-    def get_following(cls, user_id, limit=50, offset=0):
-        """Get users that the specified user follows"""
-        cursor = follow_relationships.find({"follower_id": user_id}).skip(offset).limit(limit)
-        return [rel["followed_id"] for rel in cursor]
+    def get_following(cls, user_id, limit=50, cursor=None):
+        """Get a page of users that the specified user follows, newest first. Returns (ids, next_cursor)"""
+        documents, next_cursor = paginate(follow_relationships, {"follower_id": user_id}, [("created_at", -1), ("_id", -1)], limit, cursor)
+        return [rel["followed_id"] for rel in documents], next_cursor
     
     @classmethod
     def get_follower_count(cls, user_id):
@@ -605,8 +661,14 @@ class FollowRelationship:
     def get_following_count(cls, user_id):
         return follow_relationships.count_documents({"follower_id": user_id})
     
-    def delete(self):
+    @classmethod
+    def unfollow(cls, follower_id, followed_id):
         follow_relationships.delete_one({
-            "follower_id": self.follower_id,
-            "followed_id": self.followed_id
-        }) 
\ No newline at end of file
+            "follower_id": follower_id,
+            "followed_id": followed_id
+        })
+        # The unfollowed author's posts leave the follower's home timeline
+        Timeline.remove_author(follower_id, followed_id)
+    
+    def delete(self):
+        FollowRelationship.unfollow(self.follower_id, self.followed_id) 
@@ -0,0 +1,198 @@
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient, UpdateOne
+import threading
+import time
+import os
+from dotenv import load_dotenv
+from .pagination import encode_cursor, decode_cursor, MAX_PAGE_SIZE
+
+load_dotenv()
+
+# MongoDB Connection
+MONGO_URL = os.getenv("MONGO_URL_COMBINED")
+client = MongoClient(MONGO_URL)
+db = client.fashion_db
+
+# One document per user: {_id: user_id, entries: [{post_id, author_id, created_at}], updated_at}
+timelines = db.timelines
+# Authors with too many followers to fan out to; their posts are pulled at read time
+high_follower_accounts = db.high_follower_accounts
+posts = db.posts
+follow_relationships = db.follow_relationships
+
+# Newest entries kept per timeline; older posts fall off the end
+TIMELINE_SIZE = int(os.getenv("TIMELINE_SIZE", "500"))
+# Authors above this many followers are read on demand instead of pushed to every follower
+FANOUT_MAX_FOLLOWERS = int(os.getenv("FANOUT_MAX_FOLLOWERS", "5000"))
+# Recent posts copied into a timeline when its owner follows someone new
+TIMELINE_BACKFILL = int(os.getenv("TIMELINE_BACKFILL", "50"))
+FANOUT_BATCH = 1000
+# Other processes notice a newly high-follower author after this many seconds
+HIGH_FOLLOWER_TTL = float(os.getenv("HIGH_FOLLOWER_TTL", "60"))
+
+# Fan-out runs after the post is stored so creating a post does not wait on followers
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FANOUT_WORKERS", "2")), thread_name_prefix="timeline-fanout")
+
+
+def _entry(post):
+    return {"post_id": post["_id"], "author_id": post["user_id"], "created_at": post["created_at"]}
+
+
+def _push(entries):
+    """$push that keeps the timeline sorted newest first and capped"""
+    return {
+        "$push": {"entries": {"$each": entries, "$sort": {"created_at": -1, "post_id": -1}, "$slice": TIMELINE_SIZE}},
+        "$set": {"updated_at": datetime.now()}
+    }
+
+
+def _after(entry, position):
+    """Whether a (created_at, post_id) key sorts after the cursor position, newest first"""
+    created_at, post_id = position
+    return entry["created_at"] < created_at or (entry["created_at"] == created_at and entry["post_id"] < post_id)
+
+
+class Timeline:
+    """
+    Home timelines for following-only feeds, built by fan-out on write: a new post's id is
+    pushed into a capped timeline document of every follower, so reading the feed is a single
+    lookup by user id. Authors with more than FANOUT_MAX_FOLLOWERS followers are not pushed;
+    their posts are merged in at read time (fan-out on read).
+    """
+    _high_follower_ids = set()
+    _high_follower_loaded_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def high_follower_ids(cls):
+        with cls._lock:
+            if time.time() - cls._high_follower_loaded_at > HIGH_FOLLOWER_TTL:
+                cls._high_follower_ids = {doc["_id"] for doc in high_follower_accounts.find({}, {"_id": 1})}
+                cls._high_follower_loaded_at = time.time()
+            return cls._high_follower_ids
+
+    @classmethod
+    def _is_high_follower(cls, author_id):
+        if author_id in cls.high_follower_ids():
+            return True
+        follower_count = follow_relationships.count_documents({"followed_id": author_id}, limit=FANOUT_MAX_FOLLOWERS + 1)
+        if follower_count > FANOUT_MAX_FOLLOWERS:
+            high_follower_accounts.update_one(
+                {"_id": author_id}, {"$setOnInsert": {"since": datetime.now()}}, upsert=True
+            )
+            with cls._lock:
+                cls._high_follower_ids = cls._high_follower_ids | {author_id}
+            return True
+        return False
+
+    @classmethod
+    def fan_out(cls, post):
+        """Queue pushing a newly created post (a posts document) to its author's followers"""
+        if post.get("visibility") == "private":
+            return
+        _executor.submit(cls._fan_out, post)
+
+    @classmethod
+    def _fan_out(cls, post):
+        try:
+            if cls._is_high_follower(post["user_id"]):
+                return
+            update = _push([_entry(post)])
+            batch = []
+            for relation in follow_relationships.find({"followed_id": post["user_id"]}, {"follower_id": 1}):
+                batch.append(UpdateOne({"_id": relation["follower_id"]}, update))
+                if len(batch) >= FANOUT_BATCH:
+                    timelines.bulk_write(batch, ordered=False)
+                    batch = []
+            if batch:
+                timelines.bulk_write(batch, ordered=False)
+        except Exception as e:
+            print(f"Timeline fan-out failed for post {post.get('_id')}: {str(e)}")
+
+    @classmethod
+    def backfill(cls, follower_id, followed_id):
+        """Copy the recent posts of a newly followed author into the follower's timeline"""
+        if cls._is_high_follower(followed_id):
+            return
+        recent = posts.find(
+            {"user_id": followed_id, "visibility": {"$ne": "private"}},
+            {"user_id": 1, "created_at": 1}
+        ).sort([("created_at", -1), ("_id", -1)]).limit(TIMELINE_BACKFILL)
+        entries = [_entry(post) for post in recent]
+        if entries:
+            # Only existing timelines; one that is missing is rebuilt in full on first read
+            timelines.update_one({"_id": follower_id}, _push(entries))
+
+    @classmethod
+    def remove_author(cls, follower_id, followed_id):
+        timelines.update_one({"_id": follower_id}, {"$pull": {"entries": {"author_id": followed_id}}})
+
+    @classmethod
+    def _rebuild(cls, user_id):
+        """Timeline for a user who has none yet (e.g. data from before timelines existed)"""
+        high_followers = cls.high_follower_ids()
+        followed_ids = [
+            relation["followed_id"]
+            for relation in follow_relationships.find({"follower_id": user_id}, {"followed_id": 1})
+            if relation["followed_id"] not in high_followers
+        ]
+        recent = posts.find(
+            {"user_id": {"$in": followed_ids}, "visibility": {"$ne": "private"}},
+            {"user_id": 1, "created_at": 1}
+        ).sort([("created_at", -1), ("_id", -1)]).limit(TIMELINE_SIZE)
+        entries = [_entry(post) for post in recent]
+        timelines.update_one(
+            {"_id": user_id},
+            {"$setOnInsert": {"entries": entries, "updated_at": datetime.now()}},
+            upsert=True
+        )
+        return entries
+
+    @classmethod
+    def get_page(cls, user_id, limit=20, cursor=None):
+        """
+        One page of the user's following-only feed as (post documents, next_cursor): the pushed
+        timeline merged with the recent posts of followed high-follower authors.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        position = tuple(decode_cursor(cursor)) if cursor else None
+        if position is not None and len(position) != 2:
+            raise ValueError("Invalid cursor")
+
+        timeline = timelines.find_one({"_id": user_id}, {"entries": 1})
+        entries = timeline.get("entries", []) if timeline else cls._rebuild(user_id)
+        if position is not None:
+            entries = [entry for entry in entries if _after(entry, position)]
+        entries = entries[:limit + 1]
+
+        # Fan-out on read for the (few) high-follower authors this user follows
+        high_followers = list(cls.high_follower_ids())
+        if high_followers:
+            followed = [
+                relation["followed_id"] for relation in follow_relationships.find(
+                    {"follower_id": user_id, "followed_id": {"$in": high_followers}}, {"followed_id": 1}
+                )
+            ]
+            if followed:
+                query = {"user_id": {"$in": followed}, "visibility": {"$ne": "private"}}
+                if position is not None:
+                    query["$or"] = [
+                        {"created_at": {"$lt": position[0]}},
+                        {"created_at": position[0], "_id": {"$lt": position[1]}}
+                    ]
+                pulled = posts.find(query, {"user_id": 1, "created_at": 1}).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1)
+                seen = {entry["post_id"] for entry in entries}
+                entries += [_entry(post) for post in pulled if post["_id"] not in seen]
+                entries.sort(key=lambda entry: (entry["created_at"], entry["post_id"]), reverse=True)
+                entries = entries[:limit + 1]
+
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor([entries[-1]["created_at"], entries[-1]["post_id"]])
+
+        # Posts deleted or made private since they were pushed are dropped here
+        ids = [entry["post_id"] for entry in entries]
+        documents = {post["_id"]: post for post in posts.find({"_id": {"$in": ids}, "visibility": {"$ne": "private"}})}
+        return [documents[post_id] for post_id in ids if post_id in documents], next_cursor
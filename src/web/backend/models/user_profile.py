@@ -1,6 +1,7 @@
 from datetime import datetime
-from bson import ObjectId
-from pymongo import MongoClient
+from bson import ObjectId, Binary
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
+import numpy as np
 import os
 from dotenv import load_dotenv
 
@@ -28,6 +29,10 @@ user_photos = db.user_photos
 
 class StyleProfile:
     """Style profile model with user style preferences"""
+    indexes = [
+        IndexModel([("user_id", ASCENDING)], name="user_id")
+    ]
+    
     def __init__(self, user_id, preferred_colors=None, preferred_styles=None, 
                  preferred_categories=None, disliked_colors=None, disliked_styles=None, 
                  occasion_preferences=None, season_preferences=None, budget_range=None):
@@ -95,6 +100,11 @@ class StyleProfile:
 
 class UserInteraction:
     """User interaction model for tracking product interactions"""
+    # History is read per user, newest first
+    indexes = [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_history")
+    ]
+    
     def __init__(self, user_id, product_id, interaction_type, category=None, 
                  product_data=None, timestamp=None):
         self.user_id = user_id
@@ -127,6 +137,11 @@ class UserInteraction:
     
     def save(self):
         user_interactions.insert_one(self.to_dict())
+        try:
+            from .user_taste import UserTaste
+            UserTaste.record_interaction_async(self)
+        except Exception as e:
+            print(f"Error updating taste vector: {str(e)}")
         return self
     
     @classmethod
@@ -140,9 +155,13 @@ class UserInteraction:
 
 class WardrobeItem:
     """User wardrobe item model"""
+    indexes = [
+        IndexModel([("user_id", ASCENDING)], name="user_id")
+    ]
+    
     def __init__(self, user_id, product_id=None, category=None, color=None, 
                  style=None, season=None, occasions=None, image_url=None, 
-                 product_name=None, custom_name=None, purchased_date=None):
+                 product_name=None, custom_name=None, purchased_date=None, embedding=None):
         self.id = str(ObjectId())
         self.user_id = user_id
         self.product_id = product_id
@@ -156,6 +175,7 @@ class WardrobeItem:
         self.custom_name = custom_name
         self.purchased_date = purchased_date or datetime.now()
         self.added_at = datetime.now()
+        self.embedding = embedding  # FashionCLIP vector, stored as float16 bytes
     
     def to_dict(self):
         return {
@@ -191,10 +211,30 @@ class WardrobeItem:
         )
         item.id = data.get("_id")
         item.added_at = data.get("added_at", datetime.now())
+        if data.get("embedding"):
+            item.embedding = np.frombuffer(data["embedding"], dtype=np.float16).astype(np.float32)
         return item
     
+    def description(self):
+        """Text stand-in for items without a photo when embedding"""
+        return " ".join(part for part in [self.color, self.style, self.category, self.product_name] if part)
+    
     def save(self):
-        user_wardrobes.insert_one(self.to_dict())
+        data = self.to_dict()
+        if self.embedding is not None:
+            data["embedding"] = Binary(np.asarray(self.embedding, dtype=np.float16).tobytes())
+        user_wardrobes.insert_one(data)
+        from .wardrobe_index import wardrobe_index
+        wardrobe_index.invalidate(self.user_id)
+        return self
+    
+    def save_embedding(self):
+        user_wardrobes.update_one(
+            {"_id": self.id},
+            {"$set": {"embedding": Binary(np.asarray(self.embedding, dtype=np.float16).tobytes())}}
+        )
+        from .wardrobe_index import wardrobe_index
+        wardrobe_index.invalidate(self.user_id)
         return self
     
     @classmethod
@@ -211,6 +251,10 @@ class WardrobeItem:
 
 class BodyMeasurements:
     """User body measurements model"""
+    indexes = [
+        IndexModel([("user_id", ASCENDING)], name="user_id")
+    ]
+    
     def __init__(self, user_id, height=None, weight=None, chest=None, waist=None, 
                  hips=None, inseam=None, shoulders=None, sleeve_length=None, 
                  neck=None, body_shape=None, fit_preference=None):
@@ -287,6 +331,10 @@ class BodyMeasurements:
 
 class UserPhoto:
     """Model for user profile photos"""
+    indexes = [
+        IndexModel([("user_id", ASCENDING)], name="user_id")
+    ]
+    
     def __init__(self, user_id, photo_data, content_type):
         self.id = str(ObjectId())
         self.user_id = user_id
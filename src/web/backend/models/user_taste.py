@@ -0,0 +1,202 @@
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from bson import Binary
+from pymongo import MongoClient
+import numpy as np
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# MongoDB Connection
+MONGO_URL = os.getenv("MONGO_URL_COMBINED")
+client = MongoClient(MONGO_URL)
+db = client.fashion_db
+
+# User Taste Vector Collection
+user_tastes = db.user_tastes
+
+# Older interactions fade with this half-life, so taste follows recent behaviour
+TASTE_HALF_LIFE_DAYS = float(os.getenv("TASTE_HALF_LIFE_DAYS", "30"))
+
+# How strongly each interaction type pulls the taste vector towards the item
+INTERACTION_WEIGHTS = {
+    "view": 1.0,
+    "like": 3.0,
+    "try_on": 3.0,
+    "add_to_cart": 4.0,
+    "purchase": 5.0,
+    "dislike": -2.0,
+}
+
+# Taste updates (a catalogue lookup plus a versioned write) run after the interaction is stored
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TASTE_WORKERS", "2")), thread_name_prefix="taste-update")
+
+_qdrant_client = None
+
+
+def _get_qdrant_client():
+    global _qdrant_client
+    if _qdrant_client is None:
+        from qdrant_client import QdrantClient
+        _qdrant_client = QdrantClient(url=os.getenv("VECTORDB_URL"), api_key=os.getenv("VECTORDB_API"))
+    return _qdrant_client
+
+
+def catalogue_vector(product_id, product_data=None):
+    """
+    Embedding of an interacted item: taken from product_data when the client sent it,
+    otherwise fetched from the catalogue for ids of the form "<collection>:<point id>".
+    """
+    embedding = (product_data or {}).get("embedding")
+    if embedding:
+        return np.asarray(embedding, dtype=np.float32)
+
+    if not isinstance(product_id, str) or ":" not in product_id:
+        return None
+    collection_name, point_id = product_id.rsplit(":", 1)
+    point_id = int(point_id) if point_id.isdigit() else point_id
+    try:
+        points = _get_qdrant_client().retrieve(collection_name=collection_name, ids=[point_id], with_vectors=True)
+    except Exception as e:
+        logger.warning(f"Could not fetch catalogue vector for {product_id}: {str(e)}")
+        return None
+    if not points:
+        return None
+    vector = points[0].vector
+    if isinstance(vector, dict):
+        vector = vector.get("mean") or vector.get("")
+    return np.asarray(vector, dtype=np.float32) if vector else None
+
+
+class UserTaste:
+    """
+    Exponentially decayed sum of the embeddings a user interacted with.
+    Updates fold one interaction into the running sum, so history is never re-read;
+    the accumulator is stored as float16 bytes (1KB for a 512-d vector).
+    """
+    def __init__(self, user_id, vector=None, weight=0.0, interaction_count=0, updated_at=None, version=0):
+        self.user_id = user_id
+        self.vector = vector
+        self.weight = weight
+        self.interaction_count = interaction_count
+        self.updated_at = updated_at or datetime.now()
+        self.version = version
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "vector": Binary(self.vector.astype(np.float16).tobytes()) if self.vector is not None else None,
+            "dim": int(self.vector.shape[0]) if self.vector is not None else 0,
+            "weight": self.weight,
+            "interaction_count": self.interaction_count,
+            "updated_at": self.updated_at,
+            "version": self.version
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        vector = None
+        if data.get("vector"):
+            vector = np.frombuffer(data["vector"], dtype=np.float16).astype(np.float32)
+        return cls(
+            user_id=data.get("user_id"),
+            vector=vector,
+            weight=data.get("weight", 0.0),
+            interaction_count=data.get("interaction_count", 0),
+            updated_at=data.get("updated_at"),
+            version=data.get("version", 0)
+        )
+
+    @classmethod
+    def get_by_user_id(cls, user_id):
+        data = user_tastes.find_one({"user_id": user_id})
+        if data:
+            return cls.from_dict(data)
+        return None
+
+    @classmethod
+    def get_vector(cls, user_id):
+        """Unit-length taste direction, or None until the user has interacted with something."""
+        taste = cls.get_by_user_id(user_id)
+        if taste is None or taste.vector is None:
+            return None
+        norm = np.linalg.norm(taste.vector)
+        return taste.vector / norm if norm > 0 else None
+
+    @staticmethod
+    def _decay(earlier, later):
+        age_days = max(0.0, (later - earlier).total_seconds() / 86400)
+        return 0.5 ** (age_days / TASTE_HALF_LIFE_DAYS)
+
+    def apply(self, item_vector, interaction_type, timestamp=None):
+        event_at = timestamp or datetime.now()
+        weight = INTERACTION_WEIGHTS.get(interaction_type, 1.0)
+        norm = np.linalg.norm(item_vector)
+        if norm == 0:
+            return self
+        item_vector = item_vector / norm
+
+        if self.vector is None or self.vector.shape != item_vector.shape:
+            self.vector = np.zeros_like(item_vector)
+            self.weight = 0.0
+            self.updated_at = event_at
+        if event_at >= self.updated_at:
+            # Decay the accumulator up to the new event
+            decay = self._decay(self.updated_at, event_at)
+            self.vector = self.vector * decay + weight * item_vector
+            self.weight = self.weight * decay + abs(weight)
+            self.updated_at = event_at
+        else:
+            # Late event: decay it forward to updated_at, which never moves backwards
+            decay = self._decay(event_at, self.updated_at)
+            self.vector = self.vector + decay * weight * item_vector
+            self.weight = self.weight + decay * abs(weight)
+        self.interaction_count += 1
+        return self
+
+    @classmethod
+    def record_interaction_async(cls, interaction):
+        """Queue record_interaction so saving an interaction does not wait on the catalogue lookup"""
+        _executor.submit(cls._record_safely, interaction)
+
+    @classmethod
+    def _record_safely(cls, interaction):
+        try:
+            cls.record_interaction(interaction)
+        except Exception as e:
+            logger.error(f"Error updating taste vector: {str(e)}")
+
+    @classmethod
+    def record_interaction(cls, interaction, retries=3):
+        """Fold one UserInteraction into the user's taste vector with an optimistic version check."""
+        item_vector = catalogue_vector(interaction.product_id, interaction.product_data)
+        if item_vector is None:
+            return None
+
+        for _ in range(retries):
+            taste = cls.get_by_user_id(interaction.user_id) or cls(interaction.user_id)
+            expected_version = taste.version
+            taste.apply(item_vector, interaction.interaction_type, interaction.timestamp)
+            taste.version = expected_version + 1
+
+            if expected_version == 0:
+                # First interaction: only insert if nobody else created the document meanwhile
+                result = user_tastes.update_one(
+                    {"user_id": taste.user_id},
+                    {"$setOnInsert": taste.to_dict()},
+                    upsert=True
+                )
+                if result.upserted_id is not None:
+                    return taste
+            else:
+                result = user_tastes.update_one(
+                    {"user_id": taste.user_id, "version": expected_version},
+                    {"$set": taste.to_dict()}
+                )
+                if result.modified_count:
+                    return taste
+        logger.warning(f"Taste vector update for {interaction.user_id} lost a race {retries} times, skipping")
+        return None
@@ -0,0 +1,90 @@
+from collections import OrderedDict
+import numpy as np
+import threading
+import time
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Users whose wardrobe matrices are kept in memory, least recently used evicted first
+WARDROBE_INDEX_USERS = int(os.getenv("WARDROBE_INDEX_USERS", "1024"))
+# Other backend processes only see a wardrobe change after this many seconds
+WARDROBE_INDEX_TTL = float(os.getenv("WARDROBE_INDEX_TTL", "300"))
+
+class WardrobeIndex:
+    """
+    Per-user in-memory index of wardrobe embeddings: one normalized (n_items, dim) matrix per
+    user, so matching any number of query vectors against a wardrobe is a single matrix product.
+    Entries are built from Mongo on first use and dropped when the user's wardrobe changes.
+    """
+    def __init__(self, max_users=WARDROBE_INDEX_USERS, ttl=WARDROBE_INDEX_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _build(self, user_id):
+        from .user_profile import WardrobeItem
+        wardrobe = WardrobeItem.get_user_wardrobe(user_id)
+        items = [item for item in wardrobe if item.embedding is not None]
+        if items:
+            matrix = np.stack([item.embedding for item in items]).astype(np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        unembedded = [item for item in wardrobe if item.embedding is None]
+        return {"items": items, "matrix": matrix, "unembedded": unembedded, "built_at": time.time()}
+
+    def _entry(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.time() - entry["built_at"] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return entry
+
+        entry = self._build(user_id)
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get(self, user_id):
+        """(items, matrix) for the user's embedded wardrobe items, rows aligned"""
+        entry = self._entry(user_id)
+        return entry["items"], entry["matrix"]
+
+    def unembedded(self, user_id):
+        """The user's wardrobe items that have no embedding yet"""
+        return self._entry(user_id)["unembedded"]
+
+    def match(self, user_id, vectors, k=3):
+        """For each query vector, the k closest wardrobe items as [(item, score), ...]"""
+        items, matrix = self.get(user_id)
+        if not items or vectors is None or len(vectors) == 0:
+            return [[] for _ in range(0 if vectors is None else len(vectors))]
+
+        queries = np.zeros((len(vectors), matrix.shape[1]), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            if vector is not None and len(vector) == matrix.shape[1]:
+                queries[row] = vector
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+
+        scores = queries @ matrix.T
+        k = min(k, len(items))
+        top = np.argsort(-scores, axis=1)[:, :k]
+        return [
+            [(items[col], float(scores[row, col])) for col in top[row]] if norms[row, 0] > 0 else []
+            for row in range(len(vectors))
+        ]
+
+# Process-wide index shared by the API handlers
+wardrobe_index = WardrobeIndex()
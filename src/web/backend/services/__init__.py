@@ -1 +1,2 @@
-from .database_service import DatabaseService
\ No newline at end of file
+from .database_service import DatabaseService
+from .job_service import JobService, run_as_job
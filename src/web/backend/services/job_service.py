@@ -0,0 +1,161 @@
+import os
+import uuid
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from lib.singleton import Singleton
+from auth import verify_token
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Long-running requests executed at once per process; the rest wait in the queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Queued plus running jobs per process before new ones are refused with 503
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "64"))
+# How long a finished job (and its result) can still be fetched
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+# Upper bound for a job that never finishes, e.g. because its process died
+JOB_MAX_AGE = int(os.getenv("JOB_MAX_AGE", "86400"))
+
+# Headers the replayed request must not inherit; the test request builder sets them itself
+REPLAY_SKIPPED_HEADERS = {"content-length", "host", "prefer"}
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def token_owner(auth_header):
+    """
+    Jobs belong to the user who created them: the user id (or email) of a verified bearer
+    token, so the same user can fetch the result after their token is refreshed. None
+    without a valid token.
+    """
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    payload = verify_token(auth_header.split(" ")[1])
+    if not payload:
+        return None
+    return payload.get("user_id") or payload.get("email")
+
+
+def wants_async():
+    prefer = request.headers.get("Prefer", "")
+    return "respond-async" in prefer.lower() or request.args.get("async", "").lower() in ("1", "true")
+
+
+class JobService(metaclass=Singleton):
+    """
+    Runs slow requests (try-on, Gemini calls, image analysis) on a bounded thread pool and keeps
+    their status and result in the `jobs` collection, so a handful of slow calls cannot tie up
+    every Flask worker. Documents expire through a TTL index on `expires_at`.
+    """
+
+    def __init__(self):
+        self.collection = MongoClient(os.getenv("MONGO_URL_COMBINED")).fashion_db.jobs
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+        self.executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind, owner, fn):
+        """Queue fn() -> (body, status_code) and return the job id."""
+        with self._lock:
+            if self._pending >= JOB_MAX_PENDING:
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_one({
+                "_id": job_id,
+                "kind": kind,
+                "owner": owner,
+                "status": "queued",
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=JOB_MAX_AGE)
+            })
+            self.executor.submit(self._run, job_id, fn)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id, fn):
+        try:
+            self.collection.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+            )
+            try:
+                body, status_code = fn()
+                update = {"status": "done", "result": body, "status_code": status_code}
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {str(e)}\n{traceback.format_exc()}")
+                update = {"status": "failed", "error": str(e), "status_code": 500}
+            now = datetime.utcnow()
+            update.update({"finished_at": now, "expires_at": now + timedelta(seconds=JOB_RESULT_TTL)})
+            self.collection.update_one({"_id": job_id}, {"$set": update})
+        except Exception as e:
+            logger.error(f"Could not record result of job {job_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id):
+        return self.collection.find_one({"_id": job_id})
+
+
+def run_as_job(kind):
+    """
+    Let a slow route run in the background: requests sent with `Prefer: respond-async` (or
+    `?async=1`) get 202 and a job id at once, and the request is replayed on the job pool
+    against the same view. Everything else is served synchronously as before.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not wants_async():
+                return view(*args, **kwargs)
+
+            app = current_app._get_current_object()
+            # Captured before anything parses the body, so multipart uploads replay verbatim
+            body = request.get_data(cache=True)
+            method = request.method
+            path = request.path
+            query_string = request.query_string
+            content_type = request.content_type
+            headers = [(name, value) for name, value in request.headers.items() if name.lower() not in REPLAY_SKIPPED_HEADERS]
+
+            def replay():
+                with app.test_request_context(path, method=method, query_string=query_string, headers=headers,
+                                              data=body, content_type=content_type):
+                    response = app.make_response(view(*args, **kwargs))
+                    return response.get_json(silent=True), response.status_code
+
+            auth_header = request.headers.get("Authorization")
+            owner = token_owner(auth_header)
+            if auth_header and owner is None:
+                # The replayed view would refuse it anyway; refusing now keeps ownerless jobs to anonymous routes
+                return jsonify({"error": "Invalid or expired token"}), 401
+
+            try:
+                job_id = JobService().submit(kind, owner, replay)
+            except JobQueueFull:
+                return jsonify({"error": "Too many pending jobs, try again shortly"}), 503
+
+            response = jsonify({"job_id": job_id, "status": "queued", "status_url": f"/api/jobs/{job_id}"})
+            response.headers["Location"] = f"/api/jobs/{job_id}"
+            return response, 202
+        return wrapper
+    return decorator
@@ -1,6 +1,7 @@
 import io
 import base64
 from PIL import Image
+from utils.image_preprocessing import open_image
 
 
 def compress_base64_image(base64_str, quality=50, max_size=(512, 512)):
@@ -10,7 +11,8 @@ def compress_base64_image(base64_str, quality=50, max_size=(512, 512)):
     #base64 to byte
     base, base64_str = base64_str.split(",")
     image_data = base64.b64decode(base64_str)
-    image = Image.open(io.BytesIO(image_data))
+    # Decode at reduced resolution; only max_size worth of pixels is ever needed
+    image = open_image(image_data, max(max_size))
 
     #resize
     # image_to_encode = image.thumbnail(max_size, Image.Resampling.LANCZOS)
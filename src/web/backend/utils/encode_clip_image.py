@@ -0,0 +1,20 @@
+import base64
+import hashlib
+from utils.image_preprocessing import load_clip_image, CLIP_IMAGE_SIZE
+
+
+def encode_clip_image(base64_str, size=CLIP_IMAGE_SIZE):
+    """
+    Decode a base64 data URL and turn it into the raw RGB pixels FashionCLIP consumes:
+    shorter side resized to `size`, then center-cropped to `size` x `size`.
+    Returns (pixel bytes, width, height, sha256 hex digest of the pixels).
+    """
+    if base64_str is None:
+        return None
+
+    if "," in base64_str:
+        base64_str = base64_str.split(",", 1)[1]
+    image = load_clip_image(base64.b64decode(base64_str), size)
+
+    pixels = image.tobytes()
+    return pixels, size, size, hashlib.sha256(pixels).hexdigest()
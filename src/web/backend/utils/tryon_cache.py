@@ -0,0 +1,95 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRYON_CACHE_DIR = os.getenv("TRYON_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tryon_cache"))
+# Try-on results are full-size images, so bound the directory by bytes, not entries
+TRYON_CACHE_MAX_BYTES = int(os.getenv("TRYON_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Bump when the try-on API or its parameters change so old renders are not served
+TRYON_CACHE_VERSION = "1"
+
+
+def canonical_image_url(image_url):
+    """The URL as the try-on API is actually given it (Zara links carry doubled slashes)."""
+    image_url = image_url.strip().split('#', 1)[0]
+    if "zara.net" in image_url:
+        image_url = image_url.replace('///', '/')
+        if '://' in image_url:
+            protocol, rest = image_url.split('://', 1)
+            image_url = f"{protocol}://{rest.replace('//', '/')}"
+    return image_url
+
+
+def image_digest(image):
+    """sha256 of image bytes, or of the canonical URL for a remote image."""
+    if isinstance(image, str):
+        return "url:" + hashlib.sha256(canonical_image_url(image).encode("utf-8")).hexdigest()
+    return hashlib.sha256(image).hexdigest()
+
+
+class TryOnResultCache:
+    """
+    Disk cache of successful try-on results keyed by avatar and garment, so retrying the same
+    pair returns at once instead of spending another diffusion call. Least recently used
+    results are evicted once the directory passes max_bytes.
+    """
+    def __init__(self, directory=TRYON_CACHE_DIR, max_bytes=TRYON_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, avatar, clothing):
+        material = f"{TRYON_CACHE_VERSION}|{image_digest(avatar)}|{image_digest(clothing)}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                result = json.load(f)
+            # Mark as recently used
+            os.utime(path)
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        if not isinstance(result, dict) or "error" in result:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, self._path(key))
+        except (OSError, TypeError) as e:
+            print(f"Could not cache try-on result: {str(e)}")
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            try:
+                entries = [(entry.path, entry.stat()) for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+            except OSError:
+                return
+            total = sum(stat.st_size for _, stat in entries)
+            for path, stat in sorted(entries, key=lambda entry: entry[1].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= stat.st_size
+                except OSError:
+                    pass
+
+
+tryon_cache = TryOnResultCache()
@@ -0,0 +1,125 @@
+import io
+import os
+import re
+import base64
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from dotenv import load_dotenv
+from utils.tryon_cache import canonical_image_url
+
+load_dotenv()
+
+# Longest side sent to the try-on API, which downsizes anything larger itself. 0 disables.
+TRYON_MAX_SIDE = int(os.getenv("TRYON_MAX_SIDE", "1024"))
+TRYON_DOWNLOAD_TIMEOUT = float(os.getenv("TRYON_DOWNLOAD_TIMEOUT", "30"))
+
+DOWNLOAD_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Avatar and garment are fetched side by side; shared so requests do not each start threads
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TRYON_INPUT_WORKERS", "8")), thread_name_prefix="tryon-input")
+
+
+class TryOnImage:
+    """One try-on input held in memory: the original bytes (hashed for the result cache)
+    and the bytes actually uploaded, possibly downscaled."""
+    def __init__(self, name, source_bytes, upload_bytes, content_type):
+        self.name = name
+        self.source_bytes = source_bytes
+        self.upload_bytes = upload_bytes
+        self.content_type = content_type
+
+    def as_upload(self):
+        """(filename, stream, content type) tuple for a requests multipart field."""
+        return (self.name, io.BytesIO(self.upload_bytes), self.content_type)
+
+
+def is_data_url(value):
+    return value.startswith('data:image')
+
+
+def download_image_from_url(image_url):
+    """Download an image from URL and return as binary data"""
+    image_url = canonical_image_url(image_url)
+    print(f"Downloading image from URL: {image_url}")
+
+    try:
+        response = requests.get(image_url, headers=DOWNLOAD_HEADERS, timeout=TRYON_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type.startswith('image/'):
+            print(f"Warning: Content-Type is not an image: {content_type}")
+
+        return response.content
+    except Exception as e:
+        print(f"Error downloading image from {image_url}: {str(e)}")
+        raise ValueError(f"Failed to download image from URL: {image_url}. Error: {str(e)}")
+
+
+def downscale(data, max_side=TRYON_MAX_SIDE):
+    """(bytes, content type) no larger than max_side; images already small enough are passed through."""
+    image = Image.open(io.BytesIO(data))
+    original = (data, Image.MIME.get(image.format, "image/jpeg"))
+    if not max_side or max(image.size) <= max_side:
+        return original
+    try:
+        if image.format == "JPEG":
+            # Let the decoder skip straight to a nearby power-of-two scale
+            image.draft("RGB", (max_side, max_side))
+        # The re-encoded JPEG carries no EXIF, so apply the camera's orientation to the pixels first
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+            # JPEG has no alpha; flatten onto white rather than the black convert("RGB") would give
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        image = image.convert("RGB")
+        # thumbnail reduces by whole factors before resampling, so large non-JPEGs stay cheap
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+    except Exception as e:
+        # A readable header but an image PIL cannot resize (unusual mode, truncated data): upload it as is
+        print(f"Could not downscale try-on image, sending the original: {str(e)}")
+        return original
+    return buffer.getvalue(), "image/jpeg"
+
+
+def _load(source, role):
+    """Bytes of an uploaded file, a base64 data URL or a web URL, ready to upload."""
+    if isinstance(source, str):
+        if is_data_url(source):
+            try:
+                data = base64.b64decode(re.sub('^data:image/.+;base64,', '', source))
+            except ValueError as e:
+                raise ValueError(f"Failed to decode {role} image: {str(e)}")
+            name = f"{role}.jpg"
+        else:
+            try:
+                data = download_image_from_url(source)
+            except ValueError as e:
+                raise ValueError(f"Failed to download {role} image: {str(e)}")
+            name = f"{role}.jpg"
+    else:
+        data = source.read()
+        name = source.filename or f"{role}.jpg"
+
+    try:
+        upload_bytes, content_type = downscale(data)
+    except Exception as e:
+        raise ValueError(f"Invalid {role} image: {str(e)}")
+    return TryOnImage(name, data, upload_bytes, content_type)
+
+
+def load_tryon_inputs(avatar, clothing):
+    """
+    Normalize the avatar and garment (file uploads, data URLs or web URLs) to in-memory
+    TryOnImages, downloading and decoding both at once. Raises ValueError with a message
+    fit for a 400 response.
+    """
+    avatar_future = _executor.submit(_load, avatar, "avatar")
+    clothing_future = _executor.submit(_load, clothing, "clothing")
+    return avatar_future.result(), clothing_future.result()
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# for docker the host is model_service:3002
+MODEL_SERVICE_URL = os.getenv("MODEL_SERVICE_URL", "http://localhost:3002")
+EMBED_TIMEOUT = float(os.getenv("WARDROBE_EMBED_TIMEOUT", "15"))
+# Items whose embedding failed are not retried for this many seconds
+EMBED_RETRY_AFTER = float(os.getenv("WARDROBE_EMBED_RETRY_AFTER", "600"))
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("WARDROBE_EMBED_WORKERS", "2")), thread_name_prefix="wardrobe-embed")
+_lock = threading.Lock()
+_queued = set()
+# item id -> time of its last failed embedding
+_failed_at = {}
+
+
+def embed_wardrobe_item(item, token):
+    """
+    Fill item.embedding from the model service: the item photo when there is one,
+    otherwise its text description. Leaves the item unembedded if the service fails.
+    """
+    body = {"image_url": item.image_url} if item.image_url else {"text": item.description()}
+    if not body.get("image_url") and not body.get("text"):
+        return item
+    try:
+        response = requests.post(
+            f"{MODEL_SERVICE_URL}/ai/embed",
+            json=body,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=EMBED_TIMEOUT
+        )
+        if response.ok:
+            item.embedding = response.json().get("embedding")
+        else:
+            print(f"Embedding wardrobe item failed: {response.status_code}")
+    except requests.exceptions.RequestException as e:
+        print(f"Error embedding wardrobe item: {str(e)}")
+    with _lock:
+        if item.embedding is None:
+            _failed_at[item.id] = time.time()
+        else:
+            _failed_at.pop(item.id, None)
+    return item
+
+
+def embed_in_background(items, token):
+    """
+    Queue embedding (and saving) items that have none, skipping items already queued or whose
+    embedding failed in the last EMBED_RETRY_AFTER seconds. Returns how many were queued.
+    """
+    now = time.time()
+    with _lock:
+        for item_id, failed_at in list(_failed_at.items()):
+            if now - failed_at > EMBED_RETRY_AFTER:
+                del _failed_at[item_id]
+        batch = [item for item in items if item.id not in _queued and item.id not in _failed_at]
+        _queued.update(item.id for item in batch)
+    if batch:
+        _executor.submit(_embed_and_save, batch, token)
+    return len(batch)
+
+
+def _embed_and_save(items, token):
+    try:
+        for position, item in enumerate(items):
+            embed_wardrobe_item(item, token)
+            if item.embedding is None:
+                # The model service is likely down; the rest wait out the retry delay too
+                with _lock:
+                    for rest in items[position + 1:]:
+                        _failed_at[rest.id] = time.time()
+                break
+            item.save_embedding()
+    except Exception as e:
+        print(f"Error embedding wardrobe items in the background: {str(e)}")
+    finally:
+        with _lock:
+            _queued.difference_update(item.id for item in items)